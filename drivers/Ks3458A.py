@@ -15,11 +15,16 @@ import numpy as np
 from pprint import pprint
 import random
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict
 
 from pyvisa.constants import VI_GPIB_REN_ASSERT
 
-VERSION = "A.00.06"
+try:
+    from drivers.ieee_block import KS3458_DINT, KS3458_DREAL, KS3458_SINT, decode
+except ModuleNotFoundError:
+    from ieee_block import KS3458_DINT, KS3458_DREAL, KS3458_SINT, decode
+
+VERSION = "A.00.10"
 
 
 class Ks3458A_Simulator:
@@ -185,6 +190,9 @@ class Ks3458A:
     timeout: int = 15000
     simulating: bool = False
     option001: bool = False
+    nplc: float = 10  # power on and reset
+    line_frequency: float = 50
+    ac_reading_time: float = 2  # seconds, slowest ACV reading (SETACV SYNC)
 
     def __init__(self, simulate=False) -> None:
         """
@@ -362,6 +370,7 @@ class Ks3458A:
             nplc (int): _description_
         """
         self.instr.write(f"NPLC {nplc}")  # type: ignore
+        self.nplc = nplc
 
     def configure_acv(self, cfg: Ks3458A_ACV_CONFIG) -> None:
         """
@@ -379,6 +388,7 @@ class Ks3458A:
         self,
         function: Ks3458A_Function = Ks3458A_Function.DCV,
         number_readings: int = 1,
+        bulk: bool = True,
     ) -> Dict[str, float]:
         """
         measure _summary_
@@ -386,16 +396,21 @@ class Ks3458A:
         Args:
             function (_type_, optional): _description_. Defaults to Ks3458A_Function.DCV.
             number_readings (int, optional): _description_. Defaults to 1.
+            bulk (bool, optional): store the readings in memory and transfer
+            them together, rather than one at a time. Defaults to True.
 
         Raises:
             ex: _description_
 
         Returns:
-            Dict[float, float]: _description_
+            Dict[float, float]: Average, StdDev, Min, Max, Count
         """
         if function != self.current_mode:
             self.set_function(function)
 
+        if bulk:
+            return self.__measure_bulk(number_readings)
+
         self.instr.write(f"NRDGS {number_readings+1}")  # type: ignore
         self.instr.write("TARM SGL")  # type: ignore
 
@@ -433,6 +448,81 @@ class Ks3458A:
             print("Error reading")
             raise ex
 
+    def reading_time(self) -> float:
+        """
+        reading_time
+        Longest time for one reading of the current function
+
+        Returns:
+            float: seconds
+        """
+
+        if self.current_mode in (Ks3458A_Function.ACV, Ks3458A_Function.ACI):
+            return self.ac_reading_time
+
+        # Twice the integration time with auto zero on
+        return 2 * self.nplc / self.line_frequency
+
+    def __measure_bulk(self, number_readings: int) -> Dict[str, float]:
+        """
+        __measure_bulk
+        Take the readings into memory, then read them all back as binary
+        doubles in one transfer. The first reading is a dummy, as for measure
+
+        Args:
+            number_readings (int): _description_
+
+        Returns:
+            Dict[str, float]: _description_
+        """
+
+        if self.simulating:
+            rdgs = 0.95 + np.random.random(number_readings) / 10
+        else:
+            format_out = KS3458_DREAL.command.split()[-1]
+
+            self.instr.write("MEM FIFO")  # type: ignore
+            self.instr.write(f"MFORMAT {format_out}")  # type: ignore
+            self.instr.write(f"OFORMAT {format_out}")  # type: ignore
+            self.instr.write(f"NRDGS {number_readings + 1}")  # type: ignore
+            self.instr.write("TARM SGL")  # type: ignore
+
+            size = np.dtype(KS3458_DREAL.dtype).itemsize
+
+            # The readings all come back at the end, so allow the time for them
+            tmo = self.instr.timeout  # type: ignore
+            self.instr.timeout = int(  # type: ignore
+                tmo + (number_readings + 1) * self.reading_time() * 1000
+            )
+
+            try:
+                raw_data = self.instr.read_bytes((number_readings + 1) * size)  # type: ignore
+            except pyvisa.VisaIOError as ex:
+                print("Error reading")
+                raise ex
+            finally:
+                # put it back
+                self.instr.timeout = tmo  # type: ignore
+                self.instr.write("MEM OFF")  # type: ignore
+                self.instr.write("OFORMAT ASCII")  # type: ignore
+                self.instr.write("MFORMAT SREAL")  # type: ignore
+                self.instr.write("NRDGS 1")  # type: ignore
+
+            rdgs = decode(raw_data, KS3458_DREAL.dtype)[1:]
+
+        result = {
+            "Average": float(np.mean(rdgs)),
+            "StdDev": float(np.std(rdgs)),
+            "Min": float(np.min(rdgs)),
+            "Max": float(np.max(rdgs)),
+            "Count": int(rdgs.size),
+        }
+
+        if self.simulating:
+            pprint(f"3458A: {result}")
+
+        return result  # type: ignore
+
     def continuous_measure(self) -> None:
         """
         After the single readings, set back to continous measure
@@ -443,17 +533,19 @@ class Ks3458A:
 
     def measure_sampling(
         self, sample_period: float, number_samples: int, resolution: float = 4.5
-    ) -> List:
+    ) -> np.ndarray:
         """
         measure_sampling
-        Use the built in sampling functions to take readings at specified interval
+        Use the built in sampling functions to take readings at specified interval.
+        If there are more samples than fit in the reading memory, they are taken
+        in bursts that do fit, with a gap between bursts while each is read back
 
         Args:
             sample_period (_type_): _description_
             number_samples (_type_): _description_
 
         Returns:
-            List: _description_
+            np.ndarray: volts
         """
 
         # standard memory is 20k, so we can only store 10240 readings in SINT mode, or 5120 in DINT mode
@@ -468,7 +560,8 @@ class Ks3458A:
         else:
             max_readings = 10240 if resolution == 4.5 else 5120
 
-        assert number_samples <= max_readings, "Number readings exceeds 3458A memory"
+        if self.simulating:
+            return 0.95 + np.random.random(number_samples) / 10
 
         tmo = self.timeout
 
@@ -486,46 +579,49 @@ class Ks3458A:
 
         self.instr.write(f"TIMER {sample_period}")  # type: ignore
 
-        self.instr.write(f"NRDGS {number_samples}, TIMER")  # type: ignore
-
         # self.instr.write("DELAY 0")  # type: ignore
         self.instr.write("AZERO OFF")  # type: ignore
 
-        if resolution == 4.5:
-            format_out = "SINT"
-            byte_size = 2
-        else:
-            format_out = "DINT"
-            byte_size = 4
+        fmt = KS3458_SINT if resolution == 4.5 else KS3458_DINT
+        format_out = fmt.command.split()[-1]
+        byte_size = np.dtype(fmt.dtype).itemsize
 
         # Set the measurement and output formats to double integer (4 bytes signed) or single integer
         self.instr.write(f"MFORMAT {format_out}")  # type: ignore
         self.instr.write(f"OFORMAT {format_out}")  # type: ignore
 
-        # Now start the samples
+        readings = np.empty(number_samples, dtype=np.float64)
+        scale = 0.0
 
-        self.instr.write("TARM SGL")  # type: ignore
+        try:
+            for start in range(0, number_samples, max_readings):
+                burst = min(max_readings, number_samples - start)
 
-        # And read everything back
+                self.instr.write(f"NRDGS {burst}, TIMER")  # type: ignore
 
-        self.instr.timeout = 2000  # type: ignore
+                # Now start the samples
 
-        # DINT format is 4 bytes per reading
-        raw_data = self.instr.read_bytes(number_samples * byte_size)  # type: ignore
+                self.instr.write("TARM SGL")  # type: ignore
 
-        scale = float(self.instr.query("ISCALE?").strip())  # type: ignore
+                # And read everything back, allowing for the time to take the burst
 
-        self.instr.write("DISP ON")  # type: ignore
+                self.instr.timeout = int(2000 + burst * sample_period * 1000)  # type: ignore
 
-        # We have a binary dump, convert into voltages
-        readings = []
+                # DINT format is 4 bytes per reading
+                raw_data = self.instr.read_bytes(burst * byte_size)  # type: ignore
 
-        for index, _ in enumerate(range(number_samples)):
-            bt = raw_data[index * byte_size : index * byte_size + byte_size]
-            rdg = int.from_bytes(bt, "big", signed=True)
-            readings.append(rdg * scale)
+                if not scale:
+                    scale = float(self.instr.query("ISCALE?").strip())  # type: ignore
 
-        self.instr.timeout = tmo  # type: ignore
+                # We have a binary dump, no block header. Convert into voltages
+                np.multiply(
+                    decode(raw_data, fmt.dtype),
+                    scale,
+                    out=readings[start : start + burst],
+                )
+        finally:
+            self.instr.write("DISP ON")  # type: ignore
+            self.instr.timeout = tmo  # type: ignore
 
         return readings
 
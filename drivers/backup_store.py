@@ -0,0 +1,202 @@
+"""
+# Backups of the results workbook
+# A copy is made at the start of every test run in case the sheet is corrupted.
+# The copy is only made if the workbook has changed since the last backup, and
+# only the most recent backups of each workbook are kept
+# DK Oct 26
+"""
+
+import contextlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict
+
+try:
+    from drivers.test_plan_cache import file_hash
+except ModuleNotFoundError:
+    from test_plan_cache import file_hash
+
+VERSION = "A.00.00"
+
+
+class BackupStore:
+    """
+    BackupStore
+    Backups are kept in the Backups folder next to the workbook, named
+    with the time of the backup. An index of the hash of each backup is kept
+    in the folder so unchanged workbooks aren't copied again
+    """
+
+    keep: int = 20  # backups kept per workbook
+
+    __index_name = "index.json"
+    __lock = threading.Lock()  # shared, several workbooks can use the folder
+
+    def __init__(self, filename: str, keep: int | None = None) -> None:
+        """
+        __init__
+
+        Args:
+            filename (str): workbook to back up
+            keep (int | None, optional): number of backups to keep. Defaults to None (class setting).
+        """
+
+        self.filename = filename
+        if keep is not None:
+            self.keep = keep
+
+        head, self.__tail = os.path.split(filename)
+        self.path = os.path.join(head, "Backups")
+        self.__thread: threading.Thread | None = None
+
+        # Backups made by this or earlier versions, "20250227_101500_<name>"
+        self.__pattern = re.compile(rf"^\d{{8}}_\d{{6}}_{re.escape(self.__tail)}$")
+
+    def backup(self) -> str:
+        """
+        backup
+        Back up the workbook as it is on disk. The file is read and hashed now,
+        the copy is written in the background
+
+        Returns:
+            str: backup filename, the existing backup if unchanged
+        """
+
+        self.wait()  # one copy at a time, so the index is up to date
+
+        with open(self.filename, "rb") as infile:
+            data = infile.read()
+
+        digest = file_hash(data)
+
+        if not os.path.exists(self.path):
+            os.mkdir(self.path)
+
+        with self.__lock:
+            for fname, entry in self.__read_index().items():
+                if (
+                    entry.get("source") == self.__tail
+                    and entry.get("sha256") == digest
+                    and os.path.isfile(os.path.join(self.path, fname))
+                ):
+                    # Unchanged since the last backup
+                    return os.path.join(self.path, fname)
+
+        fname = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.__tail}"
+
+        self.__thread = threading.Thread(
+            target=self.__write,
+            args=(fname, data, digest),
+            name="BackupStore",
+            daemon=True,
+        )
+        self.__thread.start()
+
+        return os.path.join(self.path, fname)
+
+    def wait(self, timeout: float | None = None) -> None:
+        """
+        wait
+        Wait for the backup being written to complete
+
+        Args:
+            timeout (float | None, optional): seconds. Defaults to None (forever).
+        """
+
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def __write(self, fname: str, data: bytes, digest: str) -> None:
+        """
+        __write
+        Worker thread, write the copy then apply the retention
+
+        Args:
+            fname (str): backup file name
+            data (bytes): workbook contents
+            digest (str): hash of the contents
+        """
+
+        backup_name = os.path.join(self.path, fname)
+        temp = f"{backup_name}.tmp"
+
+        try:
+            # Written to a temporary file so a partial backup never has the real name
+            with open(temp, "wb") as outfile:
+                outfile.write(data)
+            os.replace(temp, backup_name)
+        except OSError as ex:
+            print(f"Unable to back up {self.filename}: {ex}")
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            return
+
+        with self.__lock:
+            index = self.__read_index()
+            index[fname] = {"source": self.__tail, "sha256": digest}
+            self.__prune(index)
+            self.__write_index(index)
+
+    def __prune(self, index: Dict[str, Dict]) -> None:
+        """
+        __prune
+        Remove the oldest backups of this workbook, keeping the latest.
+        The names start with the time, so sort in time order
+
+        Args:
+            index (Dict[str, Dict]): index, updated
+        """
+
+        backups = sorted(
+            fname for fname in os.listdir(self.path) if self.__pattern.match(fname)
+        )
+
+        for fname in backups[: max(len(backups) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.path, fname))
+            except OSError:
+                # Open somewhere, try again next time
+                continue
+            index.pop(fname, None)
+
+        # Forget backups deleted by hand
+        for fname in list(index):
+            if not os.path.isfile(os.path.join(self.path, fname)):
+                del index[fname]
+
+    def __read_index(self) -> Dict[str, Dict]:
+        """
+        __read_index
+
+        Returns:
+            Dict[str, Dict]: backup file name -> source and hash
+        """
+
+        try:
+            with open(
+                os.path.join(self.path, self.__index_name), "r", encoding="utf-8"
+            ) as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_index(self, index: Dict[str, Dict]) -> None:
+        """
+        __write_index
+
+        Args:
+            index (Dict[str, Dict]): _description_
+        """
+
+        path = os.path.join(self.path, self.__index_name)
+        temp = f"{path}.tmp"
+
+        try:
+            with open(temp, "w", encoding="utf-8") as outfile:
+                json.dump(index, outfile, indent=1)
+            os.replace(temp, path)
+        except OSError as ex:
+            print(f"Unable to update backup index: {ex}")
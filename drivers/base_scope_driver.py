@@ -6,11 +6,25 @@ DK Feb 23
 """
 
 import abc  # Abstract Base Class
+import contextlib
+import numpy as np
 import pyvisa
+import statistics
 import time
-from typing import List
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Tuple
 from random import random
 
+try:
+    from drivers.crossing import find_crossing
+    from drivers.wait_engine import WaitEngine, WaitMode
+    from drivers.waveform_analysis import WaveformStats, channel_stats, edge_crossing
+except ModuleNotFoundError:
+    from crossing import find_crossing
+    from wait_engine import WaitEngine, WaitMode
+    from waveform_analysis import WaveformStats, channel_stats, edge_crossing
+
 
 class Scope_Simulator:
     """
@@ -60,6 +74,18 @@ class Scope_Simulator:
         return str(0.5 + random()) if command.startswith("READ") else ""
 
 
+@dataclass(frozen=True)
+class AdaptiveReading:
+    """
+    Result of an adaptive measurement
+    """
+
+    value: float  # mean of the final window
+    std: float  # standard deviation of the final window
+    count: int  # number of readings in the final window
+    converged: bool  # False if timed out before the readings were stable
+
+
 class ScopeDriver(metaclass=abc.ABCMeta):
     """
     ScopeDriver
@@ -69,6 +95,41 @@ class ScopeDriver(metaclass=abc.ABCMeta):
         metaclass (_type_, optional): _description_. Defaults to abc.ABCMeta.
     """
 
+    # Mirror of the settings sent to the scope, so repeated settings aren't resent
+    cache_settings: bool = True
+
+    # Changing a setting can make the scope change others, eg the offset is
+    # limited to the range of the scale, so those are no longer known
+    __dependent_settings: Dict[str, Tuple[str, ...]] = {
+        "scale": ("offset", "position", "trigger"),
+        "impedance": ("scale", "offset", "position", "trigger"),
+        "offset": ("trigger",),
+        "position": ("trigger",),
+        "timebase": ("timebase_pos",),
+    }
+
+    # Longest message sent in a batch. Override for the input buffer of the scope
+    max_message_length: int = 250
+
+    # Commands that failed in the last batch, (command, error)
+    batch_errors: List[Tuple[str, str]] = []
+
+    # How to wait for the scope. Scopes that can't report completion sleep
+    wait_mode: WaitMode = WaitMode.OPC_QUERY
+    acquisition_timeout: float = 10  # seconds, a full set of averages
+    single_acquisition: str = ""  # command for one acquisition, then stop
+    run_acquisition: str = ""  # command to go back to running
+    measurement_slots: int = 4  # measurements that can be on at once
+
+    # Number of acquisitions since run, to tell the measurements have been
+    # updated. Empty if the scope can't report it
+    acquisition_count_query: str = ""
+    acquisition_period: float = 0.02  # seconds, least time per acquisition
+
+    # Cursor X1 queries, for adjust_cursor
+    cursor_x_query: str = "MARK:X1P?"
+    cursor_y_query: str = "MARK:Y1P?"
+
     @abc.abstractmethod
     def __init__(self, simulate=False):
         self.simulating = simulate
@@ -98,6 +159,355 @@ class ScopeDriver(metaclass=abc.ABCMeta):
         """
         self.open_connection()
 
+    def setting_changed(self, name: str, value: Any, chan: int = 0) -> bool:
+        """
+        setting_changed
+        Check the setting against the mirror of the scope state, and record it.
+        Used by the set_ functions to skip commands for settings already made
+
+        Args:
+            name (str): setting, eg scale
+            value (Any): value as sent to the scope
+            chan (int, optional): channel, 0 for settings not on a channel. Defaults to 0.
+
+        Returns:
+            bool: True if the setting has to be sent
+        """
+
+        settings = self.__settings()
+        key = (name, chan)
+
+        changed = (
+            not self.cache_settings
+            or getattr(self, "_ScopeDriver__bypass", False)
+            or key not in settings
+            or settings[key] != value
+        )
+
+        if changed:
+            settings[key] = value
+            for dependent in self.__dependent_settings.get(name, ()):
+                settings.pop((dependent, chan), None)
+                settings.pop((dependent, 0), None)  # eg trigger level
+
+        return changed
+
+    def invalidate_settings(self, *names: str, chan: int | None = None) -> None:
+        """
+        invalidate_settings
+        Forget the mirrored state, so the next settings are sent.
+        Call after a reset, or when the scope has been set by other commands
+
+        Args:
+            names (str): settings to forget, all if none given
+            chan (int | None, optional): only this channel. Defaults to None (all).
+        """
+
+        settings = self.__settings()
+
+        if not names and chan is None:
+            settings.clear()
+            return
+
+        for key in list(settings):
+            if (not names or key[0] in names) and (chan is None or key[1] == chan):
+                del settings[key]
+
+    @contextlib.contextmanager
+    def uncached(self) -> Iterator[None]:
+        """
+        uncached
+        Send all settings made in the block, even if the mirror says they
+        are already set. For verifying the scope state
+
+        eg:
+            with scope.uncached():
+                scope.set_voltage_scale(chan=1, scale=0.1)
+        """
+
+        bypass = getattr(self, "_ScopeDriver__bypass", False)
+        self.__bypass = True
+        try:
+            yield
+        finally:
+            self.__bypass = bypass
+
+    def track_command(self, command: str) -> None:
+        """
+        track_command
+        Called by write. A reset sets everything back to default
+
+        Args:
+            command (str): _description_
+        """
+
+        if getattr(self, "_ScopeDriver__flushing", False):
+            # Already tracked when queued
+            return
+
+        if "*RST" in command.upper():
+            self.invalidate_settings()
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        batch
+        Collect the commands written in the block and send them together,
+        joined with semicolons, as few messages as possible. Saves a bus
+        transaction per command when making a lot of settings.
+        Any query sends the commands collected so far first
+
+        eg:
+            with scope.batch():
+                scope.set_voltage_scale(chan=1, scale=0.1)
+                scope.set_voltage_offset(chan=1, offset=0)
+        """
+
+        self.__batch_depth = getattr(self, "_ScopeDriver__batch_depth", 0) + 1
+        try:
+            yield
+        finally:
+            self.__batch_depth -= 1
+            if not self.__batch_depth:
+                self.flush_batch()
+
+    def queue_command(self, command: str) -> bool:
+        """
+        queue_command
+        Called by write. Keep the command if in a batch
+
+        Args:
+            command (str): _description_
+
+        Returns:
+            bool: True if queued, so not to be written now
+        """
+
+        if not getattr(self, "_ScopeDriver__batch_depth", 0) or getattr(
+            self, "_ScopeDriver__flushing", False
+        ):
+            return False
+
+        queue = self.__queue()
+
+        if command.strip().upper() == "*OPC":
+            # Only needed once, at the end
+            self.__batch_opc = True
+        else:
+            queue.append(command.strip())
+
+        if "?" in command:
+            # Reply expected, so send now
+            self.flush_batch()
+
+        return True
+
+    def flush_batch(self) -> None:
+        """
+        flush_batch
+        Send the commands queued in the batch. If the scope reports an error,
+        the commands are sent again one at a time to find which failed.
+        The failures are kept in batch_errors
+        """
+
+        if getattr(self, "_ScopeDriver__flushing", False):
+            return
+
+        queue = self.__queue()
+        if getattr(self, "_ScopeDriver__batch_opc", False):
+            queue.append("*OPC")
+            self.__batch_opc = False
+
+        if not queue:
+            return
+
+        commands = list(queue)
+        queue.clear()
+
+        self.__flushing = True
+        try:
+            self.batch_errors = []
+
+            for message in self.__join_commands(commands):
+                self.write(message)
+
+                if "?" in message or not self.read_errors():
+                    # A query leaves the reply for the caller to read
+                    continue
+
+                # Find the culprits
+                for command in self.__split_commands(message):
+                    self.write(command)
+                    self.batch_errors.extend(
+                        (command, error) for error in self.read_errors()
+                    )
+
+            for command, error in self.batch_errors:
+                print(f"Scope error {error} from {command}")
+        finally:
+            self.__flushing = False
+
+    def read_errors(self) -> List[str]:
+        """
+        read_errors
+        Empty the error queue
+
+        Returns:
+            List[str]: errors, empty if none
+        """
+
+        errors: List[str] = []
+
+        for _ in range(20):
+            reply = self.query("SYST:ERR?").strip()
+
+            try:
+                code = int(reply.split(",")[0])
+            except ValueError:
+                break
+
+            if code == 0:
+                break
+
+            errors.append(reply)
+
+        return errors
+
+    def __join_commands(self, commands: List[str]) -> List[str]:
+        """
+        __join_commands
+        Join the commands into messages no longer than max_message_length.
+        ;: goes back to the root of the command tree before the next command
+
+        Args:
+            commands (List[str]): _description_
+
+        Returns:
+            List[str]: messages
+        """
+
+        messages: List[str] = []
+        message = ""
+
+        for command in commands:
+            if not message:
+                message = command
+                continue
+
+            separator = ";" if command.startswith("*") else ";:"
+
+            if len(message) + len(separator) + len(command) > self.max_message_length:
+                messages.append(message)
+                message = command
+            else:
+                message += separator + command.lstrip(":")
+
+        if message:
+            messages.append(message)
+
+        return messages
+
+    def __split_commands(self, message: str) -> List[str]:
+        """
+        __split_commands
+        Commands in a joined message, as they were written
+
+        Args:
+            message (str): _description_
+
+        Returns:
+            List[str]: _description_
+        """
+
+        commands: List[str] = []
+
+        for part in message.split(";:"):
+            # *OPC etc are joined with ;
+            command, *common = part.split(";*")
+            commands.append(command)
+            commands.extend(f"*{c}" for c in common)
+
+        return commands
+
+    def __queue(self) -> List[str]:
+        """
+        __queue
+        Commands waiting to be sent in a batch
+
+        Returns:
+            List[str]: _description_
+        """
+
+        if not hasattr(self, "_ScopeDriver__batch_queue"):
+            self.__batch_queue: List[str] = []
+
+        return self.__batch_queue
+
+    def __settings(self) -> Dict[Tuple[str, int], Any]:
+        """
+        __settings
+        The drivers don't call the base __init__, so create on first use
+
+        Returns:
+            Dict[Tuple[str, int], Any]: (name, chan) -> value
+        """
+
+        if not hasattr(self, "_ScopeDriver__mirror"):
+            self.__mirror: Dict[Tuple[str, int], Any] = {}
+
+        return self.__mirror
+
+    def wait_complete(self, timeout: float | None = None, fallback: float = 1) -> bool:
+        """
+        wait_complete
+        Wait for the commands sent so far to complete
+
+        Args:
+            timeout (float | None, optional): seconds. Defaults to None (acquisition_timeout).
+            fallback (float, optional): sleep if the scope can't report completion. Defaults to 1.
+
+        Returns:
+            bool: True if complete
+        """
+
+        return WaitEngine(self, self.wait_mode).wait(
+            timeout=timeout or self.acquisition_timeout, fallback=fallback
+        )
+
+    def acquire(self, timeout: float | None = None, fallback: float = 1) -> bool:
+        """
+        acquire
+        Make a single acquisition (all of the averages if averaging) and wait
+        until it is complete, so measurements are of a whole acquisition.
+        The scope is left stopped, call run after reading
+
+        Args:
+            timeout (float | None, optional): seconds. Defaults to None (acquisition_timeout).
+            fallback (float, optional): sleep if the scope can't report completion. Defaults to 1.
+
+        Returns:
+            bool: True if complete
+        """
+
+        if not self.single_acquisition:
+            # Leave running, and allow the time it takes
+            if not self.simulating:
+                time.sleep(fallback)
+            return True
+
+        self.write(self.single_acquisition)
+
+        return self.wait_complete(timeout=timeout, fallback=fallback)
+
+    def run(self) -> None:
+        """
+        run
+        Back to continuous acquisitions after acquire
+        """
+
+        if self.run_acquisition:
+            self.write(self.run_acquisition)
+
     @abc.abstractmethod
     def close(self) -> None:
         """
@@ -354,6 +764,473 @@ class ScopeDriver(metaclass=abc.ABCMeta):
 
         pass
 
+    @abc.abstractmethod
+    def setup_mean_measurement(self, chan: int, slot: int = 1) -> None:
+        """
+        setup_mean_measurement
+        Set up the measurement of the average voltage, without waiting
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): measurement number, to measure several
+            channels at once. Defaults to 1.
+        """
+
+        pass
+
+    @abc.abstractmethod
+    def read_mean_measurement(self, chan: int, slot: int = 1) -> float:
+        """
+        read_mean_measurement
+        Read the current value of the mean measurement
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): measurement number. Defaults to 1.
+
+        Returns:
+            float: _description_
+        """
+
+        pass
+
+    def measure_voltage_multi(
+        self, chans: List[int], delay: float = 1
+    ) -> Dict[int, float]:
+        """
+        measure_voltage_multi
+        Measure the average voltage of several channels from the same
+        acquisition, one measurement slot per channel
+
+        Args:
+            chans (List[int]): no more than measurement_slots
+            delay (float, optional): fallback wait for the acquisition. Defaults to 1.
+
+        Returns:
+            Dict[int, float]: channel -> voltage
+        """
+
+        for slot, chan in enumerate(chans, start=1):
+            self.setup_mean_measurement(chan, slot)
+
+        self.acquire(fallback=delay)
+
+        voltages = {
+            chan: self.read_mean_measurement(chan, slot)
+            for slot, chan in enumerate(chans, start=1)
+        }
+
+        self.run()
+
+        return voltages
+
+    def acquisition_count(self) -> int | None:
+        """
+        acquisition_count
+        Number of acquisitions made since the scope was set running
+
+        Returns:
+            int | None: None if the scope can't report it
+        """
+
+        if not self.acquisition_count_query or self.simulating:
+            return None
+
+        return int(self.read_query(self.acquisition_count_query))  # type: ignore
+
+    def averaging_time(self, averages: int | None = None) -> float:
+        """
+        averaging_time
+        Least time for a full set of averages, from the timebase set
+
+        Args:
+            averages (int | None, optional): Defaults to None (as set).
+
+        Returns:
+            float: seconds
+        """
+
+        settings = self.__settings()
+
+        if averages is None:
+            averages = settings.get(("acquisition", 0)) or 1
+
+        timebase = settings.get(("timebase", 0)) or 0
+
+        return averages * max(self.acquisition_period, 10 * float(timebase))
+
+    def measure_voltage_adaptive(
+        self,
+        chan: int,
+        tolerance: float | None = None,
+        window: int = 5,
+        interval: float = 0.05,
+        timeout: float = 10,
+        divisions: float = 0.02,
+        averages: int | None = None,
+    ) -> AdaptiveReading:
+        """
+        measure_voltage_adaptive
+        Poll the mean measurement until the last readings are stable, rather
+        than waiting the worst case settling time.
+        Stable is when the spread of the window of readings is within the
+        tolerance. Off screen readings (9e37 etc) are ignored
+
+        Args:
+            chan (int): _description_
+            tolerance (float | None, optional): volts. Defaults to None (divisions of the V/div set).
+            window (int, optional): readings that must agree. Defaults to 5.
+            interval (float, optional): seconds between readings. Defaults to 0.05.
+            timeout (float, optional): seconds before giving up, after the
+            averaging time. Defaults to 10.
+            divisions (float, optional): tolerance in divisions. Defaults to 0.02.
+            averages (int | None, optional): readings are only taken after the
+            time for this many acquisitions. Defaults to None (as set).
+
+        Returns:
+            AdaptiveReading: _description_
+        """
+
+        return self.measure_voltages_adaptive(
+            chans=[chan],
+            tolerance=tolerance,
+            window=window,
+            interval=interval,
+            timeout=timeout,
+            divisions=divisions,
+            averages=averages,
+        )[chan]
+
+    def measure_voltages_adaptive(
+        self,
+        chans: List[int],
+        tolerance: float | None = None,
+        window: int = 5,
+        interval: float = 0.05,
+        timeout: float = 10,
+        divisions: float = 0.02,
+        averages: int | None = None,
+    ) -> Dict[int, AdaptiveReading]:
+        """
+        measure_voltages_adaptive
+        As measure_voltage_adaptive, for several channels at once. Polls until
+        all of the channels are stable.
+        The mean statistic isn't updated on every poll, and repeats of a
+        stale value would look stable. So a reading is only added to the
+        window if the acquisition count has gone up since the last one. If
+        the scope can't report the count, every poll is a new reading, with
+        the polls at least one acquisition apart
+
+        Args:
+            chans (List[int]): no more than measurement_slots
+
+        Returns:
+            Dict[int, AdaptiveReading]: channel -> reading
+        """
+
+        limits: Dict[int, float | None] = {}
+        for chan in chans:
+            if tolerance is None:
+                scale = self.__settings().get(("scale", chan))
+                if isinstance(scale, tuple):
+                    scale = scale[-1]  # (probe, scale)
+                limits[chan] = divisions * float(scale) if scale else None
+            else:
+                limits[chan] = tolerance
+
+        for slot, chan in enumerate(chans, start=1):
+            self.setup_mean_measurement(chan, slot)
+
+        readings = {chan: deque(maxlen=window) for chan in chans}
+        last = {chan: 0.0 for chan in chans}
+        updated: Dict[int, int | None] = {chan: None for chan in chans}
+        converged = {chan: False for chan in chans}
+
+        # Nothing before the averages are complete counts
+        averaging = self.averaging_time(averages)
+        if not self.simulating:
+            time.sleep(averaging)
+
+        deadline = time.monotonic() + timeout
+        polls = 0
+
+        while True:
+            polls += 1
+            acquisitions = self.acquisition_count()
+
+            for slot, chan in enumerate(chans, start=1):
+                if converged[chan]:
+                    continue
+
+                last[chan] = self.read_mean_measurement(chan, slot)
+
+                marker = polls if acquisitions is None else acquisitions
+                if marker == updated[chan]:
+                    continue  # not updated since the last reading
+                updated[chan] = marker
+
+                if abs(last[chan]) < 9e30:
+                    readings[chan].append(last[chan])
+
+                if len(readings[chan]) == window:
+                    # Scale unknown, so use 0.1 % of the reading
+                    limit = limits[chan]
+                    if limit is None:
+                        limit = 1e-3 * max(abs(statistics.fmean(readings[chan])), 1e-3)
+                    converged[chan] = max(readings[chan]) - min(readings[chan]) <= limit
+
+            if all(converged.values()):
+                break
+
+            if self.simulating and all(len(r) == window for r in readings.values()):
+                # Random readings, will never settle
+                break
+
+            if time.monotonic() >= deadline:
+                break
+
+            if not self.simulating:
+                if acquisitions is None:
+                    time.sleep(max(interval, self.averaging_time(1)))
+                else:
+                    time.sleep(interval)
+
+        return {
+            chan: (
+                AdaptiveReading(
+                    value=statistics.fmean(readings[chan]),
+                    std=(
+                        statistics.stdev(readings[chan])
+                        if len(readings[chan]) > 1
+                        else 0.0
+                    ),
+                    count=len(readings[chan]),
+                    converged=converged[chan],
+                )
+                if readings[chan]
+                else AdaptiveReading(
+                    value=last[chan], std=0.0, count=0, converged=False
+                )
+            )
+            for chan in chans
+        }
+
+    @abc.abstractmethod
+    def read_waveform(self, chan: int, points: int = 1000) -> np.ndarray:
+        """
+        read_waveform
+        Transfer the waveform of the last acquisition
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            np.ndarray: volts
+        """
+
+        pass
+
+    @abc.abstractmethod
+    def read_timed_waveform(
+        self, chan: int, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        read_timed_waveform
+        Transfer the waveform of the last acquisition, with the time of each
+        point relative to the trigger
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: time, volts
+        """
+
+        pass
+
+    def capture_waveforms(
+        self, chans: List[int] | None = None, points: int = 1000, delay: float = 1
+    ) -> Dict[int, np.ndarray]:
+        """
+        capture_waveforms
+        Make one acquisition, then read the waveform of each channel
+
+        Args:
+            chans (List[int] | None, optional): Defaults to None (channels turned on).
+            points (int, optional): per channel. Defaults to 1000.
+            delay (float, optional): fallback wait for the acquisition. Defaults to 1.
+
+        Returns:
+            Dict[int, np.ndarray]: channel -> volts
+        """
+
+        if chans is None:
+            chans = self.enabled_channels()
+
+        if self.simulating:
+            # Noise about 0
+            return {chan: np.random.normal(0, 1e-3, points) for chan in chans}
+
+        self.acquire(fallback=delay)
+
+        try:
+            return {chan: self.read_waveform(chan, points) for chan in chans}
+        finally:
+            self.run()
+
+    def measure_waveform_stats(
+        self, chans: List[int] | None = None, points: int = 1000, delay: float = 1
+    ) -> Dict[int, WaveformStats]:
+        """
+        measure_waveform_stats
+        Mean, RMS etc of each channel, calculated from one acquisition
+        rather than by the scope measurements
+
+        Args:
+            chans (List[int] | None, optional): Defaults to None (channels turned on).
+            points (int, optional): per channel. Defaults to 1000.
+            delay (float, optional): fallback wait for the acquisition. Defaults to 1.
+
+        Returns:
+            Dict[int, WaveformStats]: _description_
+        """
+
+        return channel_stats(self.capture_waveforms(chans, points, delay))
+
+    def measure_edge_time(
+        self,
+        chan: int,
+        level: float | None = None,
+        near: float = 0.0,
+        points: int = 10000,
+        delay: float = 1,
+    ) -> Tuple[float, float]:
+        """
+        measure_edge_time
+        Make one acquisition and find the time of the rising edge nearest
+        to near, interpolated between samples
+
+        Args:
+            chan (int): _description_
+            level (float | None, optional): Defaults to None (half way between min and max).
+            near (float, optional): seconds from the trigger. Defaults to 0.0.
+            points (int, optional): _description_. Defaults to 10000.
+            delay (float, optional): fallback wait for the acquisition. Defaults to 1.
+
+        Returns:
+            Tuple[float, float]: time (nan if no edge), level used
+        """
+
+        if self.simulating:
+            # Edge at near
+            tm = near + (np.arange(points) - points / 2) * 1e-10
+            volts = 0.5 * np.tanh((tm - near) / 5e-9)
+        else:
+            self.acquire(fallback=delay)
+
+            try:
+                tm, volts = self.read_timed_waveform(chan, points)
+            finally:
+                self.run()
+
+        if level is None:
+            level = (float(np.min(volts)) + float(np.max(volts))) / 2
+
+        return edge_crossing(tm, volts, level, near=near), level
+
+    def enabled_channels(self) -> List[int]:
+        """
+        enabled_channels
+        Channels turned on by set_channel. After a reset only channel 1 is on
+
+        Returns:
+            List[int]: _description_
+        """
+
+        settings = self.__settings()
+
+        chans = [
+            chan
+            for chan in range(1, self.num_channels + 1)
+            if settings.get(("enable", chan)) == "ON"
+        ]
+
+        return chans or [1]
+
+    @abc.abstractmethod
+    def set_cursor_position(self, cursor: str, pos: float) -> None:
+        """
+        set_cursor_position _summary_
+
+        Args:
+            cursor (str): _description_
+            pos (float): _description_
+        """
+
+        pass
+
+    def adjust_cursor(
+        self,
+        target: float,
+        tolerance: float | None = None,
+        max_iterations: int = 30,
+    ) -> int:
+        """
+        adjust_cursor
+        Adjust the cursor time until target voltage met. The crossing is
+        bracketed then found by the secant method or bisection, so takes
+        about 10 moves rather than up to 100 fixed steps
+
+        Args:
+            target (float): _description_
+            tolerance (float | None, optional): volts. Defaults to None (1 % of target).
+            max_iterations (int, optional): cursor moves. Defaults to 30.
+
+        Returns:
+            int: number of cursor moves
+        """
+
+        if tolerance is None:
+            tolerance = max(abs(target) * 0.01, 1e-3)
+
+        time_scale = self.read_query("TIM:SCAL?")
+        time_inc = time_scale / 20
+        current_x = self.read_query(self.cursor_x_query)
+        cursor = [current_x]
+
+        def measure(pos: float) -> float:
+            self.set_cursor_position(cursor="X1", pos=pos)
+            cursor[0] = pos
+            self.wait_complete(fallback=0.05)
+            return self.read_query(self.cursor_y_query)
+
+        crossing = find_crossing(
+            measure,
+            x=current_x,
+            y=self.read_query(self.cursor_y_query),
+            target=target,
+            step=time_inc,
+            tolerance=tolerance,
+            resolution=time_inc / 1000,
+            max_iterations=max_iterations,
+            lower=current_x - 5 * time_scale,  # keep on screen
+            upper=current_x + 5 * time_scale,
+        )
+
+        if not crossing.converged:
+            print(
+                f"Cursor {crossing.y} V not within {tolerance} V of {target} V "
+                f"after {crossing.iterations} moves"
+            )
+
+        # Leave the cursor at the closest point found
+        if cursor[0] != crossing.x:
+            self.set_cursor_position(cursor="X1", pos=crossing.x)
+
+        return crossing.iterations
+
     @abc.abstractmethod
     def measure_clear(self) -> None:
         """
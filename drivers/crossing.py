@@ -0,0 +1,165 @@
+"""
+# Find where a waveform crosses a voltage
+# Used to move a cursor to the time a waveform reaches a level. Each step
+# is a round trip to the scope, so rather than fixed steps the crossing is
+# bracketed with growing steps, within the limits given, then found by the
+# secant method, falling back to bisection when the secant doesn't shrink
+# the bracket enough
+# DK Oct 26
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Callable
+
+VERSION = "A.00.01"
+
+OVER_RANGE = 9e30  # scopes return 9.9e37 etc for off screen
+
+
+@dataclass(frozen=True)
+class Crossing:
+    """
+    Result of find_crossing
+    """
+
+    x: float
+    y: float
+    iterations: int  # number of times measure was called
+    converged: bool
+
+
+def find_crossing(
+    measure: Callable[[float], float],
+    x: float,
+    y: float,
+    target: float,
+    step: float,
+    tolerance: float,
+    resolution: float = 0,
+    max_iterations: int = 30,
+    lower: float = -math.inf,
+    upper: float = math.inf,
+) -> Crossing:
+    """
+    find_crossing
+    Find x where measure(x) == target. Readings beyond OVER_RANGE (eg
+    9.9e37 off screen) end the search, as not found
+
+    Args:
+        measure (Callable[[float], float]): y at x
+        x (float): start
+        y (float): y at the start, already known
+        target (float): _description_
+        step (float): first step when bracketing. The first step is to
+        larger x, the direction after that is from the slope
+        tolerance (float): y within this of the target is found
+        resolution (float, optional): stop when the bracket is this narrow.
+        Defaults to 0.
+        max_iterations (int, optional): _description_. Defaults to 30.
+        lower (float, optional): least x to measure. Defaults to -inf.
+        upper (float, optional): greatest x to measure. Defaults to inf.
+
+    Returns:
+        Crossing: the closest point found
+    """
+
+    iterations = 0
+
+    def closest(a: float, fa: float, b: float, fb: float) -> Crossing:
+        if abs(fa) <= abs(fb):
+            return Crossing(a, fa + target, iterations, abs(fa) <= tolerance)
+        return Crossing(b, fb + target, iterations, abs(fb) <= tolerance)
+
+    def clamp(pos: float) -> float:
+        return min(max(pos, lower), upper)
+
+    def sign(value: float) -> float:
+        return math.copysign(1, value)
+
+    fx = y - target
+
+    if abs(y) > OVER_RANGE:
+        return Crossing(x, y, iterations, False)
+
+    if abs(fx) <= tolerance:
+        return Crossing(x, y, iterations, True)
+
+    # First step to find the slope, backwards if at the upper limit
+    a, fa = x, fx
+    b = clamp(x + step)
+    if b == x:
+        b = clamp(x - step)
+    if b == x:
+        return Crossing(x, y, iterations, False)
+
+    fb = measure(b) - target
+    iterations += 1
+
+    if abs(fb + target) > OVER_RANGE:
+        return closest(a, fa, a, fa)
+
+    if abs(fb) <= tolerance:
+        return Crossing(b, fb + target, iterations, True)
+
+    if sign(fb) == sign(fa):
+        # Bracket, going towards the target and doubling the step until
+        # the sign changes
+        slope = (fb - fa) / (b - a)
+        direction = sign(b - a) if slope == 0 else -sign(fa) * sign(slope)
+
+        if direction == sign(b - a):
+            a, fa = b, fb  # carry on from the step already made
+
+        while True:
+            if iterations >= max_iterations:
+                return closest(a, fa, a, fa)
+
+            step *= 2
+            b = clamp(a + direction * step)
+            if b == a:
+                return closest(a, fa, a, fa)  # at the limit
+
+            fb = measure(b) - target
+            iterations += 1
+
+            if abs(fb + target) > OVER_RANGE:
+                return closest(a, fa, a, fa)
+
+            if abs(fb) <= tolerance:
+                return Crossing(b, fb + target, iterations, True)
+
+            if sign(fb) != sign(fa):
+                break
+
+            a, fa = b, fb
+
+    # Secant in the bracket, bisect if it's slow to shrink
+    width = math.inf  # before the last step
+
+    while iterations < max_iterations and abs(b - a) > resolution:
+        c = b - fb * (b - a) / (fb - fa)
+
+        # Keep clear of the ends, and bisect if the last step didn't halve it
+        lo, hi = min(a, b), max(a, b)
+        margin = (hi - lo) * 0.01
+        if not lo + margin < c < hi - margin or abs(b - a) > width / 2:
+            c = (a + b) / 2
+
+        width = abs(b - a)
+
+        fc = measure(c) - target
+        iterations += 1
+
+        if abs(fc + target) > OVER_RANGE:
+            break
+
+        if abs(fc) <= tolerance:
+            return Crossing(c, fc + target, iterations, True)
+
+        if sign(fc) == sign(fa):
+            a, fa = c, fc
+        else:
+            b, fb = c, fc
+
+    return closest(a, fa, b, fb)
@@ -3,17 +3,34 @@
 # DK Jan 2023
 """
 
-from typing import Tuple, List, Any
+from bisect import bisect_right
+from typing import Callable, Dict, Set, Tuple, List, Any
+import io
 import openpyxl
+from openpyxl import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
 from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
-import os
 import time
 import re
+import threading
 from datetime import datetime
 from pprint import pprint
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 
-VERSION = "A.00.03"
+import numpy as np
+
+try:
+    from drivers.backup_store import BackupStore
+    from drivers.result_journal import ResultJournal
+    from drivers.test_plan_cache import TestPlan, TestPlanCache
+    from drivers.workbook_saver import WorkbookSaver
+except ModuleNotFoundError:
+    from backup_store import BackupStore
+    from result_journal import ResultJournal
+    from test_plan_cache import TestPlan, TestPlanCache
+    from workbook_saver import WorkbookSaver
+
+VERSION = "A.00.13"
 
 
 @dataclass(frozen=True)
@@ -78,18 +95,59 @@ class Cell:
     value: Any
 
 
+@dataclass
+class SheetIndex:
+    """
+    Built from a single scan of the data column, so the test discovery
+    functions don't have to walk the sheet cell by cell
+    """
+
+    data_col: int
+    start_row: int
+    values: Dict[int, Any]  # row -> function cell, non empty rows only
+    test_rows: List[int]  # start row, then rows with a supported test
+    function_rows: Dict[str, List[int]]  # upper case function -> test rows
+    invalid_rows: List  # [function, row] for unsupported tests
+
+
+@dataclass
+class SheetLayout:
+    """
+    Where the named cells, table headings and channel filters are on the sheet.
+    Built once, so the lookups are dictionary hits
+    """
+
+    named_cells: Dict[str, Tuple[int, int]]  # name -> col, row
+    results_cols: Dict[int, int]  # row -> results col of its table section
+    units_cols: Dict[int, int]  # row -> units col of its table section
+    header_rows: Set[int]  # rows with a results or units heading
+    filters: Dict[int, Any]  # row -> col A channel filter
+
+
 class ExcelInterface:
     """ """
 
     __filename: str = ""
     __start_row: int = 10
     __max_row: int = 2000  # 8 channel Tek scopes very long results
-    __saved: bool = True
     __data_col = 10
     __result_col = 4
     __units_col = 6
+    __settings_cols = 10  # settings block to the right of the data column
+    __last_save: float = 0
+    __index: SheetIndex | None = None
+    __layout: SheetLayout | None = None
+    __results_headings = ("result", "measured")
+    __units_headings = ("unit",)
+    __plan: TestPlan | None = None
+    __plan_stale: bool = False  # a plan input was written since it was compiled
+    __written_plan: TestPlan | None = None  # matches the last file written
+    __wb: Workbook | None = None
+    __ws: Worksheet | None = None
+    __saver: WorkbookSaver | None = None
 
     row: int = 1
+    flush_interval: float = 30  # seconds between saves while writing results
 
     supported_test_names = [
         "BAL",
@@ -106,12 +164,32 @@ class ExcelInterface:
         # TRIG
     ]  # In order of test sequence preference - need list instead of set
 
-    def __init__(self, filename, sheetindex=0) -> None:
+    def __init__(
+        self, filename, sheetindex=0, flush_interval: float | None = None
+    ) -> None:
         self.__filename = filename
-        self.wb = openpyxl.load_workbook(
-            self.__filename, read_only=False, data_only=False
-        )
-        self.ws = self.wb.worksheets[sheetindex]  # Default is the first sheet
+        self.__sheet_index = sheetindex
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        self.__last_save = time.monotonic()
+
+        # Results are journalled as written, and only saved periodically
+        self.journal = ResultJournal(self.__filename)
+        self.__journal_lock = threading.Lock()
+        self.__journalled = 0
+
+        # If the workbook hasn't changed since the plan was compiled, it is only
+        # loaded when something not in the plan is needed (results, writing)
+        self.plan_cache = TestPlanCache(self.__filename)
+        self.backups = BackupStore(self.__filename)
+        self.__plan = self.plan_cache.load(sheetindex)
+
+        if self.__plan is None or self.journal.exists():
+            self.__load_workbook()
+
+        if self.journal.exists():
+            self.replay_journal()
+
         self.initialize()
 
     def __enter__(self):
@@ -120,6 +198,350 @@ class ExcelInterface:
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         self.close()
 
+    @property
+    def wb(self) -> Workbook:
+        """
+        wb
+        The workbook, loaded on first use
+        """
+
+        if self.__wb is None:
+            self.__load_workbook()
+
+        return self.__wb  # type: ignore
+
+    @property
+    def ws(self) -> Worksheet:
+        """
+        ws
+        The worksheet, loaded on first use
+        """
+
+        if self.__ws is None:
+            self.__load_workbook()
+
+        return self.__ws  # type: ignore
+
+    @property
+    def saver(self) -> WorkbookSaver:
+        """
+        saver
+        Background saver, started when the workbook is loaded
+        """
+
+        if self.__saver is None:
+            self.__load_workbook()
+
+        return self.__saver  # type: ignore
+
+    def __load_workbook(self) -> None:
+        """
+        __load_workbook
+        Full parse of the workbook. The plan is compiled if there wasn't
+        a valid one in the cache
+        """
+
+        # Read the file once, the same contents are hashed for the plan
+        with open(self.__filename, "rb") as infile:
+            data = infile.read()
+
+        self.__wb = openpyxl.load_workbook(
+            io.BytesIO(data), read_only=False, data_only=False
+        )
+        self.__ws = self.__wb.worksheets[self.__sheet_index]  # Default is the first
+
+        # Saving is done in the background, so measurements don't wait for it
+        self.__saver = WorkbookSaver(
+            self.__wb,
+            self.__filename,
+            on_saved=self.__workbook_saved,
+            on_written=self.__workbook_written,
+            on_cell=self.__cell_written,
+        )
+
+        if self.__plan is None:
+            self.__plan = self.plan_cache.stamp(self.__compile_plan(), data)
+            self.plan_cache.save(self.__plan)
+
+    def __cached_plan(self) -> TestPlan | None:
+        """
+        __cached_plan
+        The plan is only used until the workbook is loaded. After that the
+        sheet itself is read, as it may have been written to
+
+        Returns:
+            TestPlan | None: _description_
+        """
+
+        return self.__plan if self.__wb is None else None
+
+    def __compile_plan(self) -> TestPlan:
+        """
+        __compile_plan
+        Read everything needed to plan the tests from the loaded sheet in one pass.
+        Doesn't change the state of the interface, as it is also called from
+        the save worker
+
+        Returns:
+            TestPlan: _description_
+        """
+
+        start_row, data_col = self.__locate_start()
+
+        last_row = max(start_row, min(self.__max_row - 1, self.ws.max_row))
+        last_col = data_col + self.__settings_cols - 1
+
+        grid: Dict[int, Tuple] = {}
+        for row, values in enumerate(
+            self.ws.iter_rows(
+                min_row=1,
+                max_row=self.ws.max_row,
+                max_col=min(last_col, self.ws.max_column),
+                values_only=True,
+            ),
+            start=1,
+        ):
+            grid[row] = values
+
+        def read(col: int, row: int) -> Any:
+            values = grid.get(row, ())
+            return values[col - 1] if col <= len(values) else None
+
+        layout = self.__build_layout(read)
+
+        rows: Dict[int, Tuple] = {}
+        for row in range(start_row, last_row + 1):
+            block = tuple(read(col, row) for col in range(data_col, last_col + 1))
+            if row == start_row or block[0]:
+                rows[row] = block
+
+        return TestPlan(
+            sheet_index=self.__sheet_index,
+            size=0,
+            mtime_ns=0,
+            sha256="",
+            max_row=self.ws.max_row,
+            data_col=data_col,
+            start_row=start_row,
+            named_cells={
+                name: (col, row, self.ws.cell(column=col, row=row).value)
+                for name, (col, row) in layout.named_cells.items()
+            },
+            rows=rows,
+            results_cols=layout.results_cols,
+            units_cols=layout.units_cols,
+            header_rows=sorted(layout.header_rows),
+            filters=layout.filters,
+        )
+
+    def get_layout(self) -> SheetLayout:
+        """
+        get_layout
+        Get the layout map, building it if the headings or filters have changed
+
+        Returns:
+            SheetLayout: _description_
+        """
+
+        if self.__layout is None:
+            if plan := self.__cached_plan():
+                self.__layout = SheetLayout(
+                    named_cells={
+                        name: (col, row)
+                        for name, (col, row, _) in plan.named_cells.items()
+                    },
+                    results_cols=plan.results_cols,
+                    units_cols=plan.units_cols,
+                    header_rows=set(plan.header_rows),
+                    filters=plan.filters,
+                )
+            else:
+                self.__layout = self.__build_layout()
+
+        return self.__layout
+
+    def __build_layout(
+        self, read: Callable[[int, int], Any] | None = None
+    ) -> SheetLayout:
+        """
+        __build_layout
+        One pass over the first columns of the sheet to find the table headings
+        and the channel filters. Doesn't change the state of the interface, as
+        it is also called from the save worker
+
+        Args:
+            read (Callable[[int, int], Any] | None, optional): cell reader (col, row)
+            if the sheet has already been read. Defaults to None.
+
+        Returns:
+            SheetLayout: _description_
+        """
+
+        named_cells: Dict[str, Tuple[int, int]] = {}
+        for name in list(self.wb.defined_names):
+            try:
+                if cell := self.__read_named_cell(name):
+                    named_cells[name] = (cell.col, cell.row)
+            except Exception:
+                # Ranges the named cell lookup doesn't support
+                continue
+
+        last_row = self.ws.max_row
+
+        if read is None:
+            grid = dict(
+                enumerate(
+                    self.ws.iter_rows(
+                        min_row=1,
+                        max_row=last_row,
+                        max_col=min(9, self.ws.max_column),
+                        values_only=True,
+                    ),
+                    start=1,
+                )
+            )
+
+            def read(col: int, row: int) -> Any:
+                values = grid.get(row, ())
+                return values[col - 1] if col <= len(values) else None
+
+        results_headers: Dict[int, int] = {}
+        units_headers: Dict[int, int] = {}
+        filters: Dict[int, Any] = {}
+
+        for row in range(1, last_row + 1):
+            if (filt := read(1, row)) is not None:
+                filters[row] = filt
+
+            if row < 10:  # All sheets have header rows, headings are below them
+                continue
+
+            for col in range(1, 10):
+                heading = str(read(col, row)).lower()
+
+                if any(word in heading for word in self.__results_headings):
+                    results_headers.setdefault(row, col)
+
+                if any(word in heading for word in self.__units_headings):
+                    units_headers.setdefault(row, col)
+
+        return SheetLayout(
+            named_cells=named_cells,
+            results_cols=self.__section_cols(results_headers, last_row),
+            units_cols=self.__section_cols(units_headers, last_row),
+            header_rows=set(results_headers) | set(units_headers),
+            filters=filters,
+        )
+
+    def __section_cols(self, headers: Dict[int, int], last_row: int) -> Dict[int, int]:
+        """
+        __section_cols
+        Map each row to the column of the heading above it. Some sections have
+        comment rows, so the heading can be up to 4 rows above
+
+        Args:
+            headers (Dict[int, int]): heading row -> col
+            last_row (int): last used row of the sheet
+
+        Returns:
+            Dict[int, int]: row -> col, rows without a heading aren't included
+        """
+
+        cols: Dict[int, int] = {}
+
+        for row in range(11, last_row + 5):
+            for header in range(row - 1, max(row - 5, 9), -1):
+                if header in headers:
+                    cols[row] = headers[header]
+                    break
+
+        return cols
+
+    def __workbook_written(self) -> None:
+        """
+        __workbook_written
+        Called from the save worker with the workbook locked, so the plan
+        matches the file just written. Only recompiled if a plan input was
+        written, usually only results have changed
+        """
+
+        if not self.__plan_stale and self.__plan is not None:
+            self.__written_plan = self.__plan
+            return
+
+        # Cleared first, so a write while compiling is picked up next save
+        self.__plan_stale = False
+
+        try:
+            self.__written_plan = self.__compile_plan()
+        except Exception as ex:
+            # Only a cache, the workbook is parsed next time
+            print(f"Unable to update test plan: {ex}")
+            self.__written_plan = None
+            self.__plan_stale = True
+            self.plan_cache.clear()
+
+    def __stamp_plan(self) -> None:
+        """
+        __stamp_plan
+        Record the file just written in the plan and save it, so the cache is
+        valid the next time the workbook is opened. Done after the workbook
+        is unlocked, as the file is read to hash it
+        """
+
+        if (plan := self.__written_plan) is None:
+            return
+
+        try:
+            self.__plan = self.plan_cache.stamp(plan)
+            self.plan_cache.save(self.__plan)
+        except Exception as ex:
+            print(f"Unable to update test plan: {ex}")
+            self.plan_cache.clear()
+
+    def __cell_written(self, sheet: int, row: int, col: int, value: Any) -> None:
+        """
+        __cell_written
+        Called by the saver with the workbook locked as each write is put in
+        it, so a write the save worker hasn't compiled into the plan always
+        leaves the plan stale
+
+        Args:
+            sheet (int): _description_
+            row (int): _description_
+            col (int): _description_
+            value (Any): _description_
+        """
+
+        if sheet == self.__sheet_index and self.__touches_plan(col, row, value):
+            self.__plan_stale = True
+
+    def __touches_plan(self, col: int, row: int, value: Any) -> bool:
+        """
+        __touches_plan
+        Check if writing the cell changes anything in the plan
+
+        Args:
+            col (int): _description_
+            row (int): _description_
+            value (Any): _description_
+
+        Returns:
+            bool: _description_
+        """
+
+        if (plan := self.__plan) is None:
+            return True
+
+        return (
+            col == 1
+            or row > plan.max_row
+            or row in plan.header_rows
+            or plan.data_col <= col < plan.data_col + self.__settings_cols
+            or (col < 10 and isinstance(value, str) and self.__is_heading(value))
+            or any((col, row) == (c, r) for c, r, _ in plan.named_cells.values())
+        )
+
     def read_result(self) -> float | Any:
         """
         read_result
@@ -129,19 +551,28 @@ class ExcelInterface:
             float: _description_
         """
 
-        return self.ws.cell(column=self.__result_col, row=self.row).value
+        return self.read_cell(col=self.__result_col, row=self.row)
 
     def close(self) -> None:  # sourcery skip: raise-specific-error
         """
-        close _summary_
+        close
+        Wait for the final save to complete. This is the only time
+        the caller blocks on saving
 
         Raises:
             Exception: _description_
         """
-        if not self.__saved:
-            self.save_sheet()
 
-        if not self.__saved:
+        self.backups.wait()
+
+        if self.__saver is None:
+            # Only the plan was used, nothing to save
+            self.journal.close()
+            return
+
+        if not self.saver.close():
+            # Journal is left on disk, results are recovered on next open
+            self.journal.close()
             raise Exception("Unable to save")
 
         self.wb.close()
@@ -156,16 +587,31 @@ class ExcelInterface:
         * Default value in __start_row
         """
 
-        if nr := self.get_named_cell("StartCell"):
-            self.row = nr.row  # type: ignore
-            self.__data_col = nr.col  # type: ignore
-        elif rw := self.ws.cell(column=self.__data_col, row=1).value:
+        if plan := self.__cached_plan():
+            self.row = plan.start_row
+            self.__data_col = plan.data_col
+        else:
+            self.row, self.__data_col = self.__locate_start()
+
+    def __locate_start(self) -> Tuple[int, int]:
+        """
+        __locate_start
+        Find the start row and data column in the sheet
+
+        Returns:
+            Tuple[int, int]: row, col
+        """
+
+        if nr := self.__read_named_cell("StartCell"):
+            return nr.row, nr.col
+
+        if rw := self.ws.cell(column=self.__data_col, row=1).value:
             try:
-                self.row = int(rw)  # type: ignore
+                return int(rw), self.__data_col  # type: ignore
             except ValueError:
-                self.row = self.__start_row
-        else:
-            self.row = self.__start_row
+                pass
+
+        return self.__start_row, self.__data_col
 
     def check_excel_available(self) -> bool:
         """
@@ -176,7 +622,10 @@ class ExcelInterface:
         available = True
 
         try:
-            self.wb.save(self.__filename)
+            with self.saver.lock:
+                self.wb.save(self.__filename)
+                self.__workbook_written()
+            self.__stamp_plan()
         except PermissionError:
             available = False
 
@@ -209,34 +658,152 @@ class ExcelInterface:
 
         return bool(nr)
 
-    def backup(self) -> None:
+    def backup(self) -> str:
         """
         backup
         If the software crashes while the Excel instance is still open, it can corrupt the sheet
+        The file on disk is copied in the background, and only if it has changed
+        since the last backup
+
+        Returns:
+            str: backup filename
         """
 
-        head, tail = os.path.split(self.__filename)
+        return self.backups.backup()
 
-        backup_path = os.path.join(head, "Backups")
-        fname = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{tail}"
-        backup_name = os.path.join(backup_path, fname)
+    def save_sheet(self) -> None:
+        """
+        save_sheet
+        Request a save by the background worker. Returns immediately,
+        back to back requests are coalesced
+        """
 
-        if not os.path.exists(backup_path):
-            os.mkdir(backup_path)
+        self.__last_save = time.monotonic()
+        self.saver.request()
 
-        self.wb.save(backup_name)
+    def flush(self) -> None:
+        """
+        flush
+        Save any journalled results to the workbook. Call at test boundaries
+        """
 
-    def save_sheet(self) -> None:
+        if self.saver.dirty:
+            self.save_sheet()
+
+    def save_if_due(self) -> None:
         """
-        save_sheet _summary_
+        save_if_due
+        Save the workbook if the flush interval has elapsed since the last save.
+        Results are already in the journal, so nothing is lost if not saved
         """
-        try:
-            # sometimes it throws an error if too quick
-            self.wb.save(self.__filename)
-            self.__saved = True
-        except Exception:
-            time.sleep(1)
-            self.__saved = False
+
+        if time.monotonic() - self.__last_save >= self.flush_interval:
+            self.flush()
+
+    def replay_journal(self) -> None:
+        """
+        replay_journal
+        The previous run finished without saving all of the results,
+        write them back into the sheet from the journal
+        """
+
+        entries = self.journal.read()
+
+        if entries:
+            self.__plan_stale = True
+
+        with self.__journal_lock:
+            for entry in entries:
+                self.__journalled = self.saver.write_cell(
+                    sheet=entry.sheet, row=entry.row, col=entry.col, value=entry.value
+                )
+
+        if entries:
+            print(f"Recovered {len(entries)} results from {self.journal.path}")
+            self.save_sheet()
+        else:
+            self.journal.clear()
+
+    def __workbook_saved(self, changes: int) -> None:
+        """
+        __workbook_saved
+        Called from the save worker. Remove the journal if all of the
+        journalled changes are in the saved file, and update the plan cache
+
+        Args:
+            changes (int): number of changes in the save
+        """
+
+        with self.__journal_lock:
+            if changes >= self.__journalled:
+                self.journal.clear()
+
+        self.__stamp_plan()
+
+    def write_cell(self, col: int, row: int, value: Any) -> None:
+        """
+        write_cell
+        Write a value to the sheet and journal it. The workbook is not saved
+
+        Args:
+            col (int): _description_
+            row (int): _description_
+            value (Any): _description_
+        """
+
+        if col == self.__data_col:
+            self.__index = None  # test functions changed
+
+        if (
+            col == 1
+            or (self.__layout and row in self.__layout.header_rows)
+            or (isinstance(value, str) and self.__is_heading(value))
+        ):
+            self.__layout = None  # channel filters or headings changed
+
+        with self.__journal_lock:
+            self.journal.append(sheet=self.__sheet_index, row=row, col=col, value=value)
+            self.__journalled = self.saver.write_cell(
+                sheet=self.__sheet_index, row=row, col=col, value=value
+            )
+
+    def __is_heading(self, text: str) -> bool:
+        """
+        __is_heading
+        Check if the text would be a results or units heading
+
+        Args:
+            text (str): _description_
+
+        Returns:
+            bool: _description_
+        """
+
+        text = text.lower()
+
+        return any(
+            word in text for word in self.__results_headings + self.__units_headings
+        )
+
+    def read_cell(self, col: int, row: int) -> Any:
+        """
+        read_cell
+        Read a cell, including values written but not yet in the workbook
+        because a save was in progress
+
+        Args:
+            col (int): _description_
+            row (int): _description_
+
+        Returns:
+            Any: _description_
+        """
+
+        found, value = self.saver.deferred_value(
+            sheet=self.__sheet_index, row=row, col=col
+        )
+
+        return value if found else self.__settings_value(col=col, row=row)
 
     def parse_value(self, val: str | float | int) -> str | float | int:
         """
@@ -313,6 +880,35 @@ class ExcelInterface:
             Tuple: col and row numbers
         """
 
+        if plan := self.__cached_plan():
+            if name not in plan.named_cells:
+                return None  # type: ignore
+
+            col, row, value = plan.named_cells[name]
+
+            return Cell(col=col, row=row, value=value)
+
+        layout = self.get_layout()
+
+        if name not in layout.named_cells:
+            return None  # type: ignore
+
+        col, row = layout.named_cells[name]
+
+        return Cell(col=col, row=row, value=self.read_cell(col=col, row=row))
+
+    def __read_named_cell(self, name: str) -> Cell:
+        """
+        __read_named_cell
+        Look up the named range in the workbook
+
+        Args:
+            name (str): named range
+
+        Returns:
+            Cell: _description_
+        """
+
         try:
             rng = self.wb.defined_names[name]  # type: ignore
 
@@ -337,16 +933,120 @@ class ExcelInterface:
             int: Number of rows with setup data
         """
 
-        number_tests = 1  # Start row is pointing to first test
+        self.initialize()  # Make sure row is reset
 
+        # Start row is pointing to first test
+        return len(self.get_index().test_rows)
+
+    def get_index(self) -> SheetIndex:
+        """
+        get_index
+        Get the row index for the data column, building it if the start cell
+        has moved or the data column has been written to
+
+        Returns:
+            SheetIndex: _description_
+        """
+
+        start_row = self.row
         self.initialize()
+        start_row, self.row = self.row, start_row
 
-        while self.get_next_row():
-            number_tests += 1
+        if (
+            self.__index is None
+            or self.__index.data_col != self.__data_col
+            or self.__index.start_row != start_row
+        ):
+            self.__index = self.__build_index(start_row)
 
-        self.initialize()  # Make sure row is reset
+        return self.__index
+
+    def __build_index(self, start_row: int) -> SheetIndex:
+        """
+        __build_index
+        One pass down the data column
+
+        Args:
+            start_row (int): first row of the test data
 
-        return number_tests
+        Returns:
+            SheetIndex: _description_
+        """
+
+        values: Dict[int, Any] = {}
+        test_rows: List[int] = []
+        function_rows: Dict[str, List[int]] = {}
+        invalid_rows = []
+
+        if plan := self.__cached_plan():
+            # Plan has the start row and every row with a function
+            column = [(row, plan.rows[row][0]) for row in sorted(plan.rows)]
+        else:
+            # Don't read past the used range, that only creates empty cells
+            last_row = min(self.__max_row - 1, self.ws.max_row)
+
+            column = [
+                (row, val)
+                for row, (val,) in enumerate(
+                    self.ws.iter_rows(
+                        min_row=start_row,
+                        max_row=max(start_row, last_row),
+                        min_col=self.__data_col,
+                        max_col=self.__data_col,
+                        values_only=True,
+                    ),
+                    start=start_row,
+                )
+            ]
+
+        for row, val in column:
+            if val:
+                values[row] = val
+                if val not in self.supported_test_names:
+                    invalid_rows.append([val, row])
+
+            # The start row is always the first test
+            if row == start_row or (
+                val and str(val).upper() in self.supported_test_names
+            ):
+                test_rows.append(row)
+                function_rows.setdefault(str(val).upper(), []).append(row)
+
+        return SheetIndex(
+            data_col=self.__data_col,
+            start_row=start_row,
+            values=values,
+            test_rows=test_rows,
+            function_rows=function_rows,
+            invalid_rows=invalid_rows,
+        )
+
+    def __match_rows(self, test_filter: str) -> List[int]:
+        """
+        __match_rows
+        Get the test rows where the function matches the filter
+
+        Args:
+            test_filter (str): test name, or * for wildcard
+
+        Returns:
+            List[int]: _description_
+        """
+
+        index = self.get_index()
+
+        test_filter = test_filter.replace("*", ".")
+        if "." not in test_filter:
+            # Not using wildcard, make exact match on whole word
+            return list(index.function_rows.get(test_filter, []))
+
+        pattern = re.compile(test_filter)
+
+        return [
+            row
+            for row in index.test_rows
+            if pattern.match(str(index.values.get(row)).upper())
+        ]
 
     def get_next_row(self, supported_only: bool = True) -> bool:
         """
@@ -355,26 +1055,19 @@ class ExcelInterface:
         Returns:
             bool: False when reached end of settings
         """
-        valid = True
+        index = self.get_index()
 
-        self.row += 1
+        rows = index.test_rows if supported_only else list(index.values)
 
-        while True:
-            if val := self.ws.cell(column=self.__data_col, row=self.row).value:
-                if str(val).upper() in self.supported_test_names and supported_only:
-                    break
+        position = bisect_right(rows, self.row)
 
-                if not supported_only:
-                    break
+        if position < len(rows):
+            self.row = rows[position]
+            return True
 
-            self.row += 1
-            if self.row >= self.__max_row:
-                valid = False
-                break
-        if self.row >= self.__max_row:
-            valid = False
+        self.row = self.__max_row
 
-        return valid
+        return False
 
     def get_test_name(self, row: int) -> tuple[str, int]:
         """
@@ -388,16 +1081,72 @@ class ExcelInterface:
             str: _description_
         """
 
-        test_name = str(self.ws.cell(column=self.__data_col, row=row).value)
+        test_name = str(self.__settings_value(col=self.__data_col, row=row))
         try:
             # Not all tests have a channel, such as TIME. In the readahead for DCV test consolidation,
             # if all tests have been selected then it will read settings for everything
-            channel = int(str(self.ws.cell(column=self.__data_col + 1, row=row).value))
+            channel = int(str(self.__settings_value(col=self.__data_col + 1, row=row)))
         except Exception:
             channel = 1
 
         return test_name, channel
 
+    def __settings_value(self, col: int, row: int) -> Any:
+        """
+        __settings_value
+        Read a cell in the settings block, from the plan if possible
+
+        Args:
+            col (int): _description_
+            row (int): _description_
+
+        Returns:
+            Any: _description_
+        """
+
+        if (plan := self.__cached_plan()) and row in plan.rows:
+            offset = col - plan.data_col
+            if 0 <= offset < len(plan.rows[row]):
+                return plan.rows[row][offset]
+
+        return self.ws.cell(column=col, row=row).value
+
+    def __settings_rows(self, rows: List[int]) -> Dict[int, Tuple]:
+        """
+        __settings_rows
+        Read the settings block for the rows, function column first.
+        Rows not in the plan are read from the sheet in a single pass
+
+        Args:
+            rows (List[int]): _description_
+
+        Returns:
+            Dict[int, Tuple]: row -> values
+        """
+
+        blocks: Dict[int, Tuple] = {}
+
+        plan = self.__cached_plan()
+        if plan and plan.data_col == self.__data_col:
+            blocks = {row: plan.rows[row] for row in rows if row in plan.rows}
+
+        if missing := sorted(set(rows) - set(blocks)):
+            wanted = set(missing)
+            for row, values in enumerate(
+                self.ws.iter_rows(
+                    min_row=missing[0],
+                    max_row=missing[-1],
+                    min_col=self.__data_col,
+                    max_col=self.__data_col + self.__settings_cols - 1,
+                    values_only=True,
+                ),
+                start=missing[0],
+            ):
+                if row in wanted:
+                    blocks[row] = values
+
+        return blocks
+
     def get_test_rows(self, test_filter: str = "*") -> List:
         """
         get_test_rows
@@ -409,24 +1158,7 @@ class ExcelInterface:
 
         self.initialize()
 
-        test_rows = []
-        test_filter = test_filter.replace("*", ".")
-        if "." not in test_filter:
-            # Not using wildcard, make exact match on whole word
-            test_filter = f"^{test_filter}$"
-
-        while True:
-            # match against the filter
-            # Use a filter, but . is anything not *
-
-            setting = self.get_volt_settings()
-            if re.match(test_filter, setting.function):  # type: ignore
-                test_rows.append(self.row)
-
-            if not self.get_next_row():
-                break
-
-        return test_rows
+        return self.__match_rows(test_filter)
 
     def get_tb_test_settings(self, row: int = -1) -> TimebaseSettings:
         """
@@ -443,21 +1175,24 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        col = self.__data_col
-        func = str(self.ws.cell(column=col, row=row).value).upper()
-        col += 1
-        channel = self.ws.cell(column=col, row=row).value
-        col += 1
-        tb = self.ws.cell(column=col, row=row).value
-        col += 1
-        impedance = self.ws.cell(column=col, row=row).value
-        col += 1
-        bandwidth = self.ws.cell(column=col, row=row).value
-        col += 1
-        delay_period = self.ws.cell(column=col, row=row).value
+        return self.__tb_test_settings(self.__settings_rows([row])[row])
+
+    def __tb_test_settings(self, values: Tuple) -> TimebaseSettings:
+        """
+        __tb_test_settings
+        Timebase settings from the row values
+
+        Args:
+            values (Tuple): settings block, function column first
+
+        Returns:
+            TimebaseSettings: _description_
+        """
+
+        func, channel, tb, impedance, bandwidth, delay_period = values[:6]
 
         return TimebaseSettings(
-            function=func,
+            function=str(func).upper(),
             channel=channel,  # type: ignore
             timebase=tb,  # type: ignore
             impedance=impedance,  # type: ignore
@@ -480,25 +1215,26 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        col = self.__data_col
-        func = str(self.ws.cell(column=col, row=row).value).upper()
-        col += 1
-        channel = self.ws.cell(column=col, row=row).value
-        col += 1
-        scale = self.ws.cell(column=col, row=row).value
-        col += 1
-        voltage = self.ws.cell(column=col, row=row).value
-        col += 1
-        impedance = self.ws.cell(column=col, row=row).value
-        col += 1
-        frequency = self.ws.cell(column=col, row=row).value
-        col += 1
-        edge = self.ws.cell(column=col, row=row).value
+        return self.__trigger_settings(self.__settings_rows([row])[row])
+
+    def __trigger_settings(self, values: Tuple) -> TriggerSettings:
+        """
+        __trigger_settings
+        Trigger settings from the row values
+
+        Args:
+            values (Tuple): settings block, function column first
+
+        Returns:
+            TriggerSettings: _description_
+        """
+
+        func, channel, scale, voltage, impedance, frequency, edge = values[:7]
 
         edge_select = "F" if edge and edge.lower() == "f" else "R"  # type: ignore
 
         return TriggerSettings(
-            function=func,
+            function=str(func).upper(),
             channel=channel,  # type: ignore
             scale=scale,  # type: ignore
             voltage=voltage,  # type: ignore
@@ -522,32 +1258,44 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        col = self.__data_col
-        func = str(self.ws.cell(column=col, row=row).value).upper()
-        col += 1
-        chan = self.ws.cell(column=col, row=row).value
-        col += 1
-        coupling = self.ws.cell(column=col, row=row).value
-        col += 1
-        scale = self.ws.cell(column=col, row=row).value
-        col += 1
-        voltage = self.ws.cell(column=col, row=row).value
-        col += 1
-        offset = self.ws.cell(column=col, row=row).value
-        col += 1
-        bandwidth = self.ws.cell(column=col, row=row).value
-        col += 1
-        impedance = self.ws.cell(column=col, row=row).value
-        col += 1
-        invert = str(self.ws.cell(column=col, row=row).value)
+        return self.__volt_settings(self.__settings_rows([row])[row])
+
+    def __volt_settings(self, values: Tuple) -> DcvSettings:
+        """
+        __volt_settings
+        DC voltage settings from the row values
+
+        Args:
+            values (Tuple): settings block, function column first
+
+        Returns:
+            DcvSettings: _description_
+        """
+
+        (
+            func,
+            chan,
+            coupling,
+            scale,
+            voltage,
+            offset,
+            bandwidth,
+            impedance,
+            invert,
+            mode,
+        ) = values[:10]
+
+        if offset is None or offset == "":
+            offset = 0.0  # blank is no offset
+
+        invert = str(invert)
         inverted = bool(invert and invert.lower() == "y") or invert == "1"
-        col += 1
-        mode = str(self.ws.cell(column=col, row=row).value)
+        mode = str(mode)
         if mode:
             mode = mode.upper()
 
         return DcvSettings(
-            function=func,
+            function=str(func).upper(),
             channel=chan,  # type: ignore
             coupling=coupling,  # type: ignore
             scale=scale,  # type: ignore
@@ -573,32 +1321,33 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        col = self.__data_col
-        func = str(self.ws.cell(column=col, row=row).value).upper()
-        col += 1
-        chan = self.ws.cell(column=col, row=row).value
-        col += 1
-        coupling = self.ws.cell(column=col, row=row).value
-        col += 1
-        scale = self.ws.cell(column=col, row=row).value
-        col += 1
-        voltage = self.ws.cell(column=col, row=row).value
-        col += 1
-        timebase = self.ws.cell(column=col, row=row).value
-        col += 1
-        sample_rate = self.parse_value(self.ws.cell(column=col, row=row).value)  # type: ignore
-        col += 1
-        frequency = self.parse_value(self.ws.cell(column=col, row=row).value)  # type: ignore
+        return self.__sample_rate_settings(self.__settings_rows([row])[row])
+
+    def __sample_rate_settings(self, values: Tuple) -> SamplingSettings:
+        """
+        __sample_rate_settings
+        Sampling settings from the row values
+
+        Args:
+            values (Tuple): settings block, function column first
+
+        Returns:
+            SamplingSettings: _description_
+        """
+
+        func, chan, coupling, scale, voltage, timebase, sample_rate, frequency = values[
+            :8
+        ]
 
         return SamplingSettings(
-            function=func,
+            function=str(func).upper(),
             channel=chan,  # type: ignore
             coupling=coupling,  # type: ignore
             scale=scale,  # type: ignore
             voltage=voltage,  # type: ignore
             timebase=timebase,  # type: ignore
-            sample_rate=sample_rate,  # type: ignore
-            frequency=frequency,  # type: ignore
+            sample_rate=self.parse_value(sample_rate),  # type: ignore
+            frequency=self.parse_value(frequency),  # type: ignore
         )
 
     def get_threshold_settings(self, row: int = -1) -> ThresholdSettings:
@@ -612,17 +1361,24 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        col = self.__data_col
-        func = str(self.ws.cell(column=col, row=row).value).upper()
-        col += 1
-        pod = self.ws.cell(column=col, row=row).value
-        col += 1
-        voltage = self.ws.cell(column=col, row=row).value
-        col += 1
-        pol = self.ws.cell(column=col, row=row).value
+        return self.__threshold_settings(self.__settings_rows([row])[row])
+
+    def __threshold_settings(self, values: Tuple) -> ThresholdSettings:
+        """
+        __threshold_settings
+        Threshold settings from the row values
+
+        Args:
+            values (Tuple): settings block, function column first
+
+        Returns:
+            ThresholdSettings: _description_
+        """
+
+        func, pod, voltage, pol = values[:4]
 
         return ThresholdSettings(
-            function=func, pod=pod, voltage=voltage, polarity=pol  # type: ignore
+            function=str(func).upper(), pod=pod, voltage=voltage, polarity=pol  # type: ignore
         )
 
     def get_all_test_settings(self, test_filter: str = "*") -> List:
@@ -636,22 +1392,98 @@ class ExcelInterface:
 
         self.initialize()
 
-        tests = []
-        test_filter = test_filter.replace("*", ".")
-        if "." not in test_filter:
-            # Use exact match on whole word
-            test_filter = f"^{test_filter}$"
+        rows = self.__match_rows(test_filter)
+        blocks = self.__settings_rows(rows)
 
-        while True:
-            setting = self.get_volt_settings()
+        return [self.__volt_settings(blocks[row]) for row in rows]
 
-            if re.match(test_filter, setting.function):  # type: ignore
-                tests.append(setting)
+    def get_settings_array(
+        self,
+        settings_type: type = DcvSettings,
+        rows: List[int] | None = None,
+        test_filter: str = "*",
+    ) -> np.recarray:
+        """
+        get_settings_array
+        Get the settings for many rows at once, as a record array with a field
+        for each settings field, plus the row. The data block is read in one pass.
+        Float fields have the SI multipliers applied (10m -> 0.01), with blank
+        cells NaN. Fields which can't be stored as numbers are objects
 
-            if not self.get_next_row():
-                break
+        Args:
+            settings_type (type, optional): settings dataclass. Defaults to DcvSettings.
+            rows (List[int] | None, optional): rows to read, if not using the filter. Defaults to None.
+            test_filter (str, optional): test name, or * for wildcard. Defaults to "*".
 
-        return tests
+        Returns:
+            np.recarray: eg settings.scale[i] or settings[i].scale
+        """
+
+        parsers = {
+            DcvSettings: self.__volt_settings,
+            TimebaseSettings: self.__tb_test_settings,
+            TriggerSettings: self.__trigger_settings,
+            SamplingSettings: self.__sample_rate_settings,
+            ThresholdSettings: self.__threshold_settings,
+        }
+
+        self.initialize()
+
+        if rows is None:
+            rows = self.__match_rows(test_filter)
+
+        blocks = self.__settings_rows(rows)
+        settings = [parsers[settings_type](blocks[row]) for row in rows]
+
+        names = ["row"]
+        columns = [np.array(rows, dtype=np.int64)]
+
+        for fld in fields(settings_type):
+            names.append(fld.name)
+            columns.append(
+                self.__settings_column(
+                    [getattr(setting, fld.name) for setting in settings], fld.type
+                )
+            )
+
+        return np.rec.fromarrays(columns, names=names)
+
+    def __settings_column(self, values: List, field_type: Any) -> np.ndarray:
+        """
+        __settings_column
+        Convert the values of one settings field to the best array type
+
+        Args:
+            values (List): _description_
+            field_type (Any): type annotation of the field
+
+        Returns:
+            np.ndarray: _description_
+        """
+
+        try:
+            if field_type is bool:
+                return np.array(values, dtype=np.bool_)
+
+            if field_type is float:
+                return np.array(
+                    [
+                        np.nan if val is None else float(self.parse_value(val))
+                        for val in values
+                    ],
+                    dtype=np.float64,
+                )
+
+            if field_type is int and all(type(val) is int for val in values):
+                return np.array(values, dtype=np.int64)
+        except (ValueError, TypeError):
+            # Text in a numeric column
+            pass
+
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+
+        return column
 
     def get_test_types(self) -> set:
         """
@@ -664,17 +1496,10 @@ class ExcelInterface:
 
         self.initialize()
 
-        test_types = set()
-
-        while True:
-            if test_name := self.ws.cell(column=self.__data_col, row=self.row).value:
-                if test_name not in []:  # TODO list of ignore tests if required
-                    test_types.add(test_name)
+        index = self.get_index()
 
-            if not self.get_next_row():
-                break
-
-        return test_types
+        # TODO list of ignore tests if required
+        return {index.values[row] for row in index.test_rows if row in index.values}
 
     def get_invalid_tests(self) -> List:
         """
@@ -687,17 +1512,7 @@ class ExcelInterface:
 
         self.initialize()
 
-        invalid_rows = []
-
-        while True:
-            if test_name := self.ws.cell(column=self.__data_col, row=self.row).value:
-                if test_name not in self.supported_test_names:
-                    invalid_rows.append([test_name, self.row])
-
-            if not self.get_next_row(supported_only=False):
-                break
-
-        return invalid_rows
+        return [list(invalid) for invalid in self.get_index().invalid_rows]
 
     def get_units(self) -> str:
         """
@@ -726,24 +1541,12 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        row_count = 0
+        col = self.get_layout().units_cols.get(row, 0)
 
-        while True:
-            # some have comment rows, so keep going backwards until found
-            row -= 1
-            row_count += 1
-
-            if row_count >= 5 or row < 10:  # All sheets have header rows
-                return 0
-
-            for col in range(1, 10):
-                heading = str(self.ws.cell(column=col, row=row).value).lower()
+        if col:
+            self.__units_col = col
 
-                if "unit" in heading:
-                    self.__units_col = col
-                    return col
-
-            # not found
+        return col
 
     def find_results_col(self, row: int = -1) -> int:
         """
@@ -761,23 +1564,7 @@ class ExcelInterface:
         if row == -1:
             row = self.row
 
-        row_count = 0
-
-        while True:
-            # some have comment rows, so keep going backwards until found
-            row -= 1
-            row_count += 1
-
-            if row_count >= 5 or row < 10:  # All sheets have header rows
-                return 0
-
-            for col in range(1, 10):
-                heading = str(self.ws.cell(column=col, row=row).value).lower()
-
-                if "result" in heading or "measured" in heading:
-                    return col
-
-            # not found
+        return self.get_layout().results_cols.get(row, 0)
 
     def write_result(
         self, result: float | str, save: bool = True, col: int = 0
@@ -785,16 +1572,19 @@ class ExcelInterface:
         """
         write_result
         Write the data to the sheet at the current row
+        The result is journalled immediately, the workbook is saved when the
+        flush interval has elapsed (or at flush/close)
 
         Args:
             result (_type_): _description_
+            save (bool): allow a save if the flush interval has elapsed
         """
 
         res_col = col or self.__result_col
-        self.ws.cell(column=res_col, row=self.row).value = result
+        self.write_cell(col=res_col, row=self.row, value=result)
 
         if save:
-            self.save_sheet()
+            self.save_if_due()
 
     def write_data(self, data: float | int | str, named_range: str) -> bool:
         """
@@ -813,8 +1603,8 @@ class ExcelInterface:
         """
 
         if nr := self.get_named_cell(named_range):
-            self.ws.cell(column=nr.col, row=nr.row).value = data
-            self.save_sheet()
+            self.write_cell(col=nr.col, row=nr.row, value=data)
+            self.save_if_due()
             return True
 
         return False
@@ -826,12 +1616,12 @@ class ExcelInterface:
         """
 
         if nr := self.get_named_cell("CalDate"):
-            self.ws.cell(column=nr.col, row=nr.row).value = datetime.today()
+            self.write_cell(col=nr.col, row=nr.row, value=datetime.today())
 
         elif nr := self.get_named_cell("Model"):
-            self.ws.cell(column=nr.col, row=nr.row - 1).value = datetime.today()
+            self.write_cell(col=nr.col, row=nr.row - 1, value=datetime.today())
 
-        self.save_sheet()
+        self.save_if_due()
 
     def check_empty_result(self, col: int) -> bool:
         """
@@ -845,7 +1635,7 @@ class ExcelInterface:
             bool: _description_
         """
 
-        val = self.ws.cell(column=col, row=self.row).value
+        val = self.read_cell(col=col, row=self.row)
 
         return val is None
 
@@ -853,7 +1643,10 @@ class ExcelInterface:
         """
         hide_excel_rows
         Hide rows from results sheet where the template has more channels than the UUT
-        Col A contains the channel filter
+        Col A contains the channel filter. Only rows with a filter are hidden, and
+        only rows already hidden are shown again, so no other rows are touched.
+        Each contiguous range is hidden as an outline group, so it can be
+        expanded in Excel
 
         Args:
             channel (int): _description_
@@ -861,16 +1654,64 @@ class ExcelInterface:
 
         self.initialize()
 
-        row = self.row
+        hide = [
+            row
+            for row, filt in sorted(self.get_layout().filters.items())
+            if self.row <= row < self.__max_row
+            and isinstance(filt, (int, float))
+            and filt > channel
+        ]
+
+        changed = False
+
+        with self.saver.lock:
+            dims = self.ws.row_dimensions
+
+            # Rows hidden for a UUT with fewer channels
+            hidden = set(hide)
+            for row, dim in list(dims.items()):
+                if (
+                    self.row <= row < self.__max_row
+                    and dim.hidden
+                    and row not in hidden
+                ):
+                    dim.hidden = False
+                    dim.outline_level = 0
+                    changed = True
+
+            for first, last in self.__row_runs(hide):
+                if not all(
+                    dims[row].hidden and dims[row].outline_level
+                    for row in range(first, last + 1)
+                ):
+                    dims.group(first, last, hidden=True)
+                    changed = True
+
+        if changed:
+            self.saver.mark_dirty()
+            self.save_sheet()
 
-        while row < self.__max_row:
-            filt = self.ws.cell(column=1, row=row).value
+    def __row_runs(self, rows: List[int]) -> List[Tuple[int, int]]:
+        """
+        __row_runs
+        Group sorted rows into contiguous ranges
+
+        Args:
+            rows (List[int]): sorted row numbers
+
+        Returns:
+            List[Tuple[int, int]]: first and last row of each range
+        """
 
-            self.ws.row_dimensions[row].hidden = filt and filt > channel  # type: ignore
+        runs: List[Tuple[int, int]] = []
 
-            row += 1
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1] = (runs[-1][0], row)
+            else:
+                runs.append((row, row))
 
-        self.save_sheet()
+        return runs
 
     def check_channel_rows(self) -> bool:
         """
@@ -889,7 +1730,7 @@ class ExcelInterface:
             return False
         # check the col A in the same row
 
-        return self.ws[f"A{mdl.row}"].value is None
+        return self.get_layout().filters.get(mdl.row) is None
 
 
 if __name__ == "__main__":
@@ -7,11 +7,18 @@ from enum import Enum
 import pyvisa
 from pyvisa import InvalidSession
 import time
-from pprint import pprint
+import threading
 from typing import List
 from pyvisa.constants import VI_GPIB_REN_ASSERT
 
-VERSION = "A.00.07"
+try:
+    from drivers.settle_future import SettleFuture
+    from drivers.wait_engine import WaitEngine
+except ModuleNotFoundError:
+    from settle_future import SettleFuture
+    from wait_engine import WaitEngine
+
+VERSION = "A.00.10"
 
 
 class Fluke5700AOutput(Enum):
@@ -93,9 +100,13 @@ class Fluke5700A:
     boost: bool = False
     timeout = 5000
     settle_timeout: int = 15
+    settle_interval: float = 0.05  # seconds between settled polls
+    operating: bool = False
 
     def __init__(self, simulate=False) -> None:
         self.simulating = simulate
+        self.io_lock = threading.RLock()  # settle polls from another thread
+        self.__settling = SettleFuture()
         self.rm = pyvisa.ResourceManager()
         self.open_connection()
 
@@ -169,13 +180,14 @@ class Fluke5700A:
 
         attempts = 0
 
-        while attempts < 3:
-            try:
-                self.instr.write(command)  # type: ignore
-                break
-            except pyvisa.VisaIOError:
-                time.sleep(1)
-                attempts += 1
+        with self.io_lock:
+            while attempts < 3:
+                try:
+                    self.instr.write(command)  # type: ignore
+                    break
+                except pyvisa.VisaIOError:
+                    time.sleep(1)
+                    attempts += 1
 
     def read(self) -> str:
         """
@@ -190,13 +202,14 @@ class Fluke5700A:
 
         ret = ""
 
-        while attempts < 3:
-            try:
-                ret = self.instr.read()  # type: ignore
-                break
-            except pyvisa.VisaIOError:
-                time.sleep(1)
-                attempts += 1
+        with self.io_lock:
+            while attempts < 3:
+                try:
+                    ret = self.instr.read()  # type: ignore
+                    break
+                except pyvisa.VisaIOError:
+                    time.sleep(1)
+                    attempts += 1
 
         return ret
 
@@ -214,13 +227,14 @@ class Fluke5700A:
         attempts = 0
         ret = ""
 
-        while attempts < 3:
-            try:
-                ret = self.instr.query(command)  # type: ignore
-                break
-            except pyvisa.VisaIOError:
-                time.sleep(1)
-                attempts += 1
+        with self.io_lock:
+            while attempts < 3:
+                try:
+                    ret = self.instr.query(command)  # type: ignore
+                    break
+                except pyvisa.VisaIOError:
+                    time.sleep(1)
+                    attempts += 1
 
         return ret
 
@@ -250,26 +264,37 @@ class Fluke5700A:
 
         return response.split(",")
 
-    def operate(self) -> None:
+    def operate(self, block: bool = True) -> SettleFuture:
         """
         operate _summary_
+
+        Args:
+            block (bool, optional): wait until settled. Defaults to True.
+
+        Returns:
+            SettleFuture: wait on it before measuring if not blocking
         """
         self.write("OPER")
-        self.settle()
+        self.operating = True
+        return self.settle(block)
 
     def standby(self) -> None:
         """
         standby _summary_
         """
+        self.__settling.cancel()
         self.write("STBY")
         self.write("*OPC")
+        self.operating = False
 
     def reset(self) -> None:
         """
         reset _summary_
         """
-        self.write("*RST;*CLS;*WAI")
-        time.sleep(1)
+        self.__settling.cancel()
+        self.operating = False
+        self.write("*RST;*CLS")
+        WaitEngine(self).wait(timeout=5, fallback=1)
 
     def go_to_local(self) -> None:
         """
@@ -281,35 +306,55 @@ class Fluke5700A:
             if not self.simulating:
                 self.instr.control_ren(6)  # type: ignore
 
-    def settle(self) -> None:
+    def settle(self, block: bool = True) -> SettleFuture:
         """
-        Wait until the output is settled
+        settle
+        Poll the settled bit in the background, every settle_interval.
+        Any earlier settle is cancelled, the output has changed
+
+        Args:
+            block (bool, optional): wait until settled. Defaults to True.
+
+        Returns:
+            SettleFuture: _description_
         """
 
+        self.__settling.cancel()
+
         if self.simulating:
-            return
+            self.__settling = SettleFuture()
+            return self.__settling
 
-        timeout_count = 0
         self.write("*OPC")
 
-        while timeout_count < self.settle_timeout:
-            try:
-                status = self.query("ISR?")
-                if (
-                    status and int(status) & 0b0001_0000_0000_0000 > 0
-                ):  # bit 12 is settled
-                    break
-                time.sleep(1)
-                timeout_count += 1
-            except pyvisa.VisaIOError as tmo:
-                if tmo.abbreviation == "VI_ERROR_TMO":
-                    timeout_count += 1
-                else:
-                    pprint(tmo)
-
         # If it takes a while to settle, likely there will be interrupted query errors. Clear the queue
+        self.__settling = SettleFuture(
+            poll=self.__settled,
+            timeout=self.settle_timeout,
+            interval=self.settle_interval,
+            finish=self.get_faults,
+        )
+
+        if block:
+            self.__settling.wait()
+
+        return self.__settling
+
+    def __settled(self) -> bool:
+        """
+        __settled
 
-        self.get_faults()
+        Returns:
+            bool: output settled
+        """
+
+        status = self.query("ISR?")
+
+        try:
+            # bit 12 is settled
+            return bool(status) and int(status) & 0b0001_0000_0000_0000 > 0
+        except ValueError:
+            return False
 
     def get_faults(self) -> None:
         """
@@ -341,12 +386,17 @@ class Fluke5700A:
         cmd = "ON" if setting else "OFF"
         self.write(f"EXTSENSE {cmd}")
 
-    def set_voltage_dc(self, voltage: float) -> None:
+    def set_voltage_dc(self, voltage: float, block: bool = False) -> SettleFuture:
         """
         set_voltage_dc _summary_
 
         Args:
             voltage (float): _description_
+            block (bool, optional): wait until settled, if operating. Defaults to
+            False, as setting the voltage didn't wait before.
+
+        Returns:
+            SettleFuture: already settled if in standby
         """
         assert abs(voltage) <= 1000
         self.boost = False
@@ -354,6 +404,11 @@ class Fluke5700A:
             f"OUT {voltage} V, 0 Hz"
         )  # Write 0 Hz in case was previous AC voltage
 
+        if not self.operating:
+            return SettleFuture()
+
+        return self.settle(block)
+
     def set_voltage_ac(self, voltage: float, frequency: float) -> None:
         """
         set_voltage_ac _summary_
@@ -0,0 +1,191 @@
+"""
+# IEEE 488.2 binary blocks
+# Waveforms and bulk readings are much faster to transfer in binary than as
+# ASCII numbers. All of the instruments send binary data as a block,
+# #<n><length><data> (definite length) or #0<data><newline> (indefinite).
+# The functions here read a block into one buffer and decode it with numpy
+# DK Oct 26
+"""
+
+import contextlib
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import pyvisa
+
+VERSION = "A.00.00"
+
+CHUNK_SIZE = 1_000_000  # bytes read at a time
+
+
+@dataclass(frozen=True)
+class BinaryFormat:
+    """
+    Command to select a binary format, and the numpy type it decodes to.
+    The byte order is part of the type, > for big endian, < for little
+    """
+
+    command: str
+    dtype: str
+
+
+# Formats used by the drivers
+KEYSIGHT_BYTE = BinaryFormat(":WAV:FORM BYTE", "u1")
+KEYSIGHT_WORD = BinaryFormat(":WAV:FORM WORD;:WAV:BYT MSBF;:WAV:UNS 1", ">u2")
+TEK_BYTE = BinaryFormat("DATA:ENC RPB;:DATA:WIDTH 1", "u1")
+TEK_WORD = BinaryFormat("DATA:ENC RIB;:DATA:WIDTH 2", ">i2")
+RS_REAL32 = BinaryFormat("FORM:DATA REAL,32", "<f4")
+KS3458_SINT = BinaryFormat("OFORMAT SINT", ">i2")
+KS3458_DINT = BinaryFormat("OFORMAT DINT", ">i4")
+KS3458_DREAL = BinaryFormat("OFORMAT DREAL", ">f8")
+
+
+def parse_block(data: bytes | bytearray | memoryview) -> memoryview:
+    """
+    parse_block
+    Find the data in a block already read, eg with read_raw
+
+    Args:
+        data (bytes | bytearray | memoryview): _description_
+
+    Raises:
+        ValueError: not a block, or shorter than the header says
+
+    Returns:
+        memoryview: the data, without copying
+    """
+
+    view = memoryview(data)
+
+    start = bytes(view[:1]).find(b"#")
+    if start or len(view) < 2 or not chr(view[1]).isdigit():
+        raise ValueError(f"Invalid block header {bytes(view[:12])!r}")
+
+    digits = int(chr(view[1]))
+
+    if digits == 0:
+        # Indefinite, ends with the message terminator
+        end = len(view)
+        if end > 2 and view[end - 1] == ord("\n"):
+            end -= 1
+        return view[2:end]
+
+    length = int(bytes(view[2 : 2 + digits]))
+    begin = 2 + digits
+
+    if len(view) < begin + length:
+        raise ValueError(f"Block of {length} bytes is only {len(view) - begin}")
+
+    return view[begin : begin + length]
+
+
+def read_block(instr: Any, chunk_size: int = CHUNK_SIZE) -> memoryview:
+    """
+    read_block
+    Read a block from the instrument. A definite length block is read
+    into one buffer in chunks, so a long record is only held once.
+    An indefinite block is read to the end of the message
+
+    Args:
+        instr (Any): pyvisa resource
+        chunk_size (int, optional): bytes per read. Defaults to CHUNK_SIZE.
+
+    Raises:
+        ValueError: not a block
+
+    Returns:
+        memoryview: the data
+    """
+
+    header = instr.read_bytes(2)
+    if header[:1] != b"#" or not header[1:2].isdigit():
+        raise ValueError(f"Invalid block header {header!r}")
+
+    digits = int(header[1:2])
+
+    if digits == 0:
+        data = bytearray(instr.read_raw())
+        if data.endswith(b"\n"):
+            del data[-1:]
+        return memoryview(data)
+
+    length = int(instr.read_bytes(digits))
+
+    data = bytearray(length)
+    view = memoryview(data)
+    received = 0
+
+    while received < length:
+        chunk = instr.read_bytes(min(chunk_size, length - received))
+        view[received : received + len(chunk)] = chunk
+        received += len(chunk)
+
+    # Message terminator
+    with contextlib.suppress(pyvisa.VisaIOError):
+        instr.read_bytes(1)
+
+    return view
+
+
+def decode(data: memoryview | bytes, dtype: str | np.dtype) -> np.ndarray:
+    """
+    decode
+    View the data as an array, no copy is made
+
+    Args:
+        data (memoryview | bytes): _description_
+        dtype (str | np.dtype): eg >i2
+
+    Returns:
+        np.ndarray: read only if the data is bytes
+    """
+
+    dtype = np.dtype(dtype)
+
+    return np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)
+
+
+def query_block(driver: Any, command: str, chunk_size: int = CHUNK_SIZE) -> memoryview:
+    """
+    query_block
+    Send the query, then read the block reply
+
+    Args:
+        driver (Any): a driver with write and instr
+        command (str): _description_
+        chunk_size (int, optional): _description_. Defaults to CHUNK_SIZE.
+
+    Returns:
+        memoryview: _description_
+    """
+
+    driver.write(command)
+
+    if flush := getattr(driver, "flush_batch", None):
+        flush()
+
+    return read_block(driver.instr, chunk_size)
+
+
+def query_binary(
+    driver: Any,
+    command: str,
+    dtype: str | np.dtype,
+    chunk_size: int = CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    query_binary
+    Query numbers sent as a binary block
+
+    Args:
+        driver (Any): a driver with write and instr
+        command (str): _description_
+        dtype (str | np.dtype): type of each number, with the byte order
+        chunk_size (int, optional): _description_. Defaults to CHUNK_SIZE.
+
+    Returns:
+        np.ndarray: _description_
+    """
+
+    return decode(query_block(driver, command, chunk_size), dtype)
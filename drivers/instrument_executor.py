@@ -0,0 +1,161 @@
+"""
+# Run commands to several instruments at the same time
+# Each instrument has one worker thread, so its commands stay in order and
+# never overlap, while different instruments (eg the calibrator on GPIB and
+# the scope on USB) work concurrently. A RowGraph names the steps of a test
+# row and what each has to wait for
+# DK Oct 26
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable
+
+VERSION = "A.00.00"
+
+
+class InstrumentExecutor:
+    """
+    InstrumentExecutor
+    One single worker executor per instrument. With concurrent False each
+    task runs when submitted, in the calling thread
+    """
+
+    concurrent: bool = True
+
+    def __init__(self) -> None:
+        self.__workers: Dict[int, ThreadPoolExecutor] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    def submit(
+        self,
+        instrument: Any,
+        fn: Callable[..., Any],
+        *args,
+        after: Iterable[Future] = (),
+        **kwargs,
+    ) -> Future:
+        """
+        submit
+        Queue fn for the instrument, to run once the after futures are done.
+        If one of them failed, so does this
+
+        Args:
+            instrument (Any): driver, the tasks of each are run in order
+            fn (Callable[..., Any]): _description_
+            after (Iterable[Future], optional): Defaults to ().
+
+        Returns:
+            Future: _description_
+        """
+
+        after = list(after)
+
+        def task() -> Any:
+            for future in after:
+                future.result()  # raises if it failed
+            return fn(*args, **kwargs)
+
+        if not self.concurrent:
+            future: Future = Future()
+            try:
+                future.set_result(task())
+            except Exception as ex:
+                future.set_exception(ex)
+            return future
+
+        key = id(instrument)
+        if key not in self.__workers:
+            self.__workers[key] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=type(instrument).__name__
+            )
+
+        # Waiting on a task of the same instrument is safe, it was queued first
+        return self.__workers[key].submit(task)
+
+    def shutdown(self) -> None:
+        """
+        shutdown
+        Finish the queued tasks and stop the workers
+        """
+
+        for worker in self.__workers.values():
+            worker.shutdown(wait=True)
+
+        self.__workers.clear()
+
+
+class RowGraph:
+    """
+    RowGraph
+    Named steps of a test row, eg measure after "settled" and "configured"
+    """
+
+    def __init__(self, executor: InstrumentExecutor) -> None:
+        self.executor = executor
+        self.__steps: Dict[str, Future] = {}
+
+    def add(
+        self,
+        name: str,
+        instrument: Any,
+        fn: Callable[..., Any],
+        *args,
+        after: Iterable[str] = (),
+        **kwargs,
+    ) -> Future:
+        """
+        add
+        Add a step, after the named steps
+
+        Args:
+            name (str): _description_
+            instrument (Any): _description_
+            fn (Callable[..., Any]): _description_
+            after (Iterable[str], optional): step names. Defaults to ().
+
+        Returns:
+            Future: _description_
+        """
+
+        assert name not in self.__steps, f"Step {name} already added"
+
+        self.__steps[name] = self.executor.submit(
+            instrument,
+            fn,
+            *args,
+            after=[self.__steps[step] for step in after],
+            **kwargs,
+        )
+
+        return self.__steps[name]
+
+    def result(self, name: str) -> Any:
+        """
+        result
+        Wait for the step
+
+        Args:
+            name (str): _description_
+
+        Returns:
+            Any: what the step returned
+        """
+
+        return self.__steps[name].result()
+
+    def wait(self) -> None:
+        """
+        wait
+        Wait for all the steps, so the instruments are free. Then raises
+        the first failure
+        """
+
+        wait(self.__steps.values())
+
+        for future in self.__steps.values():
+            future.result()
@@ -9,14 +9,18 @@ import contextlib
 from enum import Enum
 import pyvisa
 import time
-from typing import List
+from typing import List, Tuple
+
+import numpy as np
 
 try:
     from drivers.base_scope_driver import ScopeDriver, Scope_Simulator
+    from drivers.ieee_block import KEYSIGHT_WORD, query_binary
 except ModuleNotFoundError:
     from base_scope_driver import ScopeDriver, Scope_Simulator
+    from ieee_block import KEYSIGHT_WORD, query_binary
 
-VERSION = "A.00.00"
+VERSION = "A.00.09"
 
 
 class DSOX_FAMILY(Enum):
@@ -51,6 +55,9 @@ class Keysight_Oscilloscope(ScopeDriver):
     timeout = 2000
     num_channels = 4
     keysight: bool = True
+    max_message_length: int = 1000
+    single_acquisition = ":DIG"
+    run_acquisition = ":RUN"
 
     def __init__(self, simulate=False):
         self.simulating = simulate
@@ -97,6 +104,7 @@ class Keysight_Oscilloscope(ScopeDriver):
                 self.instr.timeout = self.timeout
                 self.get_id()
 
+            self.invalidate_settings()  # Unknown state until set
             self.connected = True
         except Exception:
             self.connected = False
@@ -130,6 +138,11 @@ class Keysight_Oscilloscope(ScopeDriver):
             _type_: _description_
         """
 
+        self.track_command(command)
+
+        if self.queue_command(command):
+            return
+
         attempts = 0
 
         while attempts < 3:
@@ -175,6 +188,8 @@ class Keysight_Oscilloscope(ScopeDriver):
 
         assert command.find("?") > 0
 
+        self.flush_batch()  # commands before the query
+
         attempts = 0
         ret = ""
 
@@ -389,6 +404,9 @@ class Keysight_Oscilloscope(ScopeDriver):
         else:
             state = bw_limit
 
+        if not self.setting_changed("bw", state, chan):
+            return
+
         self.write(f"CHAN{chan}:BWL {state}")
         self.write("*OPC")
 
@@ -403,6 +421,9 @@ class Keysight_Oscilloscope(ScopeDriver):
 
         imp = "FIFTY" if impedance == "50" else "ONEMEG"
 
+        if not self.setting_changed("impedance", imp, chan):
+            return
+
         self.write(f"CHAN{chan}:IMP {imp}")
 
     def set_channel_invert(self, chan: int, inverted: bool) -> None:
@@ -415,6 +436,9 @@ class Keysight_Oscilloscope(ScopeDriver):
 
         state = "ON" if inverted else "OFF"
 
+        if not self.setting_changed("invert", state, chan):
+            return
+
         self.write(f"CHAN{chan}:INV {state}")
 
     def set_channel(self, chan: int, enabled: bool, only: bool = False) -> None:
@@ -429,15 +453,22 @@ class Keysight_Oscilloscope(ScopeDriver):
         """
 
         if only:
-            for channel in range(1, self.num_channels + 1):
-                state = "ON" if channel == chan else "OFF"
-                self.write(f"CHAN{channel}:DISP {state}")
-
+            states = {
+                channel: "ON" if channel == chan else "OFF"
+                for channel in range(1, self.num_channels + 1)
+            }
         else:
-            state = "ON" if enabled else "OFF"
-            self.write(f"CHAN{chan}:DISP {state}")
+            states = {chan: "ON" if enabled else "OFF"}
 
-        self.write("*OPC")
+        written = False
+
+        for channel, state in states.items():
+            if self.setting_changed("enable", state, channel):
+                self.write(f"CHAN{channel}:DISP {state}")
+                written = True
+
+        if written:
+            self.write("*OPC")
 
     def set_channel_coupling(self, chan: int, coupling: str) -> None:
         """
@@ -448,6 +479,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             coupling (str): _description_
         """
 
+        if not self.setting_changed("coupling", coupling, chan):
+            return
+
         self.write(f"CHAN{chan}:COUP {coupling}")
 
     def set_voltage_scale(self, chan: int, scale: float, probe: int = 1) -> None:
@@ -459,6 +493,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             scale (float): _description_
         """
 
+        if not self.setting_changed("scale", (probe, scale), chan):
+            return
+
         self.write(f"CHAN{chan}:PROB {probe}")  # Set before the scale
         self.write(f"CHAN{chan}:SCAL {scale}")
         self.write("*OPC")
@@ -472,6 +509,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             offset (float): _description_
         """
 
+        if not self.setting_changed("offset", offset, chan):
+            return
+
         self.write(f"CHAN{chan}:OFFS {offset}")
         self.write("*OPC")
 
@@ -485,6 +525,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             offset (float): _description_
         """
 
+        if not self.setting_changed("offset", position, chan):
+            return
+
         self.write(f"CHAN{chan}:OFFS {position}")
         self.write("*OPC")
 
@@ -496,6 +539,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             timebase (float): _description_
         """
 
+        if not self.setting_changed("timebase", timebase):
+            return
+
         self.write(f"TIM:SCAL {timebase}")
         self.write("*OPC")
 
@@ -507,6 +553,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             pos (float): _description_
         """
 
+        if not self.setting_changed("timebase_pos", pos):
+            return
+
         self.write(f"TIM:POS {pos}")
         self.write("*OPC")
 
@@ -518,6 +567,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             num_samples (int): _description_
         """
 
+        if not self.setting_changed("acquisition", num_samples):
+            return
+
         if num_samples == 1:
             # Turn off
             self.write("ACQ:TYPE NORM")
@@ -533,6 +585,9 @@ class Keysight_Oscilloscope(ScopeDriver):
             mode (str): _description_
         """
 
+        if not self.setting_changed("trigger_type", mode):
+            return
+
         self.write(f"TRIG:MODE {mode}")
         self.write("TRIG:SWE AUTO")
         self.write("*OPC")
@@ -553,6 +608,9 @@ class Keysight_Oscilloscope(ScopeDriver):
 
         source = f"CHAN{chan}" if chan else "EXT"
 
+        if not self.setting_changed("trigger", (source, level)):
+            return
+
         self.write(f"TRIG:EDGE:SOUR {source}")
         self.write(f"TRIG:EDGE:LEV {level}")
         self.write("*OPC")
@@ -566,12 +624,89 @@ class Keysight_Oscilloscope(ScopeDriver):
             float: _description_
         """
 
-        self.write(f"MEAS:SOURCE CHAN{chan}")
+        self.setup_mean_measurement(chan)
 
-        if not self.simulating:
-            time.sleep(delay)
+        self.acquire(fallback=delay)
+        val = self.read_mean_measurement(chan)
+        self.run()
+
+        return val
 
-        return self.read_query("MEAS:VAV?")
+    def setup_mean_measurement(self, chan: int, slot: int = 1) -> None:
+        """
+        setup_mean_measurement
+        The other slots give the source in the query
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+        """
+
+        if slot == 1:
+            self.write(f"MEAS:SOURCE CHAN{chan}")
+
+    def read_mean_measurement(self, chan: int, slot: int = 1) -> float:
+        """
+        read_mean_measurement
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+
+        Returns:
+            float: _description_
+        """
+
+        if slot == 1:
+            return self.read_query("MEAS:VAV?")
+
+        return self.read_query(f"MEAS:VAV? DISP,CHAN{chan}")
+
+    def read_waveform(self, chan: int, points: int = 1000) -> np.ndarray:
+        """
+        read_waveform
+        Transfer the waveform of the last acquisition as 16 bit words.
+        Bytes only have 8 bits, not enough for averaged or high res waveforms
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            np.ndarray: volts
+        """
+
+        return self.read_timed_waveform(chan, points)[1]
+
+    def read_timed_waveform(
+        self, chan: int, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        read_timed_waveform
+        Transfer the waveform, scaled with the preamble
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: time, volts
+        """
+
+        self.write(f":WAV:SOUR CHAN{chan}")
+        self.write(KEYSIGHT_WORD.command)
+        self.write(":WAV:POIN:MODE NORM")
+        self.write(f":WAV:POIN {points}")
+
+        # format, type, points, count, xinc, xorig, xref, yinc, yorig, yref
+        preamble = self.query(":WAV:PRE?").split(",")
+        xinc, xorig, xref, yinc, yorig, yref = (float(val) for val in preamble[4:10])
+
+        data = query_binary(self, ":WAV:DATA?", KEYSIGHT_WORD.dtype)
+
+        tm = (np.arange(len(data)) - xref) * xinc + xorig
+
+        return tm, (data - yref) * yinc + yorig
 
     def measure_clear(self) -> None:
         """
@@ -593,15 +728,14 @@ class Keysight_Oscilloscope(ScopeDriver):
             float: _description_
         """
         self.write(f"MEAS:RIS CHAN{chan}")
-        self.write("*OPC")
-
-        if not self.simulating:
-            time.sleep(1)  # allow time to measure
 
         total = 0
         for _ in range(num_readings):
+            # A new acquisition for each reading
+            self.acquire(fallback=1)
             total += self.read_query(f"MEAS:RIS? CHAN{chan}")
-            time.sleep(0.1)
+
+        self.run()
 
         return total / num_readings
 
@@ -702,44 +836,6 @@ class Keysight_Oscilloscope(ScopeDriver):
         self.write(f"MARK:{cursor}P {pos}")
         self.write("*OPC")
 
-    def adjust_cursor(self, target: float) -> None:
-        """
-        adjust_cursor
-        Adjust the cursor time until target voltage met
-
-        Args:
-            target (float): _description_
-        """
-
-        current_y = self.read_query("MARK:Y1P?")
-        current_x = self.read_query("MARK:X1P?")
-
-        time_inc = self.read_query("TIM:SCAL?") / 20
-
-        direction = +1 if current_y < target else -1
-
-        diff = abs(current_y - target)
-
-        if diff > 0.05:  # 0.1 div
-            for _ in range(100):
-                self.set_cursor_position(
-                    cursor="X1", pos=current_x + time_inc * direction
-                )
-                self.write("*OPC")
-                time.sleep(0.05)
-                current_x = self.read_query("MARK:X1P?")
-                current_y = self.read_query("MARK:Y1P?")
-
-                diff = current_y - target
-
-                # As the slope can be steep, detect when it has passed the crossing
-
-                val = direction * diff
-                if val > 0:
-                    break
-        else:
-            ...
-
     def check_triggered(self, sweep_time: float = 0.1) -> bool:
         """
         check_triggered
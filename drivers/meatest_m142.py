@@ -6,11 +6,16 @@
 
 import contextlib
 import pyvisa
+import threading
 import time
-from pprint import pprint
 from typing import List
 
-VERSION = "A.00.11"
+try:
+    from drivers.settle_future import SettleFuture
+except ModuleNotFoundError:
+    from settle_future import SettleFuture
+
+VERSION = "A.00.13"
 
 
 class M142_Simulate:
@@ -74,9 +79,15 @@ class M142:
     model = ""
     timeout = 5000
     simulating = False
+    settle_timeout: float = 30
+    settle_interval: float = 0.05  # seconds between *OPC? retries
+    settle_delay: float = 0.5  # extra time once complete
+    operating: bool = False
 
     def __init__(self, simulate=False) -> None:
         self.simulating = simulate
+        self.io_lock = threading.RLock()  # settle polls from another thread
+        self.__settling = SettleFuture()
         self.rm = pyvisa.ResourceManager()
         if not simulate:
 
@@ -182,50 +193,85 @@ class M142:
         Args:
             command (str): _description_
         """
-        self.instr.write(command)  # type: ignore
+        with self.io_lock:
+            self.instr.write(command)  # type: ignore
+
+    def query(self, command: str) -> str:
+        """
+        query _summary_
+
+        Args:
+            command (str): _description_
+
+        Returns:
+            str: _description_
+        """
+        with self.io_lock:
+            return self.instr.query(command)  # type: ignore
 
-    def operate(self) -> None:
+    def operate(self, block: bool = True) -> SettleFuture:
         """
         operate _summary_
+
+        Args:
+            block (bool, optional): wait until settled. Defaults to True.
+
+        Returns:
+            SettleFuture: wait on it before measuring if not blocking
         """
-        self.instr.write("OUTP ON")  # type: ignore
-        self.settle()
+        self.write("OUTP ON")
+        self.operating = True
+        return self.settle(block)
 
     def standby(self) -> None:
         """
         standby _summary_
         """
-        self.instr.write("OUTP OFF")  # type: ignore
-        self.instr.write("*OPC")  # type: ignore
+        self.__settling.cancel()
+        self.write("OUTP OFF")
+        self.write("*OPC")
+        self.operating = False
 
     def reset(self) -> None:
         """
         reset _summary_
         """
-        self.instr.write("*CLS;*RST")  # type: ignore
-        self.instr.write("FUNC DC;VOLT 0V")  # type: ignore
-        self.instr.write("OUTP:ISEL HIGH")  # type: ignore  # Turn off the coil if it is on
+        self.__settling.cancel()
+        self.operating = False
+        self.write("*CLS;*RST")
+        self.write("FUNC DC;VOLT 0V")
+        self.write("OUTP:ISEL HIGH")  # Turn off the coil if it is on
 
-    def settle(self) -> None:
+    def settle(self, block: bool = True) -> SettleFuture:
         """
         settle _summary_
-        Wait until the output is settled
+        Wait until the output is settled, in the background. The M142 has
+        no settled status, so until *OPC? replies, then settle_delay
+
+        Args:
+            block (bool, optional): wait until settled. Defaults to True.
+
+        Returns:
+            SettleFuture: _description_
         """
 
-        timeout_count = 0
+        self.__settling.cancel()
 
-        while timeout_count < 6:  # 30 seconds
-            try:
-                self.instr.query("*OPC?")  # type: ignore
-                break
-            except pyvisa.VisaIOError as tmo:
-                if tmo.abbreviation == "VI_ERROR_TMO":
-                    timeout_count += 1
-                else:
-                    pprint(tmo)
+        if self.simulating:
+            self.__settling = SettleFuture()
+            return self.__settling
 
-        if not self.simulating:
-            time.sleep(0.5)
+        self.__settling = SettleFuture(
+            poll=lambda: bool(self.query("*OPC?")),
+            timeout=self.settle_timeout,
+            interval=self.settle_interval,
+            finish=lambda: time.sleep(self.settle_delay),
+        )
+
+        if block:
+            self.__settling.wait()
+
+        return self.__settling
 
     def set_ext_sense(self, setting: bool) -> None:
         """
@@ -235,22 +281,32 @@ class M142:
             setting (bool): _description_
         """
         if setting:
-            self.instr.write("EXTSENSE ON")  # type: ignore
+            self.write("EXTSENSE ON")
         else:
-            self.instr.write("EXTSENSE OFF")  # type: ignore
+            self.write("EXTSENSE OFF")
 
-    def set_voltage_dc(self, voltage: float) -> None:
+    def set_voltage_dc(self, voltage: float, block: bool = False) -> SettleFuture:
         """
         set_voltage_dc _summary_
 
         Args:
             voltage (float): _description_
+            block (bool, optional): wait until settled, if operating. Defaults to
+            False, as setting the voltage didn't wait before.
+
+        Returns:
+            SettleFuture: already settled if in standby
         """
         assert abs(voltage) <= 1000
-        self.instr.write(  # type: ignore
+        self.write(
             f"FUNC DC;VOLT {voltage} V"
         )  # Write 0 Hz in case was previous AC voltage
 
+        if not self.operating:
+            return SettleFuture()
+
+        return self.settle(block)
+
     def set_voltage_ac(self, voltage: float, frequency: float) -> None:
         """
         set_voltage_ac _summary_
@@ -261,7 +317,7 @@ class M142:
         """
         assert voltage <= 1000
         # todo frequency voltage trade off assert
-        self.instr.write(f"FUNC SIN;VOLT {voltage} V;FREQ {frequency} Hz")  # type: ignore
+        self.write(f"FUNC SIN;VOLT {voltage} V;FREQ {frequency} Hz")
 
     def set_2W_resistance(self, resistance: float) -> None:
         """
@@ -270,7 +326,7 @@ class M142:
         Args:
             resistance (float): _description_
         """
-        self.instr.write(f"RES {resistance} OHM")  # type: ignore
+        self.write(f"RES {resistance} OHM")
 
     def get_resistance(self) -> float:
         """
@@ -282,7 +338,7 @@ class M142:
         """
 
         # todo check in resistance mode. It will return whatever is set though
-        return float(self.instr.query("RES?"))  # type: ignore
+        return float(self.query("RES?"))
 
     def set_2W_compensation(self, resistance: float) -> None:
         """
@@ -302,7 +358,7 @@ class M142:
         """
         assert current <= 30
 
-        self.instr.write(f"FUNC DC;CURR {current} A")  # type: ignore
+        self.write(f"FUNC DC;CURR {current} A")
 
     def set_current_ac(self, current: float, frequency: float) -> None:
         """
@@ -314,7 +370,7 @@ class M142:
         """
         assert current <= 30
 
-        self.instr.write(f"FUNC SIN;CURR {current} A;FREQ {frequency} Hz")  # type: ignore
+        self.write(f"FUNC SIN;CURR {current} A;FREQ {frequency} Hz")
 
     def set_temperature(
         self, temperature: float, tc_type: str = "T", ref_junction: float = 78.3
@@ -329,9 +385,9 @@ class M142:
             ref_junction (float, optional): _description_. Defaults to 78.3.
         """
 
-        self.instr.write("TEMP:UNITS C")  # type: ignore
-        self.instr.write(f"TEMP:THER:TYPE {tc_type}")  # type: ignore
-        self.instr.write(f"TEMP:THERM {temperature}")  # type: ignore
+        self.write("TEMP:UNITS C")
+        self.write(f"TEMP:THER:TYPE {tc_type}")
+        self.write(f"TEMP:THERM {temperature}")
 
     def set_power(
         self,
@@ -357,27 +413,27 @@ class M142:
         freq_command = ""
 
         if freq:
-            self.instr.write("FUNC SIN")  # type: ignore
+            self.write("FUNC SIN")
             freq_command = f"FREQ {freq} Hz"
 
             # Have to have 0 degrees to set power
 
-            self.instr.write("POWER:PHASE 0 LEAD")  # type: ignore
+            self.write("POWER:PHASE 0 LEAD")
 
         else:
-            self.instr.write("FUNC DC")  # type: ignore
+            self.write("FUNC DC")
 
         if voltage:
-            self.instr.write(f"POWER:VOLT {voltage} V")  # type: ignore
+            self.write(f"POWER:VOLT {voltage} V")
 
-        self.instr.write(f"POWER {power} W; {freq_command}")  # type: ignore
+        self.write(f"POWER {power} W; {freq_command}")
 
         if freq is not None:
             if phase:
                 dirn = "LAG" if phase < 0 else "LEAD"
-                self.instr.write(f"POWER:PHASE {phase} {dirn}")  # type: ignore
+                self.write(f"POWER:PHASE {phase} {dirn}")
             else:
-                self.instr.write("POWER:PHASE 0 LEAD")  # type: ignore
+                self.write("POWER:PHASE 0 LEAD")
 
 
 if __name__ == "__main__":
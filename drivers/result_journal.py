@@ -0,0 +1,174 @@
+"""
+# Crash-safe journal of results written to the results sheet
+# Every result is appended to a small sidecar file as soon as it is measured,
+# so the workbook only needs to be saved at test boundaries.
+# If the software crashes before the workbook is saved, the journal is replayed
+# the next time the sheet is opened
+# DK Oct 26
+"""
+
+import contextlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, TextIO
+
+VERSION = "A.00.00"
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    sheet: int
+    row: int
+    col: int
+    value: Any
+    timestamp: float
+
+
+class ResultJournal:
+    """
+    ResultJournal
+    Append only journal of cell writes. One JSON object per line, each line is
+    flushed and synced to disk before returning so a crash loses at most the
+    line being written
+    """
+
+    def __init__(self, filename: str) -> None:
+        head, tail = os.path.split(filename)
+        self.path = os.path.join(head, f"~{tail}.journal")
+        self.__file: TextIO | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def exists(self) -> bool:
+        """
+        exists
+        Check if there is a journal left over from a previous run
+
+        Returns:
+            bool: True if journal file has entries
+        """
+
+        return os.path.isfile(self.path) and os.path.getsize(self.path) > 0
+
+    def append(self, sheet: int, row: int, col: int, value: Any) -> None:
+        """
+        append
+        Add a cell write to the journal
+
+        Args:
+            sheet (int): worksheet index
+            row (int): _description_
+            col (int): _description_
+            value (Any): float, int, str, bool, datetime or None
+        """
+
+        if self.__file is None:
+            self.__file = open(self.path, "a", encoding="utf-8")
+
+        entry = {
+            "sheet": sheet,
+            "row": row,
+            "col": col,
+            "value": self.__encode(value),
+            "time": time.time(),
+        }
+
+        self.__file.write(json.dumps(entry) + "\n")
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+    def read(self) -> List[JournalEntry]:
+        """
+        read
+        Read all of the complete entries from the journal.
+        A partially written last line (crash during write) is ignored
+
+        Returns:
+            List[JournalEntry]: entries in the order written
+        """
+
+        entries: List[JournalEntry] = []
+
+        if not os.path.isfile(self.path):
+            return entries
+
+        with open(self.path, "r", encoding="utf-8") as infile:
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                    entries.append(
+                        JournalEntry(
+                            sheet=int(entry["sheet"]),
+                            row=int(entry["row"]),
+                            col=int(entry["col"]),
+                            value=self.__decode(entry["value"]),
+                            timestamp=float(entry["time"]),
+                        )
+                    )
+                except (ValueError, KeyError, TypeError):
+                    # Incomplete line
+                    continue
+
+        return entries
+
+    def clear(self) -> None:
+        """
+        clear
+        All entries have been saved in the workbook, remove the journal
+        """
+
+        self.close()
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+    def close(self) -> None:
+        """
+        close
+        Close the file handle, the journal is kept on disk
+        """
+
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __encode(self, value: Any) -> Any:
+        """
+        __encode
+        JSON doesn't support dates, so tag them
+
+        Args:
+            value (Any): _description_
+
+        Returns:
+            Any: JSON serializable value
+        """
+
+        if isinstance(value, datetime):
+            return {"datetime": value.isoformat()}
+
+        return value
+
+    def __decode(self, value: Any) -> Any:
+        """
+        __decode
+        Reverse of __encode
+
+        Args:
+            value (Any): _description_
+
+        Returns:
+            Any: _description_
+        """
+
+        if isinstance(value, dict) and "datetime" in value:
+            return datetime.fromisoformat(value["datetime"])
+
+        return value
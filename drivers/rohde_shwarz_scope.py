@@ -8,16 +8,20 @@
 import pyvisa
 import time
 from random import random
-from typing import List
+from typing import List, Tuple
 import numpy as np
 from struct import unpack
 
 try:
     from drivers.base_scope_driver import ScopeDriver, Scope_Simulator
+    from drivers.ieee_block import RS_REAL32, query_binary
+    from drivers.wait_engine import WaitMode
 except ModuleNotFoundError:
     from base_scope_driver import ScopeDriver, Scope_Simulator
+    from ieee_block import RS_REAL32, query_binary
+    from wait_engine import WaitMode
 
-VERSION = "A.00.00"
+VERSION = "A.00.09"
 
 
 class RohdeSchwarz_Oscilloscope(ScopeDriver):
@@ -36,6 +40,8 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
     timeout = 5000
     num_channels: int = 4
     keysight: bool = False
+    max_message_length: int = 1000
+    wait_mode = WaitMode.SLEEP  # RTH measurements don't report completion
 
     def __init__(self, simulate=False):
         self.simulating = simulate
@@ -68,6 +74,7 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
                 self.instr.timeout = self.timeout
                 # self.instr.control_ren(VI_GPIB_REN_ASSERT)  # type: ignore
                 self.get_id()
+            self.invalidate_settings()  # Unknown state until set
             self.connected = True
         except Exception:
             self.connected = False
@@ -115,6 +122,11 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             _type_: _description_
         """
 
+        self.track_command(command)
+
+        if self.queue_command(command):
+            return
+
         attempts = 0
 
         while attempts < 3:
@@ -160,6 +172,8 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
 
         assert command.find("?") > 0
 
+        self.flush_batch()  # commands before the query
+
         attempts = 0
         ret = ""
 
@@ -287,6 +301,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
                     print(f"Invalid bandwidth {bw_limit}")
                     state = "FULL"
 
+        if not self.setting_changed("bw", state, chan):
+            return
+
         # Some use BAN and some BAND, so use the full command
         self.write(f"CHAN{chan}:BANDWIDTH {state}")
         self.write("*OPC")
@@ -316,6 +333,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
 
         state = "INVERTED" if inverted else "NORMAL"
 
+        if not self.setting_changed("invert", state, chan):
+            return
+
         self.write(f"CHAN{chan}:POL {state}")
 
     def set_channel(self, chan: int, enabled: bool, only: bool = False) -> None:
@@ -328,16 +348,23 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             enabled (bool): _description_
         """
 
+        written = False
+
         if only:
             for channel in range(1, self.num_channels + 1):
                 state = "ON" if channel == chan else "OFF"
-                self.write(f"SEL:CH{channel} {state}")
+                if self.setting_changed("enable", state, channel):
+                    self.write(f"SEL:CH{channel} {state}")
+                    written = True
 
         else:
             state = "ON" if enabled else "OFF"
-            self.write(f"CHAN{chan}:STATE {state}")
+            if self.setting_changed("enable", state, chan):
+                self.write(f"CHAN{chan}:STATE {state}")
+                written = True
 
-        self.write("*OPC")
+        if written:
+            self.write("*OPC")
 
     def set_channel_coupling(self, chan: int, coupling: str) -> None:
         """
@@ -354,7 +381,8 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             if not coupling.endswith("L"):
                 coupling += "L"
 
-            self.write(f"CHAN{chan}:COUP {coupling}")
+            if self.setting_changed("coupling", coupling, chan):
+                self.write(f"CHAN{chan}:COUP {coupling}")
 
     def set_voltage_scale(self, chan: int, scale: float, probe_atten: int = 1) -> None:
         """
@@ -365,6 +393,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             scale (float): _description_
         """
 
+        if not self.setting_changed("scale", scale, chan):
+            return
+
         self.write(f"CHAN{chan}:PROBE V1TO1")
         self.write(f"CHAN{chan}:SCALE {scale}")
 
@@ -378,6 +409,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             offset (float): _description_
         """
 
+        if not self.setting_changed("offset", offset, chan):
+            return
+
         self.write(f"CHAN{chan}:OFFS {offset}")
 
     def set_voltage_position(self, chan: int, position: float) -> None:
@@ -390,6 +424,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             position (float): _description_
         """
 
+        if not self.setting_changed("position", position, chan):
+            return
+
         self.write(f"CHAN{chan}:POS {position}")
 
     def set_timebase(self, timebase: float) -> None:
@@ -401,6 +438,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             timebase (float): _description_
         """
 
+        if not self.setting_changed("timebase", timebase):
+            return
+
         self.write(f"TIM:SCALE {timebase}")
 
     def set_timebase_pos(self, pos: float) -> None:
@@ -411,6 +451,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             pos (float): _description_
         """
 
+        if not self.setting_changed("timebase_pos", pos):
+            return
+
         self.write(f"TIM:HOR:POS {pos}")
 
     def set_acquisition(self, num_samples: int) -> None:
@@ -421,6 +464,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             num_samples (int): _description_
         """
 
+        if not self.setting_changed("acquisition", num_samples):
+            return
+
         self.write("ACQ:MODE AVER")
         self.write(f"ACQ:AVER:COUNT {num_samples}")
 
@@ -432,8 +478,12 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             mode (str): _description_
         """
 
-        self.write("TRIG:TYPE EDGE")
         trig_mode = "AUTO" if auto_trig else "NORMAL"
+
+        if not self.setting_changed("trigger_type", trig_mode):
+            return
+
+        self.write("TRIG:TYPE EDGE")
         self.write(f"TRIG:MODE {trig_mode}")
 
     def set_trigger_level(self, level: float, chan: int) -> None:
@@ -446,6 +496,9 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
             chan (int): _description_
         """
 
+        if not self.setting_changed("trigger", (chan, level)):
+            return
+
         self.write(f"TRIG:SOUR C{chan}")
         self.write(f"TRIG:LEV{chan}:VAL {level}")
 
@@ -465,17 +518,84 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
         if delay < 3:
             delay = 3
 
+        self.setup_mean_measurement(chan)
+
+        self.acquire(fallback=delay)
+
+        return self.read_mean_measurement(chan)
+
+    def setup_mean_measurement(self, chan: int, slot: int = 1) -> None:
+        """
+        setup_mean_measurement
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+        """
+
         # Only using measurement 6
 
-        self.write(f"MEAS1:SOURCE C{chan}")
-        self.write("MEAS1:TYPE MEAN")
+        self.write(f"MEAS{slot}:SOURCE C{chan}")
+        self.write(f"MEAS{slot}:TYPE MEAN")
 
-        self.write("MEAS1:ENABLE ON")
+        self.write(f"MEAS{slot}:ENABLE ON")
+
+    def read_mean_measurement(self, chan: int, slot: int = 1) -> float:
+        """
+        read_mean_measurement
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+
+        Returns:
+            float: _description_
+        """
+
+        return self.read_query(f"MEAS{slot}:RESULT:ACTUAL?")
+
+    def read_waveform(self, chan: int, points: int = 1000) -> np.ndarray:
+        """
+        read_waveform
+        Transfer the waveform of the last acquisition. The RTH sends volts
+        as 32 bit floats, so no scaling. All the points are sent
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
 
-        if not self.simulating:
-            time.sleep(delay)
+        Returns:
+            np.ndarray: volts
+        """
+
+        self.write(RS_REAL32.command)
 
-        return self.read_query("MEAS1:RESULT:ACTUAL?")
+        return query_binary(self, f"CHAN{chan}:DATA?", RS_REAL32.dtype)
+
+    def read_timed_waveform(
+        self, chan: int, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        read_timed_waveform
+        Transfer the waveform, with the time from the data header
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: time, volts
+        """
+
+        volts = self.read_waveform(chan, points)
+
+        # start, stop, samples, values per sample
+        header = self.query(f"CHAN{chan}:DATA:HEAD?").split(",")
+        start, stop = float(header[0]), float(header[1])
+
+        tm = start + np.arange(len(volts)) * (stop - start) / max(len(volts), 1)
+
+        return tm, volts
 
     def measure_clear(self) -> None:
         """
@@ -503,8 +623,7 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
         self.write(f"MEAS1:SOURCE C{chan}")
         self.write("MEAS1:ENABLE ON")
 
-        if not self.simulating:
-            time.sleep(2)  # allow time to measure
+        self.acquire(fallback=2)  # allow time to measure
 
         # TODO check if RTH will automatically average successive readings
 
@@ -582,36 +701,6 @@ class RohdeSchwarz_Oscilloscope(ScopeDriver):
 
         pass  # not supported
 
-    def adjust_cursor(self, target: float) -> None:
-        """
-        adjust_cursor
-        Adjust the cursor time until target voltage met
-
-        Args:
-            target (float): _description_
-        """
-
-        current_y = self.read_query("MARK:Y1P?")
-        current_x = self.read_query("MARK:X1P?")
-
-        time_inc = self.read_query("TIM:SCAL?") / 20
-
-        direction = +1 if current_y < target else -1
-
-        if current_y < target:
-            for _ in range(100):
-                self.set_cursor_position(
-                    cursor="X1", pos=current_x + time_inc * direction
-                )
-                current_x = self.read_query("MARK:X1P?")
-                current_y = self.read_query("MARK:Y1P?")
-                if ((current_y > target) and direction == 1) or (
-                    (current_y < target) and direction == -1
-                ):
-                    break
-        else:
-            ...
-
     def cursors_on(self) -> None:
         """
         cursors_on
@@ -0,0 +1,134 @@
+"""
+# Wait for a calibrator output to settle in the background
+# The calibrator output takes seconds to settle. Rather than blocking, the
+# driver returns a SettleFuture that polls the calibrator in a thread, so
+# the scope can be set up in the meantime. Wait on the future before measuring
+# DK Oct 26
+"""
+
+import threading
+import time
+from typing import Callable
+
+import pyvisa
+
+VERSION = "A.00.00"
+
+
+class SettleFuture:
+    """
+    SettleFuture
+    Polls until settled, the timeout, or cancelled. The poll function has
+    to lock the instrument I/O, as the caller may use the instrument too
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[], bool] | None = None,
+        timeout: float = 15,
+        interval: float = 0.05,
+        finish: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        __init__
+        Start polling. With no poll function the future is already settled,
+        eg when simulating
+
+        Args:
+            poll (Callable[[], bool] | None, optional): True when settled. Defaults to None.
+            timeout (float, optional): seconds. Defaults to 15.
+            interval (float, optional): seconds between polls. Defaults to 0.05.
+            finish (Callable[[], None] | None, optional): called once settled or
+            timed out, eg to read the faults. Defaults to None.
+        """
+
+        self.settled = False
+        self.elapsed = 0.0  # seconds to settle
+
+        self.__poll = poll
+        self.__timeout = timeout
+        self.__interval = interval
+        self.__finish = finish
+
+        self.__done = threading.Event()
+        self.__cancelled = threading.Event()
+
+        if poll is None:
+            self.settled = True
+            self.__done.set()
+            return
+
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __run(self) -> None:
+        """
+        __run
+        Poll in the background thread
+        """
+
+        start = time.monotonic()
+        deadline = start + self.__timeout
+
+        try:
+            while not self.__cancelled.is_set():
+                try:
+                    if self.__poll():  # type: ignore
+                        self.settled = True
+                        break
+                except pyvisa.VisaIOError as ex:
+                    # Busy settling, try again
+                    if ex.abbreviation != "VI_ERROR_TMO":
+                        print(f"Settle poll error {ex}")
+
+                if time.monotonic() >= deadline:
+                    print(f"Not settled after {self.__timeout} s")
+                    break
+
+                self.__cancelled.wait(self.__interval)
+
+            self.elapsed = time.monotonic() - start
+
+            if self.__finish and not self.__cancelled.is_set():
+                self.__finish()
+        except Exception as ex:
+            print(f"Settle failed {ex}")
+        finally:
+            self.__done.set()
+
+    def done(self) -> bool:
+        """
+        done
+        Finished polling, settled or not
+
+        Returns:
+            bool: _description_
+        """
+
+        return self.__done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        wait
+        Block until finished polling
+
+        Args:
+            timeout (float | None, optional): seconds. Defaults to None (until done).
+
+        Returns:
+            bool: True if settled
+        """
+
+        self.__done.wait(timeout)
+
+        return self.settled
+
+    def cancel(self) -> None:
+        """
+        cancel
+        Stop polling, eg the output has been changed again. Waits for the
+        poll in progress so the instrument is free
+        """
+
+        self.__cancelled.set()
+        self.__done.wait()
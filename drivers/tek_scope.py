@@ -8,18 +8,22 @@
 import contextlib
 import pyvisa
 import time
+from dataclasses import dataclass
 from random import random
-from typing import List
+from typing import Iterator, List, Tuple
 import numpy as np
-from struct import unpack
 from enum import Enum
 
 try:
     from drivers.base_scope_driver import ScopeDriver, Scope_Simulator
+    from drivers.ieee_block import TEK_BYTE, TEK_WORD, query_binary
+    from drivers.waveform_analysis import NoiseAccumulator, NoiseEstimate
 except ModuleNotFoundError:
     from base_scope_driver import ScopeDriver, Scope_Simulator
+    from ieee_block import TEK_BYTE, TEK_WORD, query_binary
+    from waveform_analysis import NoiseAccumulator, NoiseEstimate
 
-VERSION = "A.00.01"
+VERSION = "A.00.15"
 
 
 class Tek_Acq_Mode(Enum):
@@ -38,6 +42,35 @@ class Tek_Acq_Mode(Enum):
     ENVELOPE = 5
 
 
+@dataclass(frozen=True)
+class TekWaveform:
+    """
+    Waveform as transferred, with the scaling from the preamble.
+    Volts and time are calculated when used, so only the raw data is kept.
+    Unpacks as (time, volts) like the tuple get_waveform used to return
+    """
+
+    adc: np.ndarray  # digitizer levels, a view of the transfer buffer
+    ymult: float = 1.0
+    yzero: float = 0.0
+    yoff: float = 0.0
+    xincr: float = 1.0
+    xzero: float = 0.0  # time of the first point of the record
+    start: int = 1  # record point of the first point transferred
+
+    @property
+    def volts(self) -> np.ndarray:
+        return (self.adc - self.yoff) * self.ymult + self.yzero
+
+    @property
+    def time(self) -> np.ndarray:
+        # Offset by the start, for a part of the record
+        return self.xzero + (self.start - 1 + np.arange(len(self.adc))) * self.xincr
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter((self.time, self.volts))
+
+
 class Tektronix_Oscilloscope(ScopeDriver):
     """
      _summary_
@@ -54,6 +87,11 @@ class Tektronix_Oscilloscope(ScopeDriver):
     timeout = 5000
     num_channels: int = 4
     keysight: bool = False
+    single_acquisition = "ACQ:STOPA SEQ;:ACQ:STATE ON"
+    run_acquisition = "ACQ:STOPA RUNST;:ACQ:STATE ON"
+    acquisition_count_query = "ACQ:NUMACQ?"
+    transfer_chunk: int = 1_000_000  # bytes read at a time for long records
+    noise_chunk: int = 100_000  # points per chunk for host noise measurements
 
     def __init__(self, simulate=False):
         self.simulating = simulate
@@ -86,6 +124,7 @@ class Tektronix_Oscilloscope(ScopeDriver):
                 self.instr.timeout = self.timeout
                 # self.instr.control_ren(VI_GPIB_REN_ASSERT)  # type: ignore
                 self.get_id()
+            self.invalidate_settings()  # Unknown state until set
             self.connected = True
         except Exception:
             self.connected = False
@@ -141,6 +180,11 @@ class Tektronix_Oscilloscope(ScopeDriver):
             _type_: _description_
         """
 
+        self.track_command(command)
+
+        if self.queue_command(command):
+            return
+
         attempts = 0
 
         while attempts < 3:
@@ -151,6 +195,26 @@ class Tektronix_Oscilloscope(ScopeDriver):
                 time.sleep(1)
                 attempts += 1
 
+    def read_errors(self) -> List[str]:
+        """
+        read_errors
+        Tek report errors as events. The status register says if there are any
+
+        Returns:
+            List[str]: errors, empty if none
+        """
+
+        try:
+            esr = int(self.query("*ESR?").strip())
+        except ValueError:
+            return []
+
+        if not esr & 0x3C:
+            # No command, execution, device or query errors
+            return []
+
+        return [self.query("ALLEV?").strip()]
+
     def read(self) -> str:
         """
         read _summary_
@@ -186,6 +250,8 @@ class Tektronix_Oscilloscope(ScopeDriver):
 
         assert command.find("?") > 0
 
+        self.flush_batch()  # commands before the query
+
         attempts = 0
         ret = ""
 
@@ -316,6 +382,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
         else:
             state = "FULL"
 
+        if not self.setting_changed("bw", state, chan):
+            return
+
         # Some use BAN and some BAND, so use the full command
         self.write(f"CH{chan}:BANDWIDTH {state}")
         self.write("*OPC")
@@ -339,10 +408,12 @@ class Tektronix_Oscilloscope(ScopeDriver):
             else:
                 imp = impedance
 
-            self.write(f"CH{chan}:TER {imp}")
+            if self.setting_changed("impedance", imp, chan):
+                self.write(f"CH{chan}:TER {imp}")
         else:
             imp = "FIFTY" if impedance == "50" else "MEG"
-            self.write(f"CH{chan}:IMP {imp}")
+            if self.setting_changed("impedance", imp, chan):
+                self.write(f"CH{chan}:IMP {imp}")
 
     def set_channel_invert(self, chan: int, inverted: bool) -> None:
         """
@@ -354,6 +425,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
 
         state = "ON" if inverted else "OFF"
 
+        if not self.setting_changed("invert", state, chan):
+            return
+
         self.write(f"CH{chan}:INV {state}")
 
     def set_channel(self, chan: int, enabled: bool, only: bool = False) -> None:
@@ -367,15 +441,22 @@ class Tektronix_Oscilloscope(ScopeDriver):
         """
 
         if only:
-            for channel in range(1, self.num_channels + 1):
-                state = "ON" if channel == chan else "OFF"
-                self.write(f"SEL:CH{channel} {state}")
-
+            states = {
+                channel: "ON" if channel == chan else "OFF"
+                for channel in range(1, self.num_channels + 1)
+            }
         else:
-            state = "ON" if enabled else "OFF"
-            self.write(f"SEL:CH{chan} {state}")
+            states = {chan: "ON" if enabled else "OFF"}
 
-        self.write("*OPC")
+        written = False
+
+        for channel, state in states.items():
+            if self.setting_changed("enable", state, channel):
+                self.write(f"SEL:CH{channel} {state}")
+                written = True
+
+        if written:
+            self.write("*OPC")
 
     def set_channel_coupling(self, chan: int, coupling: str) -> None:
         """
@@ -386,6 +467,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             coupling (str): _description_
         """
 
+        if not self.setting_changed("coupling", coupling, chan):
+            return
+
         self.write(f"CH{chan}:COUP {coupling}")
 
     def set_voltage_scale(self, chan: int, scale: float, probe_atten: int = 1) -> None:
@@ -395,12 +479,17 @@ class Tektronix_Oscilloscope(ScopeDriver):
         Args:
             chan (int): _description_
             scale (float): _description_
+            probe_atten (int, optional): _description_. Defaults to 1.
         """
 
+        # The probe is part of the setting, as for the trigger
+        if not self.setting_changed("scale", (probe_atten, scale), chan):
+            return
+
         if self.model.startswith(("TDS")):
-            self.write(f"CH{chan}:PROBE 1")
+            self.write(f"CH{chan}:PROBE {probe_atten}")
         else:
-            self.write(f"CH{chan}:PROBE:GAIN 1")
+            self.write(f"CH{chan}:PROBE:GAIN {1 / probe_atten}")
 
         self.write(f"CH{chan}:VOL {scale}")
 
@@ -414,6 +503,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             offset (float): _description_
         """
 
+        if not self.setting_changed("offset", offset, chan):
+            return
+
         self.write(f"CH{chan}:OFFS {offset}")
 
     def set_voltage_position(self, chan: int, position: float) -> None:
@@ -425,6 +517,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             position (float): _description_
         """
 
+        if not self.setting_changed("position", position, chan):
+            return
+
         self.write(f"CH{chan}:POS {position}")
 
     def set_timebase(self, timebase: float) -> None:
@@ -435,6 +530,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             timebase (float): _description_
         """
 
+        if not self.setting_changed("timebase", timebase):
+            return
+
         self.write(f"HOR:SCAL {timebase}")
 
     def set_timebase_pos(self, pos: float) -> None:
@@ -445,6 +543,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             pos (float): _description_
         """
 
+        if not self.setting_changed("timebase_pos", pos):
+            return
+
         self.write(f"HOR:DEL:TIM {pos}")
 
     def set_acquisition(self, num_samples: int) -> None:
@@ -455,8 +556,12 @@ class Tektronix_Oscilloscope(ScopeDriver):
             num_samples (int): _description_
         """
 
+        if not self.setting_changed("acquisition", num_samples):
+            return
+
         self.write("ACQ:MODE AVE")
         self.write(f"ACQ:NUMAV {num_samples}")
+        self.invalidate_settings("acq_mode")
 
     def set_sample_rate(self, rate: str) -> None:
         """
@@ -480,6 +585,7 @@ class Tektronix_Oscilloscope(ScopeDriver):
             val = float(rate)
 
         self.write(f"HORZ:MODE:SAMPLERATE {val}")
+        self.invalidate_settings("timebase", "timebase_pos")  # scope adjusts to suit
 
     def set_acquisition_mode(self, mode: Tek_Acq_Mode) -> None:
         """
@@ -501,7 +607,11 @@ class Tektronix_Oscilloscope(ScopeDriver):
         else:
             md = "AVERAGE"
 
+        if not self.setting_changed("acq_mode", md):
+            return
+
         self.write(f"ACQ:MODE {md}")
+        self.invalidate_settings("acquisition")
 
     def limit_measurement_population(self, channel: int, pop: int) -> None:
         """
@@ -524,6 +634,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
         """
 
         # TODO implement edge triggering
+        if not self.setting_changed("trigger_type", "AUTO"):
+            return
+
         self.write("TRIG:SWE AUTO")
 
     def set_trigger_level(self, level: float, chan: int) -> None:
@@ -536,6 +649,9 @@ class Tektronix_Oscilloscope(ScopeDriver):
             chan (int): _description_
         """
 
+        if not self.setting_changed("trigger", (chan, level)):
+            return
+
         self.write(f"TRIG:A:EDGE:SOUR CH{chan}")
         self.write(f"TRIG:A:LEV {level}")
 
@@ -551,23 +667,49 @@ class Tektronix_Oscilloscope(ScopeDriver):
             float: _description_
         """
 
-        # Only using measurement 1
+        self.setup_mean_measurement(chan)
 
-        self.write("MEASU:MEAS1:TYPE MEAN")
+        self.acquire(fallback=delay)
+        val = self.read_mean_measurement(chan)
 
-        self.write(f"MEASU:MEAS1:SOURCE CH{chan}")
-        self.write("MEASU:MEAS1:STATE ON")
+        if val > 9e30:
+            # No valid measurement yet
+            self.acquire(fallback=1)
+            val = self.read_mean_measurement(chan)
 
-        if not self.simulating:
-            time.sleep(delay)
+        self.run()
 
-        val = self.read_query("MEASU:MEAS1:VAL?")
+        return val
 
-        if val > 9e30:
-            time.sleep(1)
-            val = self.read_query("MEASU:MEAS1:VAL?")
+    def setup_mean_measurement(self, chan: int, slot: int = 1) -> None:
+        """
+        setup_mean_measurement
 
-        return val
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+        """
+
+        # Only using measurement 1, unless measuring several channels
+
+        self.write(f"MEASU:MEAS{slot}:TYPE MEAN")
+
+        self.write(f"MEASU:MEAS{slot}:SOURCE CH{chan}")
+        self.write(f"MEASU:MEAS{slot}:STATE ON")
+
+    def read_mean_measurement(self, chan: int, slot: int = 1) -> float:
+        """
+        read_mean_measurement
+
+        Args:
+            chan (int): _description_
+            slot (int, optional): _description_. Defaults to 1.
+
+        Returns:
+            float: _description_
+        """
+
+        return self.read_query(f"MEASU:MEAS{slot}:VAL?")
 
     def measure_rms_noise(self, chan: int, delay: float = 2) -> float:
         """
@@ -592,40 +734,159 @@ class Tektronix_Oscilloscope(ScopeDriver):
 
         return self.read_query("MEASU:MEAS1:VAL?")
 
-    def get_waveform(self, chan: int, delay: float) -> tuple:
+    def measure_rms_noise_host(
+        self,
+        chan: int,
+        precision: float = 0.02,
+        confidence: float = 0.95,
+        max_acquisitions: int = 4,
+    ) -> NoiseEstimate:
         """
-        measure_voltage _summary_
+        measure_rms_noise_host
+        Measure the RMS noise from the waveform rather than the scope measurement.
+        The record of one acquisition is read in chunks, stopping as soon as
+        the RMS is known to the precision. Further acquisitions are only made
+        if the whole record isn't enough
 
         Args:
             chan (int): _description_
-            delay (float): _description_
+            precision (float, optional): confidence interval half width, relative
+            to the RMS. Defaults to 0.02.
+            confidence (float, optional): _description_. Defaults to 0.95.
+            max_acquisitions (int, optional): _description_. Defaults to 4.
+
+        Returns:
+            NoiseEstimate: _description_
         """
 
-        try:
-            self.write(f"DATA:SOURCE CH{chan}")
-            self.write("DATA:WIDTH 1")
-            self.write("DATA:ENC RPB")
-            self.write("DATA:START 1")
-            self.write("DATA:STOP 1000")
-
-            ymult = float(self.query("WFMINPRE:YMULT?"))
-            yzero = float(self.query("WFMINPRE:YZERO?"))
-            yoff = float(self.query("WFMINPRE:YOFF?"))
-            xincr = float(self.query("WFMINPRE:XINCR?"))
-            xdelay = float(self.query("HORizontal:POSition?"))
-            self.write("CURVE?")
-            data = self.instr.read_raw()  # type: ignore
-            headerlen = 2 + int(data[1])
-            header = data[:headerlen]
-            ADC_wave = data[headerlen:-1]
-            ADC_wave = np.array(unpack("%sB" % len(ADC_wave), ADC_wave))
-            Volts = (ADC_wave - yoff) * ymult + yzero
-            Time = np.arange(0, (xincr * len(Volts)), xincr) - (
-                (xincr * len(Volts)) / 2 - xdelay
+        noise = NoiseAccumulator(confidence)
+
+        if self.simulating:
+            record = self.noise_chunk * NoiseAccumulator.min_chunks
+        else:
+            record = int(self.read_query("HOR:RECO?")) or self.noise_chunk
+
+        estimate = noise.estimate(precision)
+
+        for _ in range(max_acquisitions):
+            self.acquire()
+
+            try:
+                for start in range(1, record + 1, self.noise_chunk):
+                    wfm = self.get_waveform(
+                        chan,
+                        points=min(self.noise_chunk, record - start + 1),
+                        width=2,
+                        start=start,
+                    )
+                    noise.add(wfm.volts)
+
+                    estimate = noise.estimate(precision)
+                    if estimate.converged:
+                        return estimate
+            finally:
+                self.run()
+
+        return estimate
+
+    def get_waveform(
+        self,
+        chan: int,
+        delay: float = 0,
+        points: int = 1000,
+        width: int = 1,
+        start: int = 1,
+    ) -> TekWaveform:
+        """
+        get_waveform
+        Transfer the waveform of the channel
+
+        Args:
+            chan (int): _description_
+            delay (float): not used
+            points (int, optional): _description_. Defaults to 1000.
+            width (int, optional): bytes per point, 2 for full resolution. Defaults to 1.
+            start (int, optional): first point of the record, to read in parts. Defaults to 1.
+
+        Returns:
+            TekWaveform: unpacks as (time, volts)
+        """
+
+        fmt = TEK_WORD if width == 2 else TEK_BYTE
+        dtype = np.dtype(fmt.dtype)
+
+        self.write(f"DATA:SOURCE CH{chan}")
+        self.write(fmt.command)
+        self.write(f"DATA:START {start}")
+        self.write(f"DATA:STOP {start + points - 1}")
+
+        if self.simulating:
+            return TekWaveform(
+                adc=np.random.randint(100, 156, points).astype(dtype),
+                ymult=0.01,
+                start=start,
             )
-            return (Time, Volts)
-        except IndexError:
-            return (0, 0)
+
+        try:
+            # Output preamble, to match the data settings above
+            ymult = float(self.query("WFMOUTPRE:YMULT?"))
+            yzero = float(self.query("WFMOUTPRE:YZERO?"))
+            yoff = float(self.query("WFMOUTPRE:YOFF?"))
+            xincr = float(self.query("WFMOUTPRE:XINCR?"))
+            xzero = float(self.query("WFMOUTPRE:XZERO?"))
+
+            adc = query_binary(self, "CURVE?", dtype, self.transfer_chunk)
+        except (ValueError, IndexError) as ex:
+            print(f"Unable to read waveform from channel {chan}: {ex}")
+            return TekWaveform(adc=np.zeros(0, dtype=dtype))
+
+        return TekWaveform(
+            adc=adc,
+            ymult=ymult,
+            yzero=yzero,
+            yoff=yoff,
+            xincr=xincr,
+            xzero=xzero,
+            start=start,
+        )
+
+    def read_waveform(self, chan: int, points: int = 1000) -> np.ndarray:
+        """
+        read_waveform
+        Transfer the waveform of the last acquisition
+
+        Args:
+            chan (int): _description_
+            points (int, optional): _description_. Defaults to 1000.
+
+        Returns:
+            np.ndarray: volts
+        """
+
+        return self.get_waveform(chan, points=points).volts
+
+    def read_timed_waveform(
+        self, chan: int, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        read_timed_waveform
+        Transfer the whole record with its time. The time of the first
+        point is from the preamble, rather than the horizontal position
+
+        Args:
+            chan (int): _description_
+            points (int, optional): used if the record length is unknown. Defaults to 1000.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: time, volts
+        """
+
+        if self.simulating:
+            return tuple(self.get_waveform(chan, points=points, width=2))  # type: ignore
+
+        points = int(self.read_query("HOR:RECO?")) or points
+
+        return tuple(self.get_waveform(chan, points=points, width=2))  # type: ignore
 
     def measure_clear(self) -> None:
         """
@@ -668,17 +929,18 @@ class Tektronix_Oscilloscope(ScopeDriver):
         self.write(f"MEASU:MEAS1:SOURCE CH{chan}")
         self.write("MEASU:MEAS1:STATE ON")
 
-        if not self.simulating:
-            time.sleep(2)  # allow time to measure
-
-        temp = self.read_query("MEASU:MEAS1:VAL?")
-        if temp > 9e30:
-            time.sleep(2)  # some models takes much longer to get an initial reading
-
         total = 0
         for _ in range(num_readings):
-            total += self.read_query("MEASU:MEAS1:VAL?")
-            time.sleep(0.2)
+            # A new acquisition for each reading
+            self.acquire(fallback=2)
+            val = self.read_query("MEASU:MEAS1:VAL?")
+            if val > 9e30:
+                # some models takes much longer to get an initial reading
+                self.acquire(fallback=2)
+                val = self.read_query("MEASU:MEAS1:VAL?")
+            total += val
+
+        self.run()
 
         return total / num_readings
 
@@ -749,36 +1011,6 @@ class Tektronix_Oscilloscope(ScopeDriver):
 
         self.write(f"MARK:{cursor}P {pos}")
 
-    def adjust_cursor(self, target: float) -> None:
-        """
-        adjust_cursor
-        Adjust the cursor time until target voltage met
-
-        Args:
-            target (float): _description_
-        """
-
-        current_y = self.read_query("MARK:Y1P?")
-        current_x = self.read_query("MARK:X1P?")
-
-        time_inc = self.read_query("TIM:SCAL?") / 20
-
-        direction = +1 if current_y < target else -1
-
-        if current_y < target:
-            for _ in range(100):
-                self.set_cursor_position(
-                    cursor="X1", pos=current_x + time_inc * direction
-                )
-                current_x = self.read_query("MARK:X1P?")
-                current_y = self.read_query("MARK:Y1P?")
-                if ((current_y > target) and direction == 1) or (
-                    (current_y < target) and direction == -1
-                ):
-                    break
-        else:
-            ...
-
     def cursors_on(self) -> None:
         """
         cursors_on
@@ -819,6 +1051,8 @@ class Tektronix_Oscilloscope(ScopeDriver):
         if mode.upper().startswith("MAN"):
             self.write(f"HOR:MODE:RECORDLENGTH {record_length}")
 
+        self.invalidate_settings("timebase", "timebase_pos")
+
 
 if __name__ == "__main__":
     dpo2014 = Tektronix_Oscilloscope(simulate=False)
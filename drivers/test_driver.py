@@ -4,7 +4,8 @@ Running ensures all methods have been implemented
 """
 
 from base_scope_driver import ScopeDriver
-from typing import List
+from typing import List, Tuple
+import numpy as np
 
 
 class TestScope(ScopeDriver):
@@ -90,9 +91,26 @@ class TestScope(ScopeDriver):
     def measure_clear(self) -> None:
         return super().measure_clear()
 
+    def setup_mean_measurement(self, chan: int, slot: int = 1) -> None:
+        return super().setup_mean_measurement(chan, slot)
+
+    def read_mean_measurement(self, chan: int, slot: int = 1) -> float:
+        return super().read_mean_measurement(chan, slot)
+
+    def read_waveform(self, chan: int, points: int = 1000) -> np.ndarray:
+        return super().read_waveform(chan, points)
+
+    def read_timed_waveform(
+        self, chan: int, points: int = 1000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return super().read_timed_waveform(chan, points)
+
     def check_triggered(self, sweep_time: float = 0.1) -> bool:
         return super().check_triggered(sweep_time)
 
+    def set_cursor_position(self, cursor: str, pos: float) -> None:
+        return super().set_cursor_position(cursor, pos)
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,243 @@
+"""
+# Cache of the compiled test plan for a results workbook
+# Loading an xlsx with openpyxl takes seconds on the larger templates, and the
+# GUI opens the same workbook several times before a run starts. The parts of
+# the sheet used to plan the tests are saved as JSON in the user cache
+# directory, and used as long as the workbook hasn't changed since
+# DK Oct 26
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Tuple
+
+VERSION = "A.00.02"
+
+CACHE_FORMAT = 3  # Increment if the plan contents change
+
+
+@dataclass
+class TestPlan:
+    """
+    Everything read from the workbook to find and configure the tests.
+    Only plain types are stored so the cache doesn't depend on module names
+    """
+
+    sheet_index: int
+    size: int  # workbook file size, mtime and hash the plan was compiled from
+    mtime_ns: int
+    sha256: str
+    max_row: int  # used range of the sheet
+    data_col: int
+    start_row: int
+    named_cells: Dict[str, Tuple[int, int, Any]] = field(default_factory=dict)
+    rows: Dict[int, Tuple] = field(default_factory=dict)  # settings block values
+    results_cols: Dict[int, int] = field(default_factory=dict)  # row -> col
+    units_cols: Dict[int, int] = field(default_factory=dict)
+    header_rows: List[int] = field(default_factory=list)
+    filters: Dict[int, Any] = field(default_factory=dict)  # col A channel filter
+    cache_format: int = CACHE_FORMAT
+
+
+def file_hash(data: bytes) -> str:
+    """
+    file_hash
+
+    Args:
+        data (bytes): file contents
+
+    Returns:
+        str: sha256 hex digest
+    """
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_dir() -> str:
+    """
+    cache_dir
+    Per user cache directory. Kept off the (often shared) results folder,
+    so the cache isn't left next to every workbook or template opened
+
+    Returns:
+        str: _description_
+    """
+
+    base = (
+        os.environ.get("LOCALAPPDATA")
+        or os.environ.get("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+
+    return os.path.join(base, "RFTS", "Oscilloscope", "plans")
+
+
+def _encode(value: Any) -> Any:
+    """
+    _encode
+    JSON doesn't support dates and times, so tag them
+    """
+
+    for kind in (datetime, date, time):
+        if isinstance(value, kind):
+            return {kind.__name__: value.isoformat()}
+
+    raise TypeError(f"Can't cache {type(value).__name__} {value!r}")
+
+
+def _decode(value: Dict[str, Any]) -> Any:
+    """
+    _decode
+    Reverse of _encode
+    """
+
+    for kind in (datetime, date, time):
+        tag = kind.__name__
+        if list(value) == [tag] and isinstance(value[tag], str):
+            return kind.fromisoformat(value[tag])
+
+    return value
+
+
+def _from_json(data: Dict[str, Any]) -> TestPlan:
+    """
+    _from_json
+    JSON has string keys and lists, put back the int keys and tuples
+
+    Args:
+        data (Dict[str, Any]): _description_
+
+    Returns:
+        TestPlan: _description_
+    """
+
+    data["named_cells"] = {
+        name: tuple(cell) for name, cell in data["named_cells"].items()
+    }
+    data["rows"] = {int(row): tuple(block) for row, block in data["rows"].items()}
+
+    for key in ("results_cols", "units_cols", "filters"):
+        data[key] = {int(row): value for row, value in data[key].items()}
+
+    return TestPlan(**data)
+
+
+class TestPlanCache:
+    """
+    TestPlanCache
+    JSON file in the user cache directory holding the compiled plan, named
+    from the workbook path. The plan is valid when the workbook size and
+    modification time match. If only the time has changed (file copied or
+    touched) the contents are hashed to check
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        path = os.path.normcase(os.path.abspath(filename))
+        key = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(
+            cache_dir(), f"{os.path.basename(filename)}.{key}.plan.json"
+        )
+
+    def load(self, sheet_index: int = 0) -> TestPlan | None:
+        """
+        load
+        Get the plan if it still matches the workbook
+
+        Args:
+            sheet_index (int, optional): worksheet the plan is for. Defaults to 0.
+
+        Returns:
+            TestPlan | None: None if there is no valid plan
+        """
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as infile:
+                plan = _from_json(json.load(infile, object_hook=_decode))
+            st = os.stat(self.filename)
+        except Exception:
+            # Missing, corrupted or from an old version
+            return None
+
+        if plan.cache_format != CACHE_FORMAT or plan.sheet_index != sheet_index:
+            return None
+
+        if plan.size != st.st_size:
+            return None
+
+        if plan.mtime_ns != st.st_mtime_ns:
+            try:
+                with open(self.filename, "rb") as infile:
+                    digest = file_hash(infile.read())
+            except OSError:
+                return None
+
+            if digest != plan.sha256:
+                return None
+
+            # Same contents, save the new time so it isn't hashed again
+            plan.mtime_ns = st.st_mtime_ns
+            self.save(plan)
+
+        return plan
+
+    def stamp(self, plan: TestPlan, data: bytes | None = None) -> TestPlan:
+        """
+        stamp
+        Record the current state of the workbook file in the plan
+
+        Args:
+            plan (TestPlan): _description_
+            data (bytes | None, optional): file contents if already read. Defaults to None.
+
+        Returns:
+            TestPlan: the plan
+        """
+
+        if data is None:
+            with open(self.filename, "rb") as infile:
+                data = infile.read()
+
+        st = os.stat(self.filename)
+
+        plan.size = st.st_size
+        plan.mtime_ns = st.st_mtime_ns
+        plan.sha256 = file_hash(data)
+
+        return plan
+
+    def save(self, plan: TestPlan) -> None:
+        """
+        save
+        Write the plan. Written to a temporary file first so a crash can't
+        leave a partial cache
+
+        Args:
+            plan (TestPlan): _description_
+        """
+
+        temp = f"{self.path}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp, "w", encoding="utf-8") as outfile:
+                json.dump(asdict(plan), outfile, default=_encode)
+            os.replace(temp, self.path)
+        except (OSError, TypeError, ValueError) as ex:
+            # Only a cache, the workbook is parsed next time
+            print(f"Unable to save test plan {self.path}: {ex}")
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+
+    def clear(self) -> None:
+        """
+        clear
+        Remove the cache file
+        """
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
@@ -0,0 +1,209 @@
+"""
+# Wait for an instrument to complete an operation
+# Rather than sleeping for a fixed time, ask the instrument when it has
+# finished, using *OPC?, polling the status register or a service request.
+# A fixed sleep is only used for instruments that can't report completion
+# DK Oct 26
+"""
+
+import time
+from enum import Enum
+from typing import Any
+
+import pyvisa
+from pyvisa import constants
+
+VERSION = "A.00.01"
+
+
+class WaitMode(Enum):
+    """
+    WaitMode
+    How to find out the operation is complete
+    """
+
+    OPC_QUERY = 0  # *OPC? blocks until complete. Holds the bus
+    ESR_POLL = 1  # *OPC then poll *ESR? for operation complete
+    SRQ = 2  # *OPC with a service request on operation complete
+    SLEEP = 3  # Can't report completion, wait the fallback time
+
+
+class WaitEngine:
+    """
+    WaitEngine
+    Waits on the instrument of a driver. The driver needs write, query,
+    instr and simulating, as all the drivers have
+    """
+
+    poll_interval: float = 0.05  # seconds between *ESR? polls
+
+    __esr_opc = 0x01  # Operation complete bit of the event status register
+    __stb_esb = 0x20  # Event summary bit of the status byte
+
+    def __init__(self, driver: Any, mode: WaitMode = WaitMode.OPC_QUERY) -> None:
+        """
+        __init__
+
+        Args:
+            driver (Any): instrument driver
+            mode (WaitMode, optional): _description_. Defaults to WaitMode.OPC_QUERY.
+        """
+
+        self.driver = driver
+        self.mode = mode
+
+    def wait(self, timeout: float = 10, fallback: float = 1) -> bool:
+        """
+        wait
+        Wait for the operations sent so far to complete
+
+        Args:
+            timeout (float, optional): longest to wait, seconds. Defaults to 10.
+            fallback (float, optional): time to sleep if the instrument can't
+            report completion, seconds. Defaults to 1.
+
+        Returns:
+            bool: True if complete, False if timed out
+        """
+
+        if flush := getattr(self.driver, "flush_batch", None):
+            flush()  # the operations have to be sent first
+
+        if self.driver.simulating:
+            return True
+
+        if self.mode == WaitMode.SLEEP:
+            time.sleep(fallback)
+            return True
+
+        deadline = time.monotonic() + timeout
+
+        try:
+            if self.mode == WaitMode.SRQ:
+                return self.__wait_srq(deadline)
+
+            if self.mode == WaitMode.ESR_POLL:
+                return self.__wait_esr(deadline)
+
+            return self.__wait_opc(deadline)
+        except pyvisa.VisaIOError as ex:
+            print(f"Wait for {self.driver.model} failed: {ex}")
+            # Don't know, so allow the time it used to take
+            time.sleep(max(0, min(fallback, deadline - time.monotonic())))
+            return False
+
+    def __wait_opc(self, deadline: float) -> bool:
+        """
+        __wait_opc
+        *OPC? replies when everything is complete. The VISA timeout is
+        extended to the deadline so the query doesn't time out first
+
+        Args:
+            deadline (float): _description_
+
+        Returns:
+            bool: _description_
+        """
+
+        # Direct to the instrument, the driver query retries on a timeout
+        instr = self.driver.instr
+        tmo = instr.timeout
+
+        try:
+            instr.timeout = max(tmo, int((deadline - time.monotonic()) * 1000))
+            reply = instr.query("*OPC?")
+        except pyvisa.VisaIOError as ex:
+            if ex.error_code != constants.StatusCode.error_timeout:
+                raise
+            # The reply comes later, and would be read by the next query
+            self.__clear(instr)
+            return False
+        finally:
+            instr.timeout = tmo
+
+        return reply.strip().startswith("1")
+
+    def __clear(self, instr: Any) -> None:
+        """
+        __clear
+        Device clear, to drop a late reply from the output buffer
+
+        Args:
+            instr (Any): pyvisa resource
+        """
+
+        try:
+            instr.clear()
+        except pyvisa.VisaIOError as ex:
+            print(f"Clear of {self.driver.model} failed: {ex}")
+
+    def __wait_esr(self, deadline: float) -> bool:
+        """
+        __wait_esr
+        Poll the event status register, leaves the bus free between polls
+
+        Args:
+            deadline (float): _description_
+
+        Returns:
+            bool: _description_
+        """
+
+        self.driver.query("*ESR?")  # clear the register
+        self.driver.write("*OPC")
+
+        while time.monotonic() < deadline:
+            try:
+                esr = int(self.driver.query("*ESR?").strip())
+            except ValueError:
+                esr = 0
+
+            if esr & self.__esr_opc:
+                return True
+
+            time.sleep(self.poll_interval)
+
+        return False
+
+    def __wait_srq(self, deadline: float) -> bool:
+        """
+        __wait_srq
+        Have the instrument assert SRQ when the operation is complete.
+        Falls back to polling if the interface doesn't support events
+
+        Args:
+            deadline (float): _description_
+
+        Returns:
+            bool: _description_
+        """
+
+        instr = self.driver.instr
+
+        try:
+            instr.enable_event(
+                constants.EventType.service_request, constants.EventMechanism.queue
+            )
+        except (pyvisa.VisaIOError, AttributeError, NotImplementedError):
+            return self.__wait_esr(deadline)
+
+        try:
+            self.driver.write("*CLS")
+            self.driver.write(f"*ESE {self.__esr_opc}")
+            self.driver.write(f"*SRE {self.__stb_esb}")
+            self.driver.write("*OPC")
+
+            remaining = int(max(0, deadline - time.monotonic()) * 1000)
+            instr.wait_on_event(constants.EventType.service_request, remaining)
+            instr.read_stb()
+            self.driver.query("*ESR?")  # clear
+            return True
+        except pyvisa.VisaIOError as ex:
+            if ex.error_code != constants.StatusCode.error_timeout:
+                raise
+            return False
+        finally:
+            self.driver.write("*SRE 0")
+            instr.disable_event(
+                constants.EventType.service_request, constants.EventMechanism.queue
+            )
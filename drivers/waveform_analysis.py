@@ -0,0 +1,325 @@
+"""
+# Statistics of waveforms read from a scope
+# Rather than waiting for the scope measurement statistics to update, the
+# waveform of one acquisition is transferred and the statistics are
+# calculated here
+# DK Oct 26
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+VERSION = "A.00.03"
+
+
+@dataclass(frozen=True)
+class WaveformStats:
+    """
+    DC statistics of a waveform, in volts
+    """
+
+    mean: float
+    rms: float
+    std: float
+    min: float
+    max: float
+    count: int  # number of points
+
+
+def waveform_stats(volts: np.ndarray) -> WaveformStats:
+    """
+    waveform_stats
+
+    Args:
+        volts (np.ndarray): waveform
+
+    Returns:
+        WaveformStats: _description_
+    """
+
+    volts = np.asarray(volts, dtype=np.float64)
+
+    if not volts.size:
+        return WaveformStats(
+            mean=np.nan, rms=np.nan, std=np.nan, min=np.nan, max=np.nan, count=0
+        )
+
+    return WaveformStats(
+        mean=float(volts.mean()),
+        rms=float(np.sqrt(np.mean(np.square(volts)))),
+        std=float(volts.std()),
+        min=float(volts.min()),
+        max=float(volts.max()),
+        count=int(volts.size),
+    )
+
+
+def channel_stats(waveforms: Dict[int, np.ndarray]) -> Dict[int, WaveformStats]:
+    """
+    channel_stats
+    Statistics of several channels. Channels of the same length (the usual
+    case, from one acquisition) are calculated together as a 2D array
+
+    Args:
+        waveforms (Dict[int, np.ndarray]): channel -> volts
+
+    Returns:
+        Dict[int, WaveformStats]: channel -> statistics
+    """
+
+    lengths = {len(volts) for volts in waveforms.values()}
+
+    if len(lengths) != 1 or 0 in lengths:
+        return {chan: waveform_stats(volts) for chan, volts in waveforms.items()}
+
+    chans = list(waveforms)
+    block = np.vstack([np.asarray(waveforms[chan], dtype=np.float64) for chan in chans])
+
+    means = block.mean(axis=1)
+    rms = np.sqrt(np.mean(np.square(block), axis=1))
+    stds = block.std(axis=1)
+    mins = block.min(axis=1)
+    maxs = block.max(axis=1)
+
+    return {
+        chan: WaveformStats(
+            mean=float(means[i]),
+            rms=float(rms[i]),
+            std=float(stds[i]),
+            min=float(mins[i]),
+            max=float(maxs[i]),
+            count=block.shape[1],
+        )
+        for i, chan in enumerate(chans)
+    }
+
+
+def edge_crossing(
+    time: np.ndarray,
+    volts: np.ndarray,
+    level: float,
+    near: float = 0.0,
+    rising: bool = True,
+) -> float:
+    """
+    edge_crossing
+    Time the waveform crosses the level, interpolated between the samples
+    either side. If there are several edges, the one nearest to near
+
+    Args:
+        time (np.ndarray): _description_
+        volts (np.ndarray): _description_
+        level (float): _description_
+        near (float, optional): time to look for the edge. Defaults to 0.0.
+        rising (bool, optional): _description_. Defaults to True.
+
+    Returns:
+        float: seconds, nan if no crossing
+    """
+
+    time = np.asarray(time, dtype=np.float64)
+    volts = np.asarray(volts, dtype=np.float64)
+
+    above = volts >= level
+    if rising:
+        index = np.flatnonzero(~above[:-1] & above[1:])
+    else:
+        index = np.flatnonzero(above[:-1] & ~above[1:])
+
+    if not index.size:
+        return np.nan
+
+    v0, v1 = volts[index], volts[index + 1]
+    t0, t1 = time[index], time[index + 1]
+
+    # One side is below the level, the other at or above, so v1 != v0
+    crossings = t0 + (level - v0) * (t1 - t0) / (v1 - v0)
+
+    return float(crossings[np.argmin(np.abs(crossings - near))])
+
+
+@lru_cache(maxsize=None)
+def t_quantile(confidence: float, dof: int) -> float:
+    """
+    t_quantile
+    Two sided Student-t value, so the mean of dof + 1 samples is within
+    t * std / sqrt(n) with the confidence. With few samples this is much
+    wider than the normal z (4.30 for 2 dof at 95 %, against 1.96).
+    With t = sqrt(dof) tan(theta) the probability is an integral of
+    cos(phi) ** (dof - 1) from 0 to theta, solved for theta by bisection
+
+    Args:
+        confidence (float): eg 0.95
+        dof (int): degrees of freedom
+
+    Returns:
+        float: _description_
+    """
+
+    scale = (
+        2
+        * math.exp(math.lgamma((dof + 1) / 2) - math.lgamma(dof / 2))
+        / math.sqrt(math.pi)
+    )
+
+    def probability(theta: float) -> float:
+        # Simpson's rule, the integrand is smooth and bounded
+        phi = np.linspace(0, theta, 201)
+        y = np.cos(phi) ** (dof - 1)
+        return (
+            scale
+            * theta
+            / 600
+            * (y[0] + y[-1] + 4 * y[1:-1:2].sum() + 2 * y[2:-1:2].sum())
+        )
+
+    low, high = 0.0, math.pi / 2
+    for _ in range(60):
+        theta = (low + high) / 2
+        if probability(theta) < confidence:
+            low = theta
+        else:
+            high = theta
+
+    return math.sqrt(dof) * math.tan((low + high) / 2)
+
+
+@dataclass(frozen=True)
+class NoiseEstimate:
+    """
+    AC RMS noise calculated from waveform points, with its confidence interval
+    """
+
+    rms: float
+    count: int  # number of points
+    chunks: int  # number of chunks the interval is calculated from
+    low: float  # confidence interval
+    high: float
+    confidence: float
+    converged: bool  # interval within the precision asked for
+
+    @property
+    def precision(self) -> float:
+        """
+        Half width of the interval, relative to the RMS
+        """
+
+        if not self.rms:
+            return math.inf
+
+        return (self.high - self.low) / 2 / self.rms
+
+
+class NoiseAccumulator:
+    """
+    NoiseAccumulator
+    AC RMS (standard deviation) of a record read in chunks, so the whole
+    record never needs to be in memory or even transferred.
+
+    Points next to each other are correlated by the bandwidth limit and
+    averaging, so the interval isn't from the number of points. Each chunk
+    gives its own RMS, and the interval is from the spread of those (batch
+    means) with the Student-t value for that few chunks. At least
+    min_chunks are needed before there is an interval
+    """
+
+    min_chunks: int = 3
+
+    def __init__(self, confidence: float = 0.95) -> None:
+        """
+        __init__
+
+        Args:
+            confidence (float, optional): of the interval. Defaults to 0.95.
+        """
+
+        self.confidence = confidence
+
+        self.count = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0  # sum of squared differences from the mean
+        self.__chunk_rms: List[float] = []
+
+    def add(self, volts: np.ndarray) -> None:
+        """
+        add
+        Combine the next chunk of the record
+
+        Args:
+            volts (np.ndarray): _description_
+        """
+
+        volts = np.asarray(volts, dtype=np.float64)
+
+        if not volts.size:
+            return
+
+        mean = float(volts.mean())
+        m2 = float(np.square(volts - mean).sum())
+
+        # Combine with the chunks so far (Chan et al)
+        count = self.count + volts.size
+        delta = mean - self.__mean
+        self.__m2 += m2 + delta * delta * self.count * volts.size / count
+        self.__mean += delta * volts.size / count
+        self.count = count
+
+        self.__chunk_rms.append(math.sqrt(m2 / volts.size))
+
+    @property
+    def rms(self) -> float:
+        """
+        AC RMS of all the points so far
+        """
+
+        if not self.count:
+            return math.nan
+
+        return math.sqrt(self.__m2 / self.count)
+
+    def estimate(self, precision: float = 0.02) -> NoiseEstimate:
+        """
+        estimate
+        The RMS so far
+
+        Args:
+            precision (float, optional): half width of the interval relative
+            to the RMS to be converged. Defaults to 0.02.
+
+        Returns:
+            NoiseEstimate: _description_
+        """
+
+        rms = self.rms
+        chunks = len(self.__chunk_rms)
+
+        if chunks < self.min_chunks:
+            return NoiseEstimate(
+                rms=rms,
+                count=self.count,
+                chunks=chunks,
+                low=-math.inf,
+                high=math.inf,
+                confidence=self.confidence,
+                converged=False,
+            )
+
+        half_width = (
+            t_quantile(self.confidence, chunks - 1)
+            * float(np.std(self.__chunk_rms, ddof=1))
+            / chunks**0.5
+        )
+
+        return NoiseEstimate(
+            rms=rms,
+            count=self.count,
+            chunks=chunks,
+            low=rms - half_width,
+            high=rms + half_width,
+            confidence=self.confidence,
+            converged=half_width <= precision * rms,
+        )
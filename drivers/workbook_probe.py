@@ -0,0 +1,232 @@
+"""
+# Read only checks of a results workbook
+# The GUI checks the sheet several times before a test run. None of the checks
+# need the workbook loaded for editing, so use the cached test plan if it is
+# valid, else stream the first sheet in read only mode. Nothing is written
+# DK Oct 26
+"""
+
+from typing import Any, Dict, List, Set, Tuple
+
+import openpyxl
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+try:
+    from drivers.excel_interface import ExcelInterface
+    from drivers.test_plan_cache import TestPlanCache
+except ModuleNotFoundError:
+    from excel_interface import ExcelInterface
+    from test_plan_cache import TestPlanCache
+
+VERSION = "A.00.00"
+
+
+class WorkbookProbe:
+    """
+    WorkbookProbe
+    Answers the same questions as ExcelInterface for the checks made before
+    a test run, from a single read of the sheet
+    """
+
+    __start_row: int = 10  # Same defaults as ExcelInterface
+    __max_row: int = 2000
+    __data_col: int = 10
+
+    def __init__(self, filename: str, sheetindex: int = 0) -> None:
+        """
+        __init__
+        Read the workbook
+
+        Args:
+            filename (str): _description_
+            sheetindex (int, optional): _description_. Defaults to 0.
+        """
+
+        self.filename = filename
+
+        self.__named_cells: Dict[str, Tuple[int, int, Any]] = {}
+        self.__functions: Dict[int, Any] = {}  # row -> data column, non empty
+        self.__filters: Dict[int, Any] = {}  # row -> col A
+
+        if plan := TestPlanCache(filename).load(sheetindex):
+            self.__named_cells = plan.named_cells
+            self.start_row = plan.start_row
+            self.data_col = plan.data_col
+            self.__functions = {
+                row: values[0] for row, values in plan.rows.items() if values[0]
+            }
+            self.__filters = plan.filters
+        else:
+            self.__read_workbook(sheetindex)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+    def __read_workbook(self, sheetindex: int) -> None:
+        """
+        __read_workbook
+        Stream the sheet, only keeping the columns needed
+
+        Args:
+            sheetindex (int): _description_
+        """
+
+        wb = openpyxl.load_workbook(self.filename, read_only=True, data_only=False)
+
+        try:
+            ws = wb.worksheets[sheetindex]
+
+            coords: Dict[str, Tuple[int, int]] = {}
+            for name in list(wb.defined_names):
+                try:
+                    _, coord = next(wb.defined_names[name].destinations)
+                    xy = coordinate_from_string(coord)
+                    coords[name] = (column_index_from_string(xy[0]), xy[1])
+                except Exception:
+                    # Not a cell reference
+                    continue
+
+            if "StartCell" in coords:
+                self.data_col = coords["StartCell"][0]
+            else:
+                self.data_col = self.__data_col
+
+            last_row = max([self.__max_row - 1] + [row for _, row in coords.values()])
+            last_col = max([1, self.data_col] + [col for col, _ in coords.values()])
+
+            values: Dict[Tuple[int, int], Any] = {}
+            wanted = {(col, row) for col, row in coords.values()}
+
+            for row, cells in enumerate(
+                ws.iter_rows(
+                    min_row=1, max_row=last_row, max_col=last_col, values_only=True
+                ),
+                start=1,
+            ):
+                if not cells:
+                    continue
+
+                if cells[0] is not None:
+                    self.__filters[row] = cells[0]
+
+                if len(cells) >= self.data_col and cells[self.data_col - 1]:
+                    self.__functions[row] = cells[self.data_col - 1]
+
+                for col, cell_row in wanted:
+                    if cell_row == row and col <= len(cells):
+                        values[(col, row)] = cells[col - 1]
+        finally:
+            wb.close()
+
+        self.__named_cells = {
+            name: (col, row, values.get((col, row)))
+            for name, (col, row) in coords.items()
+        }
+
+        # Same order as ExcelInterface.initialize
+        if "StartCell" in self.__named_cells:
+            self.start_row = self.__named_cells["StartCell"][1]
+        elif rw := self.__functions.get(1):
+            try:
+                self.start_row = int(rw)
+            except ValueError:
+                self.start_row = self.__start_row
+        else:
+            self.start_row = self.__start_row
+
+        # Only the rows ExcelInterface would look at
+        self.__functions = {
+            row: val
+            for row, val in self.__functions.items()
+            if self.start_row <= row < self.__max_row
+        }
+
+    def __test_rows(self) -> List[int]:
+        """
+        __test_rows
+        The start row, then the rows with a supported test
+
+        Returns:
+            List[int]: _description_
+        """
+
+        return [
+            row
+            for row in sorted(set(self.__functions) | {self.start_row})
+            if row == self.start_row
+            or str(self.__functions[row]).upper() in ExcelInterface.supported_test_names
+        ]
+
+    def check_valid_results(self) -> bool:
+        """
+        check_valid_results
+        The sheet has the StartCell named cell
+
+        Returns:
+            bool: _description_
+        """
+
+        return "StartCell" in self.__named_cells
+
+    def get_serial_number(self) -> str:
+        """
+        get_serial_number
+
+        Returns:
+            str: _description_
+        """
+
+        sn = self.__named_cells.get("Serial")
+
+        return sn[2] if sn else ""
+
+    def get_test_types(self) -> Set:
+        """
+        get_test_types
+        Get a list of the unique tests
+
+        Returns:
+            Set: _description_
+        """
+
+        return {
+            self.__functions[row]
+            for row in self.__test_rows()
+            if row in self.__functions
+        }
+
+    def get_invalid_tests(self) -> List:
+        """
+        get_invalid_tests
+        Return a list of rows where the test type is not one of the supported tests
+
+        Returns:
+            List: [function, row]
+        """
+
+        return [
+            [val, row]
+            for row, val in sorted(self.__functions.items())
+            if val not in ExcelInterface.supported_test_names
+        ]
+
+    def check_channel_rows(self) -> bool:
+        """
+        check_channel_rows
+        Some results sheets have a channel column in Col A, as the same model
+        can have different channel counts (eg Tek MSO)
+
+        Returns:
+            bool: _description_
+        """
+
+        mdl = self.__named_cells.get("Model")
+
+        if not mdl:
+            # Model cell hasn't been set
+            return False
+
+        return self.__filters.get(mdl[1]) is None
@@ -0,0 +1,300 @@
+"""
+# Background saving of the results workbook
+# openpyxl has to serialize the whole workbook on every save, which can take
+# a long time on the larger templates. Saves are done on a worker thread so the
+# measurement thread never waits on it, except for the final save on close
+# DK Oct 26
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from openpyxl import Workbook
+
+VERSION = "A.00.03"
+
+
+class WorkbookSaver:
+    """
+    WorkbookSaver
+    Worker thread to save the workbook.
+    Save requests made while a save is in progress are coalesced, so only the
+    latest state is written. Failed saves (typically the file open in Excel)
+    are retried with an exponential backoff
+    """
+
+    max_attempts: int = 8
+    initial_backoff: float = 0.25  # seconds
+    max_backoff: float = 8
+
+    def __init__(
+        self,
+        wb: Workbook,
+        filename: str,
+        on_saved: Callable[[int], None] | None = None,
+        on_written: Callable[[], None] | None = None,
+        on_cell: Callable[[int, int, int, Any], None] | None = None,
+    ) -> None:
+        """
+        __init__
+
+        Args:
+            wb (Workbook): workbook to save
+            filename (str): _description_
+            on_saved (Callable[[int], None] | None, optional): called from the worker
+            thread with the change count included in the save. Defaults to None.
+            on_written (Callable[[], None] | None, optional): called from the worker
+            thread straight after the file is written, while the workbook is still
+            locked so it matches the file. Defaults to None.
+            on_cell (Callable[[int, int, int, Any], None] | None, optional): called
+            with sheet, row, col and value when a write is put in the workbook, while
+            it is locked, so before or after any on_written. Defaults to None.
+        """
+
+        self.wb = wb
+        self.filename = filename
+        self.on_saved = on_saved
+        self.on_written = on_written
+        self.on_cell = on_cell
+
+        # Held whenever the workbook is being serialized or modified
+        self.lock = threading.RLock()
+
+        self.__condition = threading.Condition()
+        self.__changes = 0
+        self.__saved_changes = 0
+        self.__requested = False
+        self.__busy = False
+        self.__failed = False
+        self.__stop = False
+
+        # Cell writes that arrived while the workbook was being serialized
+        self.__deferred: Dict[Tuple[int, int, int], Any] = {}
+
+        self.__thread = threading.Thread(
+            target=self.__run, name="WorkbookSaver", daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def dirty(self) -> bool:
+        """
+        dirty
+        There are changes that haven't been saved
+        """
+
+        with self.__condition:
+            return self.__changes > self.__saved_changes
+
+    @property
+    def failed(self) -> bool:
+        """
+        failed
+        The last save failed after all retries
+        """
+
+        return self.__failed
+
+    def mark_dirty(self) -> int:
+        """
+        mark_dirty
+        Record a change to the workbook
+
+        Returns:
+            int: total number of changes
+        """
+
+        with self.__condition:
+            self.__changes += 1
+            return self.__changes
+
+    def write_cell(self, sheet: int, row: int, col: int, value: Any) -> int:
+        """
+        write_cell
+        Write the cell now if the workbook isn't being saved, else defer it
+        until the save completes so the caller doesn't block
+
+        Args:
+            sheet (int): worksheet index
+            row (int): _description_
+            col (int): _description_
+            value (Any): _description_
+
+        Returns:
+            int: total number of changes
+        """
+
+        if self.lock.acquire(blocking=False):
+            try:
+                self.wb.worksheets[sheet].cell(column=col, row=row).value = value
+                if self.on_cell:
+                    self.on_cell(sheet, row, col, value)
+                # Counted before the worker can take its snapshot
+                return self.mark_dirty()
+            finally:
+                self.lock.release()
+
+        # Deferred and counted together, so a save counts it only if the
+        # value was applied before the file was written
+        with self.__condition:
+            self.__deferred[(sheet, row, col)] = value
+            self.__changes += 1
+            return self.__changes
+
+    def deferred_value(self, sheet: int, row: int, col: int) -> Tuple[bool, Any]:
+        """
+        deferred_value
+        Get a value that has been written but not yet put in the workbook
+
+        Returns:
+            Tuple[bool, Any]: found, value
+        """
+
+        with self.__condition:
+            key = (sheet, row, col)
+            if key in self.__deferred:
+                return True, self.__deferred[key]
+
+        return False, None
+
+    def request(self) -> None:
+        """
+        request
+        Ask for the workbook to be saved. Returns immediately
+        """
+
+        with self.__condition:
+            if self.__changes > self.__saved_changes:
+                self.__requested = True
+                self.__failed = False
+                self.__condition.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        wait
+        Block until all changes are saved, or the save failed
+
+        Args:
+            timeout (float | None, optional): seconds. Defaults to None (forever).
+
+        Returns:
+            bool: True if everything is saved
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.__condition:
+            while (
+                self.__changes > self.__saved_changes or self.__busy
+            ) and not self.__failed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                if not self.__requested and not self.__busy:
+                    # Nothing in progress, so save now
+                    self.__requested = True
+                    self.__condition.notify_all()
+                self.__condition.wait(remaining)
+
+            return self.__changes <= self.__saved_changes
+
+    def close(self, timeout: float | None = None) -> bool:
+        """
+        close
+        Save any outstanding changes and stop the worker
+
+        Returns:
+            bool: True if everything was saved
+        """
+
+        self.request()  # retry if a previous save failed
+        saved = self.wait(timeout)
+
+        with self.__condition:
+            self.__stop = True
+            self.__condition.notify_all()
+
+        self.__thread.join(timeout=1)
+
+        return saved
+
+    def __apply_deferred(self) -> int:
+        """
+        __apply_deferred
+        Put the cell writes made during a save into the workbook.
+        Must hold the lock
+
+        Returns:
+            int: number of changes now in the workbook
+        """
+
+        with self.__condition:
+            deferred = self.__deferred
+            self.__deferred = {}
+            changes = self.__changes
+
+        for (sheet, row, col), value in deferred.items():
+            self.wb.worksheets[sheet].cell(column=col, row=row).value = value
+            if self.on_cell:
+                self.on_cell(sheet, row, col, value)
+
+        return changes
+
+    def __run(self) -> None:
+        """
+        __run
+        Worker thread loop
+        """
+
+        while True:
+            with self.__condition:
+                while not self.__requested and not self.__stop:
+                    self.__condition.wait()
+
+                if self.__stop:
+                    return
+
+                self.__requested = False
+                self.__busy = True
+
+            attempt = 0
+
+            while True:
+                with self.lock:
+                    snapshot = self.__apply_deferred()
+                    try:
+                        self.wb.save(self.filename)
+                        error = None
+                    except Exception as ex:
+                        # PermissionError if open in Excel. openpyxl can also fail
+                        # if a cell is created while it is serializing
+                        error = ex
+
+                    if error is None and self.on_written:
+                        self.on_written()
+
+                    self.__apply_deferred()
+
+                if error is None:
+                    break
+
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    print(f"Unable to save {self.filename}: {error}")
+                    break
+
+                time.sleep(
+                    min(self.initial_backoff * 2 ** (attempt - 1), self.max_backoff)
+                )
+
+            if error is None and self.on_saved:
+                self.on_saved(snapshot)
+
+            with self.__condition:
+                self.__busy = False
+                if error is None:
+                    self.__saved_changes = max(self.__saved_changes, snapshot)
+                else:
+                    self.__failed = True
+                self.__condition.notify_all()
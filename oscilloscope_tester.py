@@ -7,13 +7,14 @@ Tests vary by manufacturer
 import math
 import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Dict, List, Set, Tuple
 
 from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QDialog, QInputDialog, QMessageBox
 
-from drivers.excel_interface import ExcelInterface
+from drivers.excel_interface import DcvSettings, ExcelInterface
 from drivers.fluke_5700a import Fluke5700A
+from drivers.instrument_executor import InstrumentExecutor, RowGraph
 from drivers.keysight_scope import DSOX_FAMILY, Keysight_Oscilloscope
 from drivers.Ks3458A import Ks3458A, Ks3458A_Function
 from drivers.Ks33250A import Ks33250A
@@ -54,6 +55,26 @@ class TestOscilloscope(QDialog, object):
         self.use_filter = False
         self.abort_test = False
 
+        # DCV readings taken when stable, rather than after the worst case settling time
+        self.adaptive_measurement = True
+
+        # DC balance from the waveform mean rather than the scope measurement
+        self.host_statistics = False
+
+        # Random noise from the waveform, read until the RMS is known to this
+        # precision (relative 95 % interval), rather than the scope measurement
+        self.host_noise = True
+        self.noise_precision = 0.02
+
+        # Timebase from edges interpolated in the waveforms, for all scopes,
+        # rather than Keysight cursors or the operator reading the error
+        self.waveform_timebase = True
+
+        # The calibrator and scope steps of a DCV row run at the same time,
+        # each instrument on its own worker. Set concurrent False for in order.
+        # The workers are started as needed and stopped after each run
+        self.executor = InstrumentExecutor()
+
     def local_all(self) -> None:
         """
         local_all
@@ -132,6 +153,9 @@ class TestOscilloscope(QDialog, object):
 
         Other tests skip rows not implemented as they are quick to perform
 
+        The results sheet is opened once for the whole run, and the same session
+        is handed to each test so the workbook is only parsed once
+
         Args:
             filename (str): _description_
             test_rows (List): _description_
@@ -153,7 +177,8 @@ class TestOscilloscope(QDialog, object):
         if self.simulating:
             self.uut.num_channels = num_channels
 
-        with ExcelInterface(filename=filename) as excel:
+        # The executor workers are stopped at the end of the run, even on an exception
+        with ExcelInterface(filename=filename) as excel, self.executor:
             excel.backup()
 
             # first update the model and serial
@@ -167,11 +192,9 @@ class TestOscilloscope(QDialog, object):
             # Cal date is the cell above Model
             excel.write_cal_date()
 
-            test_names = set()
-
-            for row in test_rows:
-                settings = excel.get_volt_settings(row=row)
-                test_names.add(settings.function)
+            test_names = set(
+                excel.get_settings_array(DcvSettings, rows=test_rows).function
+            )
 
             # Get all the tests. If there are cursor tests, then automatically select
             # them if dcv selected as they cannot be done in isolation
@@ -200,7 +223,7 @@ class TestOscilloscope(QDialog, object):
 
                 if "DCV" in test_name:
                     if not self.test_dcv(
-                        filename=filename,
+                        excel=excel,
                         test_rows=testing_rows,
                         parallel_channels=parallel_channels,
                         skip_completed=skip_completed,
@@ -209,62 +232,57 @@ class TestOscilloscope(QDialog, object):
 
                 elif test_name == "POS":
                     if not self.test_position(
-                        filename=filename,
+                        excel=excel,
                         test_rows=testing_rows,
                         parallel_channels=parallel_channels,
                     ):
                         break
 
                 elif test_name == "BAL":
-                    if not self.test_dc_balance(
-                        filename=filename, test_rows=testing_rows
-                    ):
+                    if not self.test_dc_balance(excel=excel, test_rows=testing_rows):
                         break
 
                 elif test_name == "CURS":
-                    if not self.test_cursor(filename=filename, test_rows=testing_rows):
+                    if not self.test_cursor(excel=excel, test_rows=testing_rows):
                         break
 
                 elif test_name == "RISE":
-                    if not self.test_risetime(
-                        filename=filename, test_rows=testing_rows
-                    ):
+                    if not self.test_risetime(excel=excel, test_rows=testing_rows):
                         break
 
                 elif test_name == "TIME":
-                    if not self.test_timebase(filename=filename, row=testing_rows[0]):
+                    if not self.test_timebase(excel=excel, row=testing_rows[0]):
                         break
 
                 elif test_name == "TRIG":
                     if not self.test_trigger_sensitivity(
-                        filename=filename, test_rows=testing_rows
+                        excel=excel, test_rows=testing_rows
                     ):
                         break
 
                 elif test_name == "IMP":
-                    if not self.test_impedance(
-                        filename=filename, test_rows=testing_rows
-                    ):
+                    if not self.test_impedance(excel=excel, test_rows=testing_rows):
                         break
 
                 elif test_name == "NOISE":
                     if not self.test_random_noise(
-                        filename=filename,
+                        excel=excel,
                         test_rows=test_rows,
                         skip_completed=skip_completed,
                     ):
                         break
 
                 elif test_name == "DELTAT":
-                    if not self.test_delta_time(filename=filename, test_rows=test_rows):
+                    if not self.test_delta_time(excel=excel, test_rows=test_rows):
                         break
 
                 elif test_name == "THR":
-                    if not self.test_threshold(
-                        filename=filename, test_rows=testing_rows
-                    ):
+                    if not self.test_threshold(excel=excel, test_rows=testing_rows):
                         break
 
+                # Checkpoint at the end of each test, saved in the background
+                excel.flush()
+
         self.local_all()
 
     def update_test_progress(self) -> None:
@@ -301,13 +319,13 @@ class TestOscilloscope(QDialog, object):
             "3458": ks3458_conn,
         }
 
-    def test_dc_balance(self, filename: str, test_rows: List) -> bool:
+    def test_dc_balance(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_dc_balance
         Test the dc balance of each channel with no signal applied
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (int): _description_
         """
 
@@ -331,63 +349,68 @@ class TestOscilloscope(QDialog, object):
 
         self.uut.set_timebase(200e-6)
 
-        with ExcelInterface(filename=filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+
+        for row in test_rows:
+            if self.abort_test:
                 return False
 
-            for row in test_rows:
-                if self.abort_test:
-                    return False
+            excel.row = row
 
-                excel.row = row
+            settings = excel.get_volt_settings()
 
-                settings = excel.get_volt_settings()
+            if int(settings.channel) > self.uut.num_channels:
+                continue
+            units = excel.get_units()
 
-                if int(settings.channel) > self.uut.num_channels:
-                    continue
-                units = excel.get_units()
+            if settings.function == "BAL":
+                self.uut.set_channel(
+                    chan=int(settings.channel), enabled=True, only=True
+                )
+                self.uut.set_voltage_scale(
+                    chan=int(settings.channel), scale=settings.scale
+                )
+                self.uut.set_voltage_offset(chan=int(settings.channel), offset=0)
+                self.uut.set_channel_coupling(
+                    chan=int(settings.channel), coupling=settings.coupling
+                )
 
-                if settings.function == "BAL":
-                    self.uut.set_channel(
-                        chan=int(settings.channel), enabled=True, only=True
-                    )
-                    self.uut.set_voltage_scale(
-                        chan=int(settings.channel), scale=settings.scale
+                if self.host_statistics:
+                    stats = self.uut.measure_waveform_stats(
+                        chans=[int(settings.channel)], delay=2
                     )
-                    self.uut.set_voltage_offset(chan=int(settings.channel), offset=0)
-                    self.uut.set_channel_coupling(
-                        chan=int(settings.channel), coupling=settings.coupling
-                    )
-
+                    reading = stats[int(settings.channel)].mean
+                else:
                     reading = self.uut.measure_voltage(
                         chan=int(settings.channel), delay=2
                     )
 
-                    if units == "mV":
-                        reading *= 1000
+                if units == "mV":
+                    reading *= 1000
 
-                    excel.write_result(reading, col=results_col)
-                    self.update_test_progress()
+                excel.write_result(reading, col=results_col)
+                self.update_test_progress()
 
         self.uut.reset()
 
         return True
 
-    def test_delta_time(self, filename: str, test_rows: List) -> bool:
+    def test_delta_time(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_delta_time
         Test delta time function
         for Tek scope
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
 
         Returns:
@@ -420,33 +443,66 @@ class TestOscilloscope(QDialog, object):
 
         self.ks33250.set_output_z("50")
 
-        with ExcelInterface(filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+        excel.find_units_col(test_rows[0])
+
+        for row in test_rows:
+            if self.abort_test:
+                return False
+
+            excel.row = row
+
+            units = excel.get_units()
+
+            settings = excel.get_sample_rate_settings()
+
+            if settings.channel != last_channel:
+                response = QMessageBox.information(
                     self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
+                    "Connections",
+                    f"Connect Sig Gen to Channel {settings.channel}",
+                    buttons=QMessageBox.StandardButton.Ok
+                    | QMessageBox.StandardButton.Cancel,
                 )
-                return False
-            excel.find_units_col(test_rows[0])
 
-            for row in test_rows:
-                if self.abort_test:
+                if response == QMessageBox.StandardButton.Cancel:
                     return False
 
-                excel.row = row
+                last_generator = "MXG"
 
-                units = excel.get_units()
+                last_channel = settings.channel
+
+            self.uut.set_channel(chan=settings.channel, enabled=True, only=True)
+            self.uut.set_voltage_scale(chan=settings.channel, scale=settings.scale)
+            self.uut.set_channel_coupling(
+                chan=settings.channel, coupling=settings.coupling
+            )
+            self.uut.set_channel_impedance(chan=settings.channel, impedance="50")
+            self.uut.set_trigger_level(chan=settings.channel, level=0)
 
-                settings = excel.get_sample_rate_settings()
+            self.uut.write(f"HORIZONTAL:MODE:SAMPLERATE {settings.sample_rate}")
 
-                if settings.channel != last_channel:
+            # Have to adjust the record length to get the right timebase setting
+
+            self.uut.write("HOR:MODE MANUAL")
+            recordlength = 10 * settings.sample_rate * settings.timebase
+            self.uut.write(f"HOR:MODE:RECORDLENGTH {recordlength}")
+            self.uut.invalidate_settings("timebase", "timebase_pos")
+
+            if settings.frequency > 250000:
+                if last_generator != "MXG":
                     response = QMessageBox.information(
                         self,
                         "Connections",
-                        f"Connect Sig Gen to Channel {settings.channel}",
+                        f"Connect Sig Gen output to channel {settings.channel}",
                         buttons=QMessageBox.StandardButton.Ok
                         | QMessageBox.StandardButton.Cancel,
                     )
@@ -454,108 +510,75 @@ class TestOscilloscope(QDialog, object):
                     if response == QMessageBox.StandardButton.Cancel:
                         return False
 
-                    last_generator = "MXG"
-
-                    last_channel = settings.channel
-
-                self.uut.set_channel(chan=settings.channel, enabled=True, only=True)
-                self.uut.set_voltage_scale(chan=settings.channel, scale=settings.scale)
-                self.uut.set_channel_coupling(
-                    chan=settings.channel, coupling=settings.coupling
-                )
-                self.uut.set_channel_impedance(chan=settings.channel, impedance="50")
-                self.uut.set_trigger_level(chan=settings.channel, level=0)
-
-                self.uut.write(f"HORIZONTAL:MODE:SAMPLERATE {settings.sample_rate}")
-
-                # Have to adjust the record length to get the right timebase setting
-
-                self.uut.write("HOR:MODE MANUAL")
-                recordlength = 10 * settings.sample_rate * settings.timebase
-                self.uut.write(f"HOR:MODE:RECORDLENGTH {recordlength}")
-
-                if settings.frequency > 250000:
-                    if last_generator != "MXG":
-                        response = QMessageBox.information(
-                            self,
-                            "Connections",
-                            f"Connect Sig Gen output to channel {settings.channel}",
-                            buttons=QMessageBox.StandardButton.Ok
-                            | QMessageBox.StandardButton.Cancel,
-                        )
+                self.mxg.set_frequency(settings.frequency)
+                self.mxg.set_level(settings.voltage / 2.82, units="V")
+                self.mxg.set_output_state(True)
 
-                        if response == QMessageBox.StandardButton.Cancel:
-                            return False
+                last_generator = "MXG"
+            else:
+                if last_generator != "33250A":
+                    response = QMessageBox.information(
+                        self,
+                        "Connections",
+                        f"Connect 33250A output to channel {settings.channel}",
+                        buttons=QMessageBox.StandardButton.Ok
+                        | QMessageBox.StandardButton.Cancel,
+                    )
 
-                    self.mxg.set_frequency(settings.frequency)
-                    self.mxg.set_level(settings.voltage / 2.82, units="V")
-                    self.mxg.set_output_state(True)
+                    if response == QMessageBox.StandardButton.Cancel:
+                        return False
 
-                    last_generator = "MXG"
-                else:
-                    if last_generator != "33250A":
-                        response = QMessageBox.information(
-                            self,
-                            "Connections",
-                            f"Connect 33250A output to channel {settings.channel}",
-                            buttons=QMessageBox.StandardButton.Ok
-                            | QMessageBox.StandardButton.Cancel,
-                        )
+                    last_generator = "33250A"
+                self.ks33250.set_sin(
+                    frequency=settings.frequency, amplitude=settings.voltage / 2.82
+                )
+                self.ks33250.enable_output(True)
 
-                        if response == QMessageBox.StandardButton.Cancel:
-                            return False
+            time.sleep(0.25)
 
-                        last_generator = "33250A"
-                    self.ks33250.set_sin(
-                        frequency=settings.frequency, amplitude=settings.voltage / 2.82
-                    )
-                    self.ks33250.enable_output(True)
+            self.uut.write("MEASU:MEAS1:TYPE DELAY")
+            self.uut.write(f"MEASU:MEAS1:SOURCE CH{settings.channel}")
+            self.uut.write(f"MEASU:MEAS1:SOURCE2 CH{settings.channel}")
+            self.uut.write("MEASU:MEAS1:DELAY:EDGE1 RISE")
+            self.uut.write("MEASU:MEAS1:DELAY:EDGE2 FALL")
 
-                time.sleep(0.25)
+            self.uut.write("MEASURE:STATISTICS:MODE MEANSTDDEV")
+            self.uut.write("MEASURE:STATISTICS:WEIGHTING 1000")
+            self.uut.write("MEASUREMENT:STATISTICS:COUNT RESET")
 
-                self.uut.write("MEASU:MEAS1:TYPE DELAY")
-                self.uut.write(f"MEASU:MEAS1:SOURCE CH{settings.channel}")
-                self.uut.write(f"MEASU:MEAS1:SOURCE2 CH{settings.channel}")
-                self.uut.write("MEASU:MEAS1:DELAY:EDGE1 RISE")
-                self.uut.write("MEASU:MEAS1:DELAY:EDGE2 FALL")
+            self.uut.write("MEASU:MEAS1:STATE ON")
 
-                self.uut.write("MEASURE:STATISTICS:MODE MEANSTDDEV")
-                self.uut.write("MEASURE:STATISTICS:WEIGHTING 1000")
-                self.uut.write("MEASUREMENT:STATISTICS:COUNT RESET")
+            self.uut.write("MEASU:MEAS1:DISPLAYSTAT:ENABLE ON")
 
-                self.uut.write("MEASU:MEAS1:STATE ON")
+            time.sleep(10)
 
-                self.uut.write("MEASU:MEAS1:DISPLAYSTAT:ENABLE ON")
+            try:
+                result = float(
+                    self.uut.query("MEASU:MEAS1:STDDEV?").strip()
+                )  # remove LF
 
-                time.sleep(10)
+                if units[0] == "p":
+                    result *= 1_000_000_000_000
+                elif units[0] == "n":
+                    result *= 1_000_000_000
+                elif units[0] == "u":
+                    result *= 1_000_000
 
-                try:
-                    result = float(
-                        self.uut.query("MEASU:MEAS1:STDDEV?").strip()
-                    )  # remove LF
-
-                    if units[0] == "p":
-                        result *= 1_000_000_000_000
-                    elif units[0] == "n":
-                        result *= 1_000_000_000
-                    elif units[0] == "u":
-                        result *= 1_000_000
-
-                    excel.write_result(result=result, col=results_col, save=True)
-                except ValueError:
-                    pass
+                excel.write_result(result=result, col=results_col, save=True)
+            except ValueError:
+                pass
 
-                self.update_test_progress()
+            self.update_test_progress()
 
-                self.mxg.set_output_state(False)
-                self.ks33250.enable_output(False)
+            self.mxg.set_output_state(False)
+            self.ks33250.enable_output(False)
 
-            excel.save_sheet()
+        excel.save_sheet()
 
         return True
 
     def test_random_noise(
-        self, filename: str, test_rows: List, skip_completed: bool = False
+        self, excel: ExcelInterface, test_rows: List, skip_completed: bool = False
     ) -> bool:
         """
         test_random_noise
@@ -563,7 +586,7 @@ class TestOscilloscope(QDialog, object):
         Tek scopes
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
 
         Returns:
@@ -581,108 +604,132 @@ class TestOscilloscope(QDialog, object):
 
         self.uut.set_acquisition(16)
 
-        with ExcelInterface(filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
-                return False
-
-            excel.find_units_col(test_rows[0])
-
-            response = QMessageBox.information(
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
                 self,
-                "Connections",
-                "Remove inputs from all channels",
-                buttons=QMessageBox.StandardButton.Ok
-                | QMessageBox.StandardButton.Cancel,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
             )
+            return False
 
-            if response == QMessageBox.StandardButton.Cancel:
-                return False
+        excel.find_units_col(test_rows[0])
+
+        response = QMessageBox.information(
+            self,
+            "Connections",
+            "Remove inputs from all channels",
+            buttons=QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel,
+        )
 
-            row_count = 0
+        if response == QMessageBox.StandardButton.Cancel:
+            return False
 
-            self.uut.set_horizontal_mode("MAN", 2000000)  # type: ignore
+        row_count = 0
 
-            for row in test_rows:
-                if self.abort_test:
-                    return False
+        self.uut.set_horizontal_mode("MAN", 2000000)  # type: ignore
 
-                excel.row = row
+        for row in test_rows:
+            if self.abort_test:
+                return False
 
-                if skip_completed:
-                    if not excel.check_empty_result(col=results_col):
-                        continue
+            excel.row = row
 
-                units = excel.get_units()
+            if skip_completed:
+                if not excel.check_empty_result(col=results_col):
+                    continue
 
-                settings = excel.get_volt_settings()
+            units = excel.get_units()
 
-                # if settings.bandwidth == "250M":
-                #    continue
+            settings = excel.get_volt_settings()
 
-                channel = int(settings.channel)
+            # if settings.bandwidth == "250M":
+            #    continue
 
-                self.uut.set_channel(chan=channel, enabled=True, only=True)  # type: ignore
-                self.uut.set_channel_impedance(
-                    chan=channel,
-                    impedance=settings.impedance,  # type: ignore
-                )
-                self.uut.set_channel_bw_limit(chan=channel, bw_limit=settings.bandwidth)  # type: ignore
-
-                if settings.acq_mode:
-                    if settings.acq_mode.upper() == "HIRES":
-                        self.uut.set_acquisition_mode(Tek_Acq_Mode.HIRES)  # type: ignore
-                    elif settings.acq_mode.upper() == "SAMPLE":
-                        self.uut.set_acquisition(Tek_Acq_Mode.SAMPLE)  # type: ignore
-                    else:
-                        self.uut.set_acquisition_mode(Tek_Acq_Mode.AVERAGE)  # type: ignore
+            channel = int(settings.channel)
+
+            self.uut.set_channel(chan=channel, enabled=True, only=True)  # type: ignore
+            self.uut.set_channel_impedance(
+                chan=channel,
+                impedance=settings.impedance,  # type: ignore
+            )
+            self.uut.set_channel_bw_limit(chan=channel, bw_limit=settings.bandwidth)  # type: ignore
+
+            if settings.acq_mode:
+                if settings.acq_mode.upper() == "HIRES":
+                    self.uut.set_acquisition_mode(Tek_Acq_Mode.HIRES)  # type: ignore
+                elif settings.acq_mode.upper() == "SAMPLE":
+                    self.uut.set_acquisition(Tek_Acq_Mode.SAMPLE)  # type: ignore
                 else:
                     self.uut.set_acquisition_mode(Tek_Acq_Mode.AVERAGE)  # type: ignore
+            else:
+                self.uut.set_acquisition_mode(Tek_Acq_Mode.AVERAGE)  # type: ignore
 
-                self.uut.set_voltage_position(
-                    chan=channel, position=settings.scale * 0.34
-                )  # 340 mdiv
+            self.uut.set_voltage_position(
+                chan=channel, position=settings.scale * 0.34
+            )  # 340 mdiv
 
-                rnd = self.uut.measure_rms_noise(chan=settings.channel, delay=10)  # type: ignore
+            rnd = self.random_noise(channel)
 
-                self.uut.measure_clear()
-                self.uut.set_voltage_position(
-                    chan=channel, position=settings.scale * 0.36
-                )  # 360 mdiv
+            self.uut.measure_clear()
+            self.uut.set_voltage_position(
+                chan=channel, position=settings.scale * 0.36
+            )  # 360 mdiv
 
-                avg = self.uut.measure_rms_noise(chan=settings.channel, delay=10)  # type: ignore
+            avg = self.random_noise(channel)
 
-                result = (rnd + avg) / 2
+            result = (rnd + avg) / 2
 
-                if units.startswith("m"):
-                    result *= 1000
+            if units.startswith("m"):
+                result *= 1000
 
-                excel.write_result(result=result, col=results_col, save=True)
+            excel.write_result(result=result, col=results_col, save=True)
 
-                self.update_test_progress()
+            self.update_test_progress()
 
-                row_count += 1
-                print(row)
-                # if row_count > 5:
-                #    break
+            row_count += 1
+            # if row_count > 5:
+            #    break
 
-            excel.save_sheet()
+        excel.save_sheet()
 
         return True
 
-    def test_threshold(self, filename: str, test_rows: List) -> bool:
+    def random_noise(self, chan: int) -> float:
+        """
+        random_noise
+        RMS noise of the channel, at the current position
+
+        Args:
+            chan (int): _description_
+
+        Returns:
+            float: _description_
+        """
+
+        if not (self.host_noise and hasattr(self.uut, "measure_rms_noise_host")):
+            return self.uut.measure_rms_noise(chan=chan, delay=10)  # type: ignore
+
+        estimate = self.uut.measure_rms_noise_host(  # type: ignore
+            chan=chan, precision=self.noise_precision
+        )
+
+        if not estimate.converged:
+            print(
+                f"Chan {chan} noise not within {self.noise_precision:.0%} "
+                f"after {estimate.count} points"
+            )
+
+        return estimate.rms
+
+    def test_threshold(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_threshold
         Test digital threshold
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
 
         Returns:
@@ -718,53 +765,52 @@ class TestOscilloscope(QDialog, object):
         if response == QMessageBox.StandardButton.Cancel:
             return False
 
-        with ExcelInterface(filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+        excel.find_units_col(test_rows[0])
+        for row in test_rows:
+            if self.abort_test:
                 return False
-            excel.find_units_col(test_rows[0])
-            for row in test_rows:
-                if self.abort_test:
-                    return False
 
-                excel.row = row
+            excel.row = row
 
-                settings = excel.get_threshold_settings()
+            settings = excel.get_threshold_settings()
 
-                # Tests are performed in blocks of 8 channels
+            # Tests are performed in blocks of 8 channels
 
-                # Get the starting threshold, and direction
+            # Get the starting threshold, and direction
 
-                voltage = settings.voltage
-                delta = -0.01 if settings.polarity == "NEG" else 0.01
+            voltage = settings.voltage
+            delta = -0.01 if settings.polarity == "NEG" else 0.01
 
-                for _ in range(50):
-                    reading = self.uut.measure_digital_channels(pod=settings.pod)  # type: ignore
-                    if (
-                        settings.polarity == "POS"
-                        and reading == 1
-                        or settings.polarity != "POS"
-                        and reading == 0
-                    ):
-                        excel.write_result(voltage)
-                        break
-                    voltage += delta
+            for _ in range(50):
+                reading = self.uut.measure_digital_channels(pod=settings.pod)  # type: ignore
+                if (
+                    settings.polarity == "POS"
+                    and reading == 1
+                    or settings.polarity != "POS"
+                    and reading == 0
+                ):
+                    excel.write_result(voltage)
+                    break
+                voltage += delta
 
         return True
 
-    def test_impedance(self, filename: str, test_rows: List) -> bool:
+    def test_impedance(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_impedance
         Test the input impedance of the channels
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
 
         Returns:
@@ -793,111 +839,554 @@ class TestOscilloscope(QDialog, object):
 
         self.uut.set_acquisition(1)
 
-        with ExcelInterface(filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+        excel.find_units_col(test_rows[0])
+        for row in test_rows:
+            if self.abort_test:
                 return False
-            excel.find_units_col(test_rows[0])
-            for row in test_rows:
-                if self.abort_test:
-                    return False
 
-                excel.row = row
+            excel.row = row
 
-                settings = excel.get_volt_settings()
+            settings = excel.get_volt_settings()
 
-                channel = int(settings.channel)
-                units = excel.get_units()
+            channel = int(settings.channel)
+            units = excel.get_units()
 
-                if channel > self.uut.num_channels:
-                    continue
+            if channel > self.uut.num_channels:
+                continue
 
-                if channel != last_channel:
-                    response = QMessageBox.information(
-                        self,
-                        "Connections",
-                        f"Connect 3458A Input to Ch {channel}, and sense",
-                        buttons=QMessageBox.StandardButton.Ok
-                        | QMessageBox.StandardButton.Cancel,
-                    )
+            if channel != last_channel:
+                response = QMessageBox.information(
+                    self,
+                    "Connections",
+                    f"Connect 3458A Input to Ch {channel}, and sense",
+                    buttons=QMessageBox.StandardButton.Ok
+                    | QMessageBox.StandardButton.Cancel,
+                )
 
-                    if response == QMessageBox.StandardButton.Cancel:
-                        return False
+                if response == QMessageBox.StandardButton.Cancel:
+                    return False
 
-                    if last_channel > 0:
-                        # changed channel to another, but not channel 1.
-                        # Reset all of the settings on the channel just measured
-                        self.uut.set_voltage_scale(chan=last_channel, scale=1)
-                        self.uut.set_voltage_offset(chan=last_channel, offset=0)
-                        self.uut.set_channel(chan=last_channel, enabled=False)
-                        self.uut.set_channel_bw_limit(chan=last_channel, bw_limit=False)
-                        self.uut.set_channel(chan=channel, enabled=True)
-                        self.uut.set_channel_impedance(
-                            chan=last_channel, impedance="1M"
-                        )  # always
-                    last_channel = channel
+                if last_channel > 0:
+                    # changed channel to another, but not channel 1.
+                    # Reset all of the settings on the channel just measured
+                    self.uut.set_voltage_scale(chan=last_channel, scale=1)
+                    self.uut.set_voltage_offset(chan=last_channel, offset=0)
+                    self.uut.set_channel(chan=last_channel, enabled=False)
+                    self.uut.set_channel_bw_limit(chan=last_channel, bw_limit=False)
+                    self.uut.set_channel(chan=channel, enabled=True)
+                    self.uut.set_channel_impedance(
+                        chan=last_channel, impedance="1M"
+                    )  # always
+                last_channel = channel
 
-                self.uut.set_voltage_scale(chan=channel, scale=settings.scale)
-                self.uut.set_voltage_offset(chan=channel, offset=settings.offset)
-                self.uut.set_channel_impedance(
-                    chan=channel, impedance=settings.impedance
-                )
-                self.uut.set_channel_bw_limit(chan=channel, bw_limit=settings.bandwidth)
+            self.uut.set_voltage_scale(chan=channel, scale=settings.scale)
+            self.uut.set_voltage_offset(chan=channel, offset=settings.offset)
+            self.uut.set_channel_impedance(chan=channel, impedance=settings.impedance)
+            self.uut.set_channel_bw_limit(chan=channel, bw_limit=settings.bandwidth)
 
-                time.sleep(1)
+            time.sleep(1)
 
-                reading = self.ks3458.measure(
-                    function=Ks3458A_Function.R4W, number_readings=5
-                )[
-                    "Average"
-                ]  # type: ignore
-                if units.lower().startswith("k"):
-                    reading /= 1000
-                if units.upper().startswith("M"):
-                    reading /= 1_000_000
+            reading = self.ks3458.measure(
+                function=Ks3458A_Function.R4W, number_readings=5
+            )[
+                "Average"
+            ]  # type: ignore
+            if units.lower().startswith("k"):
+                reading /= 1000
+            if units.upper().startswith("M"):
+                reading /= 1_000_000
 
-                excel.write_result(reading, col=results_col)
+            excel.write_result(reading, col=results_col)
 
-                self.update_test_progress()
+            self.update_test_progress()
 
-            # Turn off all channels but 1
-            for chan in range(self.uut.num_channels):
-                self.uut.set_channel(chan=chan + 1, enabled=chan == 0)
-                self.uut.set_channel_bw_limit(chan=chan, bw_limit=False)
+        # Turn off all channels but 1
+        for chan in range(self.uut.num_channels):
+            self.uut.set_channel(chan=chan + 1, enabled=chan == 0)
+            self.uut.set_channel_bw_limit(chan=chan, bw_limit=False)
 
-            self.uut.reset()
-            self.uut.close()
+        self.uut.reset()
+        self.uut.close()
 
         return True
 
-    def test_dcv(
-        self,
-        filename: str,
-        test_rows: List,
-        parallel_channels: bool = False,
-        skip_completed: bool = False,
-    ) -> bool:
-        # sourcery skip: extract-method, low-code-quality
+    def settled_voltage(self, chan: int, acquisitions: int, sensitive: bool) -> float:
         """
-        test_dcv
-        Perform the basic DC V tests
-        Set the self.calibrator to the voltage, allow the scope to stabilize,
-        then read the cursors or measurement values
+        settled_voltage
+        Wait for the scope to settle after the calibrator output changes,
+        then measure the voltage
+
+        Args:
+            chan (int): _description_
+            acquisitions (int): number of averages
+            sensitive (bool): scale low enough to need more averaging
+
+        Returns:
+            float: _description_
         """
 
-        self.current_test.emit("Testing: DC Voltage")
+        return self.settled_voltages(
+            chans=[chan], acquisitions=acquisitions, sensitive=sensitive
+        )[chan]
 
-        last_channel = -1
+    def settled_voltages(
+        self, chans: List[int], acquisitions: int, sensitive: bool
+    ) -> Dict[int, float]:
+        """
+        settled_voltages
+        As settled_voltage, measuring several channels in the same settling
+        period
 
-        connections = self.test_connections(
-            check_3458=False
-        )  # Don't need 3458 for this test
+        Args:
+            chans (List[int]): _description_
+            acquisitions (int): number of averages
+            sensitive (bool): scale low enough to need more averaging
+
+        Returns:
+            Dict[int, float]: channel -> voltage
+        """
+
+        if sensitive:
+            self.uut.set_acquisition(64)
+
+        self.uut.measure_clear()
+
+        if self.adaptive_measurement:
+            # Sensitive scales average 64, so the first reading waits for those
+            results = self.uut.measure_voltages_adaptive(
+                chans=chans, averages=64 if sensitive else acquisitions
+            )
+            for chan, result in results.items():
+                if not result.converged:
+                    print(
+                        f"Chan {chan} not stable, std {result.std} "
+                        f"over {result.count} readings"
+                    )
+            return {chan: result.value for chan, result in results.items()}
+
+        # with a 200 us timebase, and 64 samples, the average is complete in 12 ms
+        settle_period = 0.2 if acquisitions < 64 else 1
+
+        if not self.simulating:
+            time.sleep(settle_period)
+            if sensitive:
+                time.sleep(1)  # little longer to average for sensitive scales
+
+        if len(chans) == 1:
+            return {chans[0]: self.uut.measure_voltage(chan=chans[0], delay=1)}
+
+        return self.uut.measure_voltage_multi(chans=chans, delay=1)
+
+    def dcv_row(
+        self, settings: Any, acquisitions: int, sensitive: bool
+    ) -> Tuple[float, float]:
+        """
+        dcv_row
+        Measure one DCV row, from setting the scope to calibrator standby.
+        The calibrator settles while the scope is set, each measurement
+        waits for both
+
+        Args:
+            settings (Any): row settings
+            acquisitions (int): number of averages
+            sensitive (bool): scale low enough to need more averaging
+
+        Returns:
+            Tuple[float, float]: reading at 0V (or +V for balance), reading
+        """
+
+        uut = self.uut
+        calibrator = self.calibrator
+        channel = int(settings.channel)
+        balance = settings.function == "DCV-BAL"
+        cursors = uut.keysight and uut.family != DSOX_FAMILY.DSO5000  # type: ignore
+
+        def configure() -> None:
+            # One message for the row settings
+            with uut.batch():
+                uut.set_channel(chan=channel, enabled=True)
+                uut.set_voltage_scale(chan=channel, scale=settings.scale)
+                uut.set_voltage_offset(chan=channel, offset=settings.offset)
+
+                if settings.impedance:
+                    uut.set_channel_impedance(
+                        chan=channel, impedance=settings.impedance
+                    )
+
+                if settings.bandwidth:
+                    uut.set_channel_bw_limit(chan=channel, bw_limit=settings.bandwidth)
+                else:
+                    uut.set_channel_bw_limit(chan=channel, bw_limit=False)
+
+                if settings.invert:
+                    # already casted to a bool
+                    uut.set_channel_invert(chan=channel, inverted=settings.invert)
+                else:
+                    uut.set_channel_invert(chan=channel, inverted=False)
+
+            # Turn off averaging to speed up change in reading
+            uut.set_acquisition(1)
+
+        def measure(cursor: bool) -> Tuple[float, float]:
+            if not self.simulating:
+                time.sleep(0.1)
+
+            uut.set_acquisition(acquisitions)
+
+            reading = self.settled_voltage(
+                chan=channel, acquisitions=acquisitions, sensitive=sensitive
+            )
+
+            # Tek MSO4 error is 9e37, MSO5 and MSO6 error is 9E40
+
+            if (
+                settings.scale == 0.001
+                and abs(settings.offset) > 0
+                and abs(reading) > 9e30
+            ):
+                # reading was off scale, so go to 2mV and try again
+                uut.set_voltage_scale(chan=channel, scale=0.002)
+                reading = uut.measure_voltage(chan=channel, delay=1)
+
+            return reading, uut.read_cursor_avg() if cursor else 0.0
+
+        def reverse() -> None:
+            # still set up for the + voltage
+            uut.set_voltage_offset(chan=channel, offset=-settings.offset)
+            uut.set_acquisition(1)
+
+        graph = RowGraph(self.executor)
+        graph.add("configured", uut, configure)
+
+        first = ()
+        if uut.keysight or balance:
+            if balance:
+                # Non keysight, apply the half the voltage
+                # and the offset then do the reverse
+                graph.add(
+                    "voltage1",
+                    calibrator,
+                    calibrator.set_voltage_dc,
+                    settings.voltage,
+                    block=False,
+                )
+
+            # 0V test
+            graph.add("settled1", calibrator, calibrator.operate)
+            graph.add(
+                "reading1",
+                uut,
+                measure,
+                uut.keysight,
+                after=("configured", "settled1"),
+            )
+            first = ("reading1",)
+
+        voltage = -settings.voltage if balance else settings.voltage
+        graph.add(
+            "voltage2",
+            calibrator,
+            calibrator.set_voltage_dc,
+            voltage,
+            block=False,
+            after=first,
+        )
+        graph.add("settled2", calibrator, calibrator.operate)
+
+        if balance:
+            graph.add("reversed", uut, reverse, after=first)
+        else:
+            graph.add("reversed", uut, uut.set_acquisition, 1, after=first)
+
+        graph.add(
+            "reading2",
+            uut,
+            measure,
+            cursors,
+            after=("configured", "reversed", "settled2"),
+        )
+        graph.add("standby", calibrator, calibrator.standby, after=("reading2",))
+
+        graph.wait()
+
+        reading1, voltage1 = graph.result("reading1") if first else (0.0, 0.0)
+        reading, voltage2 = graph.result("reading2")
+
+        if cursors:
+            self.cursor_results.append(
+                {
+                    "chan": channel,
+                    "scale": float(settings.scale),
+                    "result": voltage2 - voltage1,
+                }
+            )
+
+        return reading1, reading
+
+    def dcv_parallel_groups(
+        self, test_settings: Any, skip_rows: Set[int]
+    ) -> List[List[Any]]:
+        """
+        dcv_parallel_groups
+        Group the DCV rows that have the same settings on different channels,
+        so they can be measured from one calibrator setting
+
+        Args:
+            test_settings (Any): settings array
+            skip_rows (Set[int]): rows not to measure
+
+        Returns:
+            List[List[Any]]: groups of settings, in sheet order
+        """
+
+        groups: Dict[tuple, List[Any]] = {}
+        ordered: List[List[Any]] = []
+
+        for settings in test_settings:
+            if int(settings.row) in skip_rows:
+                continue
+
+            # NaN (blank) never equals itself, so can't be part of a key
+            key = tuple(
+                None if isinstance(value, float) and math.isnan(value) else value
+                for value in (
+                    settings.function,
+                    settings.voltage,
+                    settings.scale,
+                    settings.offset,
+                    settings.impedance,
+                    settings.bandwidth,
+                    settings.invert,
+                )
+            )
+
+            group = groups.get(key)
+            if (
+                group is None
+                or len(group) >= self.uut.measurement_slots
+                or any(int(s.channel) == int(settings.channel) for s in group)
+            ):
+                # New setting, or the channel has already got this one
+                group = []
+                groups[key] = group
+                ordered.append(group)
+
+            group.append(settings)
+
+        return ordered
+
+    def test_dcv_parallel(
+        self,
+        excel: ExcelInterface,
+        test_settings: Any,
+        acquisitions: int,
+        max_filter_range: float,
+        skip_completed: bool,
+    ) -> Set[int] | None:
+        """
+        test_dcv_parallel
+        With the calibrator connected to all channels, measure every channel
+        with the same settings from one calibrator setting.
+        Rows for the filter are left for the one channel at a time sequence
+
+        Args:
+            excel (ExcelInterface): results workbook session for the run
+            test_settings (Any): settings array
+            acquisitions (int): number of averages
+            max_filter_range (float): scales at or below use the filter
+            skip_completed (bool): _description_
+
+        Returns:
+            Set[int] | None: rows measured, None if aborted
+        """
+
+        skip_rows: Set[int] = set()
+
+        for settings in test_settings:
+            row = int(settings.row)
+
+            if int(settings.channel) > self.uut.num_channels or (
+                self.use_filter and settings.scale <= max_filter_range
+            ):
+                skip_rows.add(row)
+                continue
+
+            if skip_completed:
+                excel.row = row
+                if not excel.check_empty_result(excel.find_results_col(row=row)):
+                    skip_rows.add(row)
+
+        measured: Set[int] = set()
+        cursors = self.uut.keysight and self.uut.family != DSOX_FAMILY.DSO5000  # type: ignore
+
+        for group in self.dcv_parallel_groups(test_settings, skip_rows):
+            if self.abort_test:
+                return None
+
+            settings = group[0]
+            chans = [int(s.channel) for s in group]
+
+            self.calibrator.set_voltage_dc(0, block=False)
+
+            # One message for all the channel settings
+            with self.uut.batch():
+                for chan in range(1, self.uut.num_channels + 1):
+                    self.uut.set_channel(chan=chan, enabled=chan in chans)
+
+                for chan in chans:
+                    self.uut.set_voltage_scale(chan=chan, scale=settings.scale)
+                    self.uut.set_voltage_offset(chan=chan, offset=settings.offset)
+
+                    if settings.impedance:
+                        self.uut.set_channel_impedance(
+                            chan=chan, impedance=settings.impedance
+                        )
+
+                    self.uut.set_channel_bw_limit(
+                        chan=chan, bw_limit=settings.bandwidth or False
+                    )
+                    self.uut.set_channel_invert(
+                        chan=chan, inverted=bool(settings.invert)
+                    )
+
+            sensitive = settings.scale <= max_filter_range
+            readings1 = {chan: 0.0 for chan in chans}
+            voltages1: Dict[int, float] = {}
+
+            if self.uut.keysight or settings.function == "DCV-BAL":
+                if settings.function == "DCV-BAL":
+                    self.calibrator.set_voltage_dc(settings.voltage, block=False)
+
+                # 0V test
+                # Turn off averaging to speed up change in reading
+
+                self.uut.set_acquisition(1)
+                self.calibrator.operate()
+
+                if not self.simulating:
+                    time.sleep(0.1)
+
+                self.uut.set_acquisition(acquisitions)
+
+                readings1 = self.settled_voltages(chans, acquisitions, sensitive)
+
+                if cursors:
+                    for chan in chans:
+                        self.uut.set_cursor_xy_source(chan=chan, cursor=1)
+                        voltages1[chan] = self.uut.read_cursor_avg()
+
+            if settings.function == "DCV-BAL":
+                # still set up for the + voltage
+                # The scope is set while the calibrator settles, operate waits
+
+                self.calibrator.set_voltage_dc(-settings.voltage, block=False)
+                with self.uut.batch():
+                    for chan in chans:
+                        self.uut.set_voltage_offset(chan=chan, offset=-settings.offset)
+            else:
+                self.calibrator.set_voltage_dc(settings.voltage, block=False)
+
+            self.uut.set_acquisition(1)
+            self.calibrator.operate()
+
+            if not self.simulating:
+                time.sleep(0.1)
+
+            self.uut.set_acquisition(acquisitions)
+
+            readings = self.settled_voltages(chans, acquisitions, sensitive)
+
+            for chan in chans:
+                # Tek MSO4 error is 9e37, MSO5 and MSO6 error is 9E40
+                if (
+                    settings.scale == 0.001
+                    and abs(settings.offset) > 0
+                    and abs(readings[chan]) > 9e30
+                ):
+                    # reading was off scale, so go to 2mV and try again
+                    self.uut.set_voltage_scale(chan=chan, scale=0.002)
+                    readings[chan] = self.uut.measure_voltage(chan=chan, delay=1)
+
+            if cursors:
+                for chan in chans:
+                    self.uut.set_cursor_xy_source(chan=chan, cursor=1)
+                    self.cursor_results.append(
+                        {
+                            "chan": chan,
+                            "scale": float(settings.scale),
+                            "result": self.uut.read_cursor_avg()
+                            - voltages1.get(chan, 0),
+                        }
+                    )
+
+            self.calibrator.standby()
+
+            for row_settings in group:
+                row = int(row_settings.row)
+                chan = int(row_settings.channel)
+
+                excel.row = row
+                results_col = excel.find_results_col(row=row)
+                if results_col == 0:
+                    QMessageBox.critical(
+                        self,
+                        "Error",
+                        f"Unable to find results col from row {row}.\n"
+                        "Ensure col headed with results or measured",
+                    )
+                    return None
+
+                excel.find_units_col(row)
+                units = excel.get_units()
+
+                reading = readings[chan]
+                reading1 = readings1[chan]
+
+                if units and units.startswith("m"):
+                    reading *= 1000
+                    reading1 *= 1000
+
+                if settings.function == "DCV-BAL":
+                    excel.write_result(reading1 - reading, col=results_col)
+                else:
+                    excel.write_result(reading - reading1, col=results_col)
+
+                measured.add(row)
+                self.update_test_progress()
+
+        return measured
+
+    def test_dcv(
+        self,
+        excel: ExcelInterface,
+        test_rows: List,
+        parallel_channels: bool = False,
+        skip_completed: bool = False,
+    ) -> bool:
+        # sourcery skip: extract-method, low-code-quality
+        """
+        test_dcv
+        Perform the basic DC V tests
+        Set the self.calibrator to the voltage, allow the scope to stabilize,
+        then read the cursors or measurement values
+        """
+
+        self.current_test.emit("Testing: DC Voltage")
+
+        last_channel = -1
+
+        connections = self.test_connections(
+            check_3458=False
+        )  # Don't need 3458 for this test
 
         acquisitions = (
             64
@@ -938,257 +1427,170 @@ class TestOscilloscope(QDialog, object):
 
         max_filter_range = 0.01  # 10 mVDiv
 
-        with ExcelInterface(filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
-                return False
-            excel.find_units_col(test_rows[0])
-
-            max_runs = 2 if self.use_filter else 1
-
-            # If using filter we have to run through the sequencer twice
-            # First time does the high levels maybe in parallel, second run low levels not in parallel
-
-            # See if the test name has changed between rows, as the results column may be different
-            last_test_name = ""
-
-            for run_count in range(max_runs):
-                for row in test_rows:
-                    if self.abort_test:
-                        return False
-
-                    excel.row = row
-
-                    settings = excel.get_volt_settings()
-
-                    if settings.function != last_test_name:
-                        # Changed test name, update the results column
-                        last_test_name = settings.function
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+        excel.find_units_col(test_rows[0])
 
-                        results_col = excel.find_results_col(row=row)
-                        if results_col == 0:
-                            QMessageBox.critical(
-                                self,
-                                "Error",
-                                f"Unable to find results col from row {row}.\n"
-                                "Ensure col headed with results or measured",
-                            )
-                            return False
+        max_runs = 2 if self.use_filter else 1
 
-                        excel.find_units_col(row)
+        # If using filter we have to run through the sequencer twice
+        # First time does the high levels maybe in parallel, second run low levels not in parallel
 
-                    if skip_completed:
-                        if not excel.check_empty_result(results_col):
-                            continue
+        # See if the test name has changed between rows, as the results column may be different
+        last_test_name = ""
 
-                    if run_count >= 1 and settings.scale > max_filter_range:
-                        # already measured
-                        continue
+        # Read all of the settings once, the filter needs two passes
+        test_settings = excel.get_settings_array(DcvSettings, rows=test_rows)
 
-                    if (
-                        run_count == 0
-                        and settings.scale <= max_filter_range
-                        and self.use_filter
-                    ):
-                        continue
+        measured_rows: Set[int] = set()
 
-                    units = excel.get_units()
+        if parallel_channels:
+            # Rows with the same settings on each channel are measured together
+            parallel_rows = self.test_dcv_parallel(
+                excel=excel,
+                test_settings=test_settings,
+                acquisitions=acquisitions,
+                max_filter_range=max_filter_range,
+                skip_completed=skip_completed,
+            )
 
-                    self.calibrator.set_voltage_dc(0)
+            if parallel_rows is None:
+                return False
 
-                    channel = int(settings.channel)
+            measured_rows = parallel_rows
 
-                    if channel > self.uut.num_channels:
-                        continue
+            # Back to channel 1 only for any remaining rows
+            for chan in range(self.uut.num_channels):
+                self.uut.set_channel(chan=chan + 1, enabled=chan == 0)
 
-                    if channel != last_channel:
-                        if last_channel > 0:
-                            # changed channel to another, but not channel 1.
-                            # Reset all of the settings on the channel just measured
-                            self.uut.set_voltage_scale(chan=last_channel, scale=1)
-                            self.uut.set_voltage_offset(chan=last_channel, offset=0)
-                            self.uut.set_channel(chan=last_channel, enabled=False)
-                            self.uut.set_channel_bw_limit(
-                                chan=last_channel, bw_limit=False
-                            )
-                            self.uut.set_channel(chan=channel, enabled=True)
-                            self.uut.set_channel_impedance(
-                                chan=last_channel, impedance="1M"
-                            )  # always
-
-                        self.uut.set_voltage_scale(chan=channel, scale=5)
-                        self.uut.set_voltage_offset(chan=channel, offset=0)
-
-                        self.uut.set_cursor_xy_source(chan=1, cursor=1)
-                        self.uut.set_cursor_position(cursor="X1", pos=0)
-                        if not parallel_channels or (
-                            self.use_filter and settings.scale <= max_filter_range
-                        ):
-                            message = f"Connect Calibrator output to channel {channel}"
-                            if self.use_filter and settings.scale <= max_filter_range:
-                                message += " via 0.15 uF capacitor direct to input"
-
-                            response = QMessageBox.information(
-                                self,
-                                "Connections",
-                                message,
-                                buttons=QMessageBox.StandardButton.Ok
-                                | QMessageBox.StandardButton.Cancel,
-                            )
-                            if response == QMessageBox.StandardButton.Cancel:
-                                return False
-
-                        last_channel = channel
+        for run_count in range(max_runs):
+            for settings in test_settings:
+                if self.abort_test:
+                    return False
 
-                    self.uut.set_channel(chan=channel, enabled=True)
-                    self.uut.set_voltage_scale(chan=channel, scale=settings.scale)
-                    self.uut.set_voltage_offset(chan=channel, offset=settings.offset)
+                row = int(settings.row)
+                if row in measured_rows:
+                    continue
 
-                    if settings.impedance:
-                        self.uut.set_channel_impedance(
-                            chan=channel, impedance=settings.impedance
-                        )
+                excel.row = row
 
-                    if settings.bandwidth:
-                        self.uut.set_channel_bw_limit(
-                            chan=channel, bw_limit=settings.bandwidth
-                        )
-                    else:
-                        self.uut.set_channel_bw_limit(chan=channel, bw_limit=False)
+                if settings.function != last_test_name:
+                    # Changed test name, update the results column
+                    last_test_name = settings.function
 
-                    if settings.invert:
-                        # already casted to a bool
-                        self.uut.set_channel_invert(
-                            chan=channel, inverted=settings.invert
+                    results_col = excel.find_results_col(row=row)
+                    if results_col == 0:
+                        QMessageBox.critical(
+                            self,
+                            "Error",
+                            f"Unable to find results col from row {row}.\n"
+                            "Ensure col headed with results or measured",
                         )
-                    else:
-                        self.uut.set_channel_invert(chan=channel, inverted=False)
-
-                    reading1 = 0
-
-                    if self.uut.keysight or settings.function == "DCV-BAL":
-                        if settings.function == "DCV-BAL":
-                            # Non keysight, apply the half the voltage
-                            # and the offset then do the reverse
-
-                            self.calibrator.set_voltage_dc(settings.voltage)
+                        return False
 
-                        # 0V test
-                        # Turn off averaging to speed up change in reading
+                    excel.find_units_col(row)
 
-                        self.uut.set_acquisition(1)
+                if skip_completed:
+                    if not excel.check_empty_result(results_col):
+                        continue
 
-                        self.calibrator.operate()
+                if run_count >= 1 and settings.scale > max_filter_range:
+                    # already measured
+                    continue
 
-                        if not self.simulating:
-                            time.sleep(0.1)
+                if (
+                    run_count == 0
+                    and settings.scale <= max_filter_range
+                    and self.use_filter
+                ):
+                    continue
 
-                        self.uut.set_acquisition(acquisitions)
+                units = excel.get_units()
 
-                        # with a 200 us timebase, and 64 samples, the average is complete in 12 ms
-                        settle_period = 0.2 if acquisitions < 64 else 1
+                self.calibrator.set_voltage_dc(0, block=False)
 
-                        if not self.simulating:
-                            time.sleep(settle_period)
+                channel = int(settings.channel)
 
-                        if settings.scale <= max_filter_range:
-                            self.uut.set_acquisition(64)
-                            time.sleep(
-                                1
-                            )  # little longer to average for sensitive scales
+                if channel > self.uut.num_channels:
+                    continue
 
-                        if self.uut.keysight:
-                            voltage1 = self.uut.read_cursor_avg()
+                if channel != last_channel:
+                    if last_channel > 0:
+                        # changed channel to another, but not channel 1.
+                        # Reset all of the settings on the channel just measured
+                        self.uut.set_voltage_scale(chan=last_channel, scale=1)
+                        self.uut.set_voltage_offset(chan=last_channel, offset=0)
+                        self.uut.set_channel(chan=last_channel, enabled=False)
+                        self.uut.set_channel_bw_limit(chan=last_channel, bw_limit=False)
+                        self.uut.set_channel(chan=channel, enabled=True)
+                        self.uut.set_channel_impedance(
+                            chan=last_channel, impedance="1M"
+                        )  # always
 
-                        self.uut.measure_clear()
-                        reading1 = self.uut.measure_voltage(chan=channel, delay=1)
+                    self.uut.set_voltage_scale(chan=channel, scale=5)
+                    self.uut.set_voltage_offset(chan=channel, offset=0)
 
-                    if settings.function == "DCV-BAL":
-                        # still set up for the + voltage
+                    self.uut.set_cursor_xy_source(chan=1, cursor=1)
+                    self.uut.set_cursor_position(cursor="X1", pos=0)
+                    if not parallel_channels or (
+                        self.use_filter and settings.scale <= max_filter_range
+                    ):
+                        message = f"Connect Calibrator output to channel {channel}"
+                        if self.use_filter and settings.scale <= max_filter_range:
+                            message += " via 0.15 uF capacitor direct to input"
 
-                        self.calibrator.set_voltage_dc(-settings.voltage)
-                        self.uut.set_voltage_offset(
-                            chan=channel, offset=-settings.offset
+                        response = QMessageBox.information(
+                            self,
+                            "Connections",
+                            message,
+                            buttons=QMessageBox.StandardButton.Ok
+                            | QMessageBox.StandardButton.Cancel,
                         )
-                    else:
-                        self.calibrator.set_voltage_dc(settings.voltage)
-
-                    self.uut.set_acquisition(1)
-                    self.calibrator.operate()
-
-                    if not self.simulating:
-                        time.sleep(0.1)
-
-                    self.uut.set_acquisition(acquisitions)
-
-                    if not self.simulating:
-                        time.sleep(settle_period)
-
-                    if settings.scale <= max_filter_range:
-                        self.uut.set_acquisition(64)
-                        time.sleep(1)  # little longer to average for sensitive scales
-
-                    self.uut.measure_clear()
-
-                    reading = self.uut.measure_voltage(chan=channel, delay=1)
-
-                    # Tek MSO4 error is 9e37, MSO5 and MSO6 error is 9E40
+                        if response == QMessageBox.StandardButton.Cancel:
+                            return False
 
-                    if (
-                        settings.scale == 0.001
-                        and abs(settings.offset) > 0
-                        and abs(reading) > 9e30
-                    ):
-                        # reading was off scale, so go to 2mV and try again
-                        self.uut.set_voltage_scale(chan=channel, scale=0.002)
-                        reading = self.uut.measure_voltage(chan=channel, delay=1)
-
-                    if self.uut.keysight and self.uut.family != DSOX_FAMILY.DSO5000:  # type: ignore
-                        voltage2 = self.uut.read_cursor_avg()
-
-                        self.cursor_results.append(
-                            {
-                                "chan": channel,
-                                "scale": settings.scale,
-                                "result": voltage2 - voltage1,  # type: ignore
-                            }
-                        )
+                    last_channel = channel
 
-                    self.calibrator.standby()
+                reading1, reading = self.dcv_row(
+                    settings=settings,
+                    acquisitions=acquisitions,
+                    sensitive=settings.scale <= max_filter_range,
+                )
 
-                    if units and units.startswith("m"):
-                        reading *= 1000
-                        reading1 *= 1000
+                if units and units.startswith("m"):
+                    reading *= 1000
+                    reading1 *= 1000
 
-                    if settings.function == "DCV-BAL":
-                        diff = reading1 - reading
-                        excel.write_result(diff, col=results_col)  # auto saving
-                    else:
-                        # DCV (offset) test. 0V is measured for the cursors only
-                        excel.write_result(reading - reading1, col=results_col)
+                if settings.function == "DCV-BAL":
+                    diff = reading1 - reading
+                    excel.write_result(diff, col=results_col)  # auto saving
+                else:
+                    # DCV (offset) test. 0V is measured for the cursors only
+                    excel.write_result(reading - reading1, col=results_col)
 
-                    self.update_test_progress()
+                self.update_test_progress()
 
-            self.calibrator.reset()
-            self.calibrator.close()
+        self.calibrator.reset()
+        self.calibrator.close()
 
-            # Turn off all channels but 1
-            for chan in range(self.uut.num_channels):
-                self.uut.set_channel(chan=chan + 1, enabled=chan == 0)
-                self.uut.set_channel_bw_limit(chan=chan, bw_limit=False)
+        # Turn off all channels but 1
+        for chan in range(self.uut.num_channels):
+            self.uut.set_channel(chan=chan + 1, enabled=chan == 0)
+            self.uut.set_channel_bw_limit(chan=chan, bw_limit=False)
 
-            self.uut.reset()
-            self.uut.close()
+        self.uut.reset()
+        self.uut.close()
 
         return True
 
-    def test_cursor(self, filename: str, test_rows: List) -> bool:
+    def test_cursor(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_cursor
         Dual cursor test. Measure voltage with no voltage applied,
@@ -1196,7 +1598,7 @@ class TestOscilloscope(QDialog, object):
         Measurements are taken during the DCV test, and recalled here
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
         """
 
@@ -1204,52 +1606,51 @@ class TestOscilloscope(QDialog, object):
 
         # no equipment as using buffered results
 
-        with ExcelInterface(filename) as excel:
-            excel.find_units_col(test_rows[0])
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
+        excel.find_units_col(test_rows[0])
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+        for row in test_rows:
+            if self.abort_test:
                 return False
-            for row in test_rows:
-                if self.abort_test:
-                    return False
 
-                excel.row = row
+            excel.row = row
 
-                settings = excel.get_volt_settings()
+            settings = excel.get_volt_settings()
 
-                if len(self.cursor_results):
-                    for res in self.cursor_results:
-                        if (
-                            res["chan"] == settings.channel
-                            and res["scale"] == settings.scale
-                        ):
-                            units = excel.get_units()
-                            result = res["result"]
-                            if units.startswith("m"):
-                                result *= 1000
-                            excel.write_result(result, save=False, col=results_col)
-                            self.update_test_progress()
-                            break
+            if len(self.cursor_results):
+                for res in self.cursor_results:
+                    if (
+                        res["chan"] == settings.channel
+                        and res["scale"] == settings.scale
+                    ):
+                        units = excel.get_units()
+                        result = res["result"]
+                        if units.startswith("m"):
+                            result *= 1000
+                        excel.write_result(result, save=False, col=results_col)
+                        self.update_test_progress()
+                        break
 
-            excel.save_sheet()
+        excel.save_sheet()
 
         return True
 
     def test_position(
-        self, filename: str, test_rows: List, parallel_channels: bool = False
+        self, excel: ExcelInterface, test_rows: List, parallel_channels: bool = False
     ) -> bool:
         """
         test_position
         Test vertical position
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
 
         Returns:
@@ -1276,22 +1677,41 @@ class TestOscilloscope(QDialog, object):
 
         last_channel = -1
 
-        with ExcelInterface(filename=filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
+
+        if parallel_channels:
+            response = QMessageBox.information(
+                self,
+                "Connections",
+                "Connect Calibrator output to all channels in parallel",
+                buttons=QMessageBox.StandardButton.Ok
+                | QMessageBox.StandardButton.Cancel,
+            )
+
+            if response == QMessageBox.StandardButton.Cancel:
                 return False
 
-            if parallel_channels:
+        for row in test_rows:
+            if self.abort_test:
+                return False
+
+            excel.row = row
+
+            settings = excel.get_volt_settings()
+
+            if settings.channel != last_channel and not parallel_channels:
                 response = QMessageBox.information(
                     self,
                     "Connections",
-                    "Connect Calibrator output to all channels in parallel",
+                    f"Connect Calibrator output to channel {settings.channel}",
                     buttons=QMessageBox.StandardButton.Ok
                     | QMessageBox.StandardButton.Cancel,
                 )
@@ -1299,68 +1719,42 @@ class TestOscilloscope(QDialog, object):
                 if response == QMessageBox.StandardButton.Cancel:
                     return False
 
-            for row in test_rows:
-                if self.abort_test:
-                    return False
-
-                excel.row = row
-
-                settings = excel.get_volt_settings()
-
-                if settings.channel != last_channel and not parallel_channels:
-                    response = QMessageBox.information(
-                        self,
-                        "Connections",
-                        f"Connect Calibrator output to channel {settings.channel}",
-                        buttons=QMessageBox.StandardButton.Ok
-                        | QMessageBox.StandardButton.Cancel,
-                    )
-
-                    if response == QMessageBox.StandardButton.Cancel:
-                        return False
-
-                    last_channel = settings.channel
-
-                self.uut.set_channel(
-                    chan=int(settings.channel), enabled=True, only=True
-                )
-                self.uut.set_channel_bw_limit(chan=int(settings.channel), bw_limit=True)
-                self.uut.set_voltage_scale(
-                    chan=int(settings.channel), scale=settings.scale
-                )
-                pos = -4 if settings.offset > 0 else 4
-                self.uut.set_voltage_position(
-                    chan=int(settings.channel), position=pos
-                )  # divisions
-                self.uut.set_voltage_offset(
-                    chan=int(settings.channel), offset=settings.offset
-                )
+                last_channel = settings.channel
+
+            self.uut.set_channel(chan=int(settings.channel), enabled=True, only=True)
+            self.uut.set_channel_bw_limit(chan=int(settings.channel), bw_limit=True)
+            self.uut.set_voltage_scale(chan=int(settings.channel), scale=settings.scale)
+            pos = -4 if settings.offset > 0 else 4
+            self.uut.set_voltage_position(
+                chan=int(settings.channel), position=pos
+            )  # divisions
+            self.uut.set_voltage_offset(
+                chan=int(settings.channel), offset=settings.offset
+            )
 
-                self.uut.set_acquisition(1)  # Too slow to adjust otherwise
-                self.calibrator.set_voltage_dc(settings.voltage)
+            self.uut.set_acquisition(1)  # Too slow to adjust otherwise
+            self.calibrator.set_voltage_dc(settings.voltage, block=False)
 
-                self.calibrator.operate()
+            self.calibrator.operate()
 
-                self.uut.set_acquisition(32)
+            self.uut.set_acquisition(32)
 
-                # self.uut.measure_voltage_clear()
+            # self.uut.measure_voltage_clear()
 
-                # reading = self.uut.measure_voltage(chan=int(settings.channel), delay=2)
-                response = QMessageBox.question(
-                    self,
-                    "Check cursor",
-                    "Trace within 0.2 div of center?",
-                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                )
+            # reading = self.uut.measure_voltage(chan=int(settings.channel), delay=2)
+            response = QMessageBox.question(
+                self,
+                "Check cursor",
+                "Trace within 0.2 div of center?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            )
 
-                result = (
-                    "Pass" if response == QMessageBox.StandardButton.Yes else "Fail"
-                )
+            result = "Pass" if response == QMessageBox.StandardButton.Yes else "Fail"
 
-                self.calibrator.standby()
+            self.calibrator.standby()
 
-                excel.write_result(result=result, col=results_col)
-                self.update_test_progress()
+            excel.write_result(result=result, col=results_col)
+            self.update_test_progress()
 
         self.calibrator.reset()
         self.calibrator.close()
@@ -1372,7 +1766,7 @@ class TestOscilloscope(QDialog, object):
 
     DELAY_PERIOD = 0.001  # 1 ms
 
-    def test_timebase(self, filename: str, row: int) -> bool:
+    def test_timebase(self, excel: ExcelInterface, row: int) -> bool:
         # sourcery skip: low-code-quality
         """
         test_timebase
@@ -1404,146 +1798,143 @@ class TestOscilloscope(QDialog, object):
         if response == QMessageBox.StandardButton.Cancel:
             return False
 
-        with ExcelInterface(filename=filename) as excel:
-            results_col = excel.find_results_col(row)
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {row}.\n"
-                    "Ensure col headed with results or measured",
-                )
-                return False
+        results_col = excel.find_results_col(row)
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {row}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
 
-            setting = excel.get_tb_test_settings(row=row)
+        setting = excel.get_tb_test_settings(row=row)
 
-            self.uut.reset()
+        self.uut.reset()
 
-            with ExcelInterface(filename=filename) as excel:
-                excel.row = row
-                self.uut.set_channel(chan=1, enabled=True)
+        excel.row = row
+        self.uut.set_channel(chan=1, enabled=True)
 
-                self.uut.set_voltage_scale(chan=1, scale=0.5)
-                self.uut.set_voltage_offset(chan=1, offset=0)
+        self.uut.set_voltage_scale(chan=1, scale=0.5)
+        self.uut.set_voltage_offset(chan=1, offset=0)
 
-                self.uut.set_acquisition(32)
+        self.uut.set_acquisition(32)
 
-                self.ks33250.set_pulse(
-                    period=DELAY_PERIOD, pulse_width=200e-6, amplitude=1
-                )
-                self.ks33250.enable_output(True)
+        self.ks33250.set_pulse(period=DELAY_PERIOD, pulse_width=200e-6, amplitude=1)
+        self.ks33250.enable_output(True)
 
-                self.uut.set_trigger_level(chan=1, level=0)
+        self.uut.set_trigger_level(chan=1, level=0)
 
-                if setting.timebase:
-                    self.uut.set_timebase(setting.timebase / 1e9)
-                else:
-                    self.uut.set_timebase(10e-9)
+        if setting.timebase:
+            self.uut.set_timebase(setting.timebase / 1e9)
+        else:
+            self.uut.set_timebase(10e-9)
 
-                if self.uut.keysight:
-                    time.sleep(0.1)
-                    self.uut.cursors_on()
-                    time.sleep(1.5)
+        delay_period = (
+            DELAY_PERIOD if setting.delay_period is None else setting.delay_period
+        )
 
-                    ref_x = self.uut.read_cursor("X1")  # get the reference time
-                    ref = self.uut.read_cursor(
-                        "Y1"
-                    )  # get the voltage, so delayed can be adjusted to same
-                else:
-                    QMessageBox.information(
-                        self,
-                        "Instructions",
-                        "Adjust Horz position so waveform is on center graticule",
-                    )
+        ppm = None
 
-                delay_period = (
-                    DELAY_PERIOD
-                    if setting.delay_period is None
-                    else setting.delay_period
-                )
+        if self.waveform_timebase:
+            ppm = self.timebase_error(chan=1, delay_period=delay_period)
+        elif self.uut.keysight:
+            time.sleep(0.1)
+            self.uut.cursors_on()
+            time.sleep(1.5)
 
-                self.uut.set_timebase_pos(
-                    delay_period
-                )  # delay 1ms (or defined) to next pulse
+            ref_x = self.uut.read_cursor("X1")  # get the reference time
+            ref = self.uut.read_cursor(
+                "Y1"
+            )  # get the voltage, so delayed can be adjusted to same
 
-                if not self.uut.keysight:
-                    valid = False
-                    while not valid:
-                        result = QInputDialog.getText(
-                            self,
-                            "Difference",
-                            "Enter difference in div of waveform crossing from center?",
-                        )
+            # delay 1ms (or defined) to next pulse
+            self.uut.set_timebase_pos(delay_period)
 
-                        if not result[1]:
-                            # cancelled
-                            break
+            self.uut.set_cursor_position(cursor="X1", pos=DELAY_PERIOD)  # 1 ms delay
+            time.sleep(1)
 
-                        try:
-                            val = float(result[0])  # type: ignore
-                            valid = True
-                        except ValueError:
-                            valid = False
+            # adjust the cursor until voltage is the same as measured
+            # from the reference pulse
+            self.uut.adjust_cursor(target=ref)
 
-                    if valid:
-                        excel.write_result(result=val, col=results_col)  # type: ignore
-                else:
-                    # Keysight
-                    self.uut.set_cursor_position(
-                        cursor="X1", pos=DELAY_PERIOD
-                    )  # 1 ms delay
-                    time.sleep(1)
+            offset_x = self.uut.read_cursor("X1")
 
-                    # adjust the cursor until voltage is the same as measured
-                    # from the reference pulse
-                    self.uut.adjust_cursor(target=ref)  # type: ignore
+            error = ref_x - offset_x + 0.001  # type: ignore
+            print(f"TB Error {error}")
 
-                    offset_x = self.uut.read_cursor("X1")
+            # results in ppm
+            ppm = error / 1e-3 * 1e6
+        else:
+            QMessageBox.information(
+                self,
+                "Instructions",
+                "Adjust Horz position so waveform is on center graticule",
+            )
 
-                    error = ref_x - offset_x + 0.001  # type: ignore
-                    print(f"TB Error {error}")
+            # delay 1ms (or defined) to next pulse
+            self.uut.set_timebase_pos(delay_period)
 
-                    excel.row = row
+            valid = False
+            while not valid:
+                result = QInputDialog.getText(
+                    self,
+                    "Difference",
+                    "Enter difference in div of waveform crossing from center?",
+                )
 
-                    if self.uut.family != DSOX_FAMILY.DSO5000:  # type: ignore
-                        code = QInputDialog.getText(
-                            self,
-                            "Date code",
-                            "Enter date code from serial label (0 if no code)",
-                        )
+                if not result[1]:
+                    # cancelled
+                    break
 
-                        age = 10
+                try:
+                    val = float(result[0])  # type: ignore
+                    valid = True
+                except ValueError:
+                    valid = False
 
-                        try:
-                            val = int(code[0])  # type: ignore
-                            print(f"{val / 100}, {datetime.now().year - 2000}")
-                            if val // 100 > datetime.now().year - 2000:
-                                val = 0
-                            age = datetime.now().year - (val / 100) - 2000
+            if valid:
+                excel.write_result(result=val, col=results_col)  # type: ignore
 
-                        except ValueError:
-                            val = 0
+        if ppm is not None:
+            excel.row = row
 
-                        if not val and len(self.uut.serial) >= 10:
-                            code = self.uut.serial[2:6]
+            if self.uut.keysight and self.uut.family != DSOX_FAMILY.DSO5000:  # type: ignore
+                code = QInputDialog.getText(
+                    self,
+                    "Date code",
+                    "Enter date code from serial label (0 if no code)",
+                )
 
-                            try:
-                                val = int(code)
-                                # start is from 1960
-                                age = datetime.now().year - (val - 4000) / 100 - 2000
-                            except ValueError:
-                                # Invalid. Just assume 10
-                                age = 10
+                age = 10
 
-                        age_years = int(age + 0.5)
-                        excel.write_result(age_years, save=False, col=1)
+                try:
+                    val = int(code[0])  # type: ignore
+                    print(f"{val / 100}, {datetime.now().year - 2000}")
+                    if val // 100 > datetime.now().year - 2000:
+                        val = 0
+                    age = datetime.now().year - (val / 100) - 2000
 
-                    # results in ppm
-                    ppm = error / 1e-3 * 1e6
+                except ValueError:
+                    val = 0
 
-                    excel.write_result(ppm, save=True, col=results_col)
+                if not val and len(self.uut.serial) >= 10:
+                    code = self.uut.serial[2:6]
 
-                self.update_test_progress()
+                    try:
+                        val = int(code)
+                        # start is from 1960
+                        age = datetime.now().year - (val - 4000) / 100 - 2000
+                    except ValueError:
+                        # Invalid. Just assume 10
+                        age = 10
+
+                age_years = int(age + 0.5)
+                excel.write_result(age_years, save=False, col=1)
+
+            excel.write_result(ppm, save=True, col=results_col)
+
+        self.update_test_progress()
 
         self.ks33250.enable_output(False)
         self.ks33250.go_to_local()
@@ -1553,7 +1944,38 @@ class TestOscilloscope(QDialog, object):
 
         return True
 
-    def test_trigger_sensitivity(self, filename: str, test_rows: List) -> bool:
+    def timebase_error(self, chan: int, delay_period: float) -> float | None:
+        """
+        timebase_error
+        Time the reference edge at the trigger, then the next edge delay_period
+        later, from the waveforms. Each crossing is interpolated between samples
+
+        Args:
+            chan (int): _description_
+            delay_period (float): pulse period, seconds
+
+        Returns:
+            float | None: error in ppm, None if an edge wasn't found
+        """
+
+        self.uut.set_timebase_pos(0)
+        ref_time, level = self.uut.measure_edge_time(chan=chan, delay=1.5)
+
+        self.uut.set_timebase_pos(delay_period)  # delay 1ms (or defined) to next pulse
+        delayed_time, _ = self.uut.measure_edge_time(
+            chan=chan, level=level, near=delay_period, delay=1.5
+        )
+
+        if math.isnan(ref_time) or math.isnan(delayed_time):
+            QMessageBox.critical(self, "Error", "Unable to find the pulse edges")
+            return None
+
+        error = delay_period - (delayed_time - ref_time)
+        print(f"TB Error {error}")
+
+        return error / delay_period * 1e6
+
+    def test_trigger_sensitivity(self, excel: ExcelInterface, test_rows: List) -> bool:
         # sourcery skip: low-code-quality
         """
         test_trigger_sensitivity
@@ -1564,7 +1986,7 @@ class TestOscilloscope(QDialog, object):
         degradation problem
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (list): _description_
         """
 
@@ -1600,81 +2022,78 @@ class TestOscilloscope(QDialog, object):
 
         ext_termination = True
 
-        with ExcelInterface(filename=filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
-                return False
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
 
-            for row in test_rows:
-                excel.row = row
-                settings = excel.get_trigger_settings()
-                if settings.channel == 1 and settings.impedance == 50:
-                    ext_termination = False
-                    break
+        for row in test_rows:
+            excel.row = row
+            settings = excel.get_trigger_settings()
+            if settings.channel == 1 and settings.impedance == 50:
+                ext_termination = False
+                break
 
-            # now the main test loop
+        # now the main test loop
 
-            last_channel = 0
+        last_channel = 0
 
-            for row in test_rows:
-                excel.row = row
+        for row in test_rows:
+            excel.row = row
 
-                settings = excel.get_trigger_settings()
+            settings = excel.get_trigger_settings()
 
-                feedthru_msg = (
-                    "via 50 Ohm Feedthru"
-                    if ext_termination or str(settings.channel).upper() == "EXT"
-                    else ""
-                )
+            feedthru_msg = (
+                "via 50 Ohm Feedthru"
+                if ext_termination or str(settings.channel).upper() == "EXT"
+                else ""
+            )
 
-                if settings.channel != last_channel:
-                    response = sg.popup_ok_cancel(
-                        f"Connect signal generator output to channel {settings.channel} {feedthru_msg}",
-                    )
-                    if response == "Cancel":
-                        return False
+            if settings.channel != last_channel:
+                response = sg.popup_ok_cancel(
+                    f"Connect signal generator output to channel {settings.channel} {feedthru_msg}",
+                )
+                if response == "Cancel":
+                    return False
 
-                    last_channel = settings.channel
+                last_channel = settings.channel
 
-                self.mxg.set_frequency_MHz(settings.frequency)
-                self.mxg.set_level(settings.voltage, units="mV")
-                self.mxg.set_output_state(True)
+            self.mxg.set_frequency_MHz(settings.frequency)
+            self.mxg.set_level(settings.voltage, units="mV")
+            self.mxg.set_output_state(True)
 
-                if str(settings.channel).upper() != "EXT":
-                    for chan in range(1, self.uut.num_channels + 1):
-                        self.uut.set_channel(
-                            chan=chan, enabled=chan == settings.channel
-                        )
-                    self.uut.set_channel(chan=int(settings.channel), enabled=True)
-                    self.uut.set_voltage_scale(chan=int(settings.channel), scale=0.5)
-                    self.uut.set_voltage_offset(chan=int(settings.channel), offset=0)
-                    self.uut.set_trigger_level(chan=int(settings.channel), level=0)
+            if str(settings.channel).upper() != "EXT":
+                for chan in range(1, self.uut.num_channels + 1):
+                    self.uut.set_channel(chan=chan, enabled=chan == settings.channel)
+                self.uut.set_channel(chan=int(settings.channel), enabled=True)
+                self.uut.set_voltage_scale(chan=int(settings.channel), scale=0.5)
+                self.uut.set_voltage_offset(chan=int(settings.channel), offset=0)
+                self.uut.set_trigger_level(chan=int(settings.channel), level=0)
 
-                else:
-                    # external. use channel 1
-                    self.uut.set_channel(chan=1, enabled=True)
-                    self.uut.set_trigger_level(chan=0, level=0)
+            else:
+                # external. use channel 1
+                self.uut.set_channel(chan=1, enabled=True)
+                self.uut.set_trigger_level(chan=0, level=0)
 
-                period = 1 / settings.frequency / 1e6
-                # Round it off to a nice value of 1, 2, 5 or multiple
+            period = 1 / settings.frequency / 1e6
+            # Round it off to a nice value of 1, 2, 5 or multiple
 
-                period = self.round_range(period)
+            period = self.round_range(period)
 
-                self.uut.set_timebase(period * 2)
+            self.uut.set_timebase(period * 2)
 
-                triggered = self.uut.check_triggered(
-                    sweep_time=0.1
-                )  # actual sweep time is ns
+            triggered = self.uut.check_triggered(
+                sweep_time=0.1
+            )  # actual sweep time is ns
 
-                test_result = "Pass" if triggered else "Fail"
-                excel.write_result(result=test_result, save=True, col=results_col)
-                self.update_test_progress()
+            test_result = "Pass" if triggered else "Fail"
+            excel.write_result(result=test_result, save=True, col=results_col)
+            self.update_test_progress()
 
         self.mxg.set_output_state(False)
         self.mxg.close()
@@ -1684,13 +2103,13 @@ class TestOscilloscope(QDialog, object):
 
         return True
 
-    def test_risetime(self, filename: str, test_rows: List) -> bool:
+    def test_risetime(self, excel: ExcelInterface, test_rows: List) -> bool:
         """
         test_risetime
         Use fast pulse generator to test rise time of each channel
 
         Args:
-            filename (str): _description_
+            excel (ExcelInterface): results workbook session for the run
             test_rows (List): _description_
         """
 
@@ -1703,76 +2122,72 @@ class TestOscilloscope(QDialog, object):
 
         last_channel = 0
 
-        with ExcelInterface(filename=filename) as excel:
-            results_col = excel.find_results_col(test_rows[0])
-            if results_col == 0:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Unable to find results col from row {test_rows[0]}.\n"
-                    "Ensure col headed with results or measured",
-                )
-                return False
+        results_col = excel.find_results_col(test_rows[0])
+        if results_col == 0:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"Unable to find results col from row {test_rows[0]}.\n"
+                "Ensure col headed with results or measured",
+            )
+            return False
 
-            for row in test_rows:
-                if self.abort_test:
-                    return False
+        for row in test_rows:
+            if self.abort_test:
+                return False
 
-                excel.row = row
+            excel.row = row
 
-                settings = excel.get_tb_test_settings()
+            settings = excel.get_tb_test_settings()
 
-                if settings.channel > self.uut.num_channels:
-                    continue
+            if settings.channel > self.uut.num_channels:
+                continue
 
-                message = f"Connect fast pulse generator to channel {settings.channel}"
+            message = f"Connect fast pulse generator to channel {settings.channel}"
 
-                if settings.impedance != 50:
-                    message += " via 50 Ohm feedthru"
+            if settings.impedance != 50:
+                message += " via 50 Ohm feedthru"
 
-                if settings.channel != last_channel:
-                    response = QMessageBox.information(
-                        self,
-                        "Connections",
-                        message,
-                        buttons=QMessageBox.StandardButton.Ok
-                        | QMessageBox.StandardButton.Cancel,
-                    )
+            if settings.channel != last_channel:
+                response = QMessageBox.information(
+                    self,
+                    "Connections",
+                    message,
+                    buttons=QMessageBox.StandardButton.Ok
+                    | QMessageBox.StandardButton.Cancel,
+                )
 
-                    last_channel = settings.channel
+                last_channel = settings.channel
 
-                    if response == QMessageBox.StandardButton.Cancel:
-                        return False
+                if response == QMessageBox.StandardButton.Cancel:
+                    return False
 
-                for chan in range(self.uut.num_channels):
-                    self.uut.set_channel(
-                        chan=chan + 1, enabled=settings.channel == chan + 1
-                    )
+            for chan in range(self.uut.num_channels):
+                self.uut.set_channel(
+                    chan=chan + 1, enabled=settings.channel == chan + 1
+                )
 
-                self.uut.set_voltage_scale(chan=settings.channel, scale=0.2)
+            self.uut.set_voltage_scale(chan=settings.channel, scale=0.2)
 
-                if settings.impedance == 50:
-                    self.uut.set_channel_impedance(
-                        chan=settings.channel, impedance="50"
-                    )
+            if settings.impedance == 50:
+                self.uut.set_channel_impedance(chan=settings.channel, impedance="50")
 
-                if settings.bandwidth:
-                    self.uut.set_channel_bw_limit(
-                        chan=settings.channel, bw_limit=settings.bandwidth
-                    )
+            if settings.bandwidth:
+                self.uut.set_channel_bw_limit(
+                    chan=settings.channel, bw_limit=settings.bandwidth
+                )
 
-                self.uut.set_timebase(settings.timebase * 1e-9)
-                self.uut.set_trigger_level(chan=settings.channel, level=0)
+            self.uut.set_timebase(settings.timebase * 1e-9)
+            self.uut.set_trigger_level(chan=settings.channel, level=0)
 
-                risetime = (
-                    self.uut.measure_risetime(chan=settings.channel, num_readings=10)
-                    * 1e9
-                )
+            risetime = (
+                self.uut.measure_risetime(chan=settings.channel, num_readings=10) * 1e9
+            )
 
-                # save in ns
+            # save in ns
 
-                excel.write_result(risetime, save=True, col=results_col)
-                self.update_test_progress()
+            excel.write_result(risetime, save=True, col=results_col)
+            self.update_test_progress()
 
         self.uut.reset()
         self.uut.close()
@@ -33,6 +33,7 @@ from drivers.Ks3458A import Ks3458A
 from drivers.Ks33250A import Ks33250A
 from drivers.meatest_m142 import M142
 from drivers.scpi_id import SCPI_ID
+from drivers.workbook_probe import WorkbookProbe
 from individual_test_selector import IndividualTestSelector
 from oscilloscope_tester import TestOscilloscope
 from select_uut_address import AddressSelector
@@ -460,14 +461,17 @@ class UI(QMainWindow):
                         self.do_parallel = True
 
                 test_rows = sorted(test_steps)
-
-                self.perform_oscilloscope_tests(test_rows=test_rows)
         except BadZipFile:
             QMessageBox.critical(
                 self,
                 "Error",
                 "Results file is corrupted. Copy from previous version in backups folder (subfolder of current results folder)",
             )
+            return
+
+        # Sheet is closed before testing, the test run has its own session of
+        # the workbook. Two open copies would overwrite each other's results
+        self.perform_oscilloscope_tests(test_rows=test_rows)
 
     def perform_oscilloscope_tests(self, test_rows: list) -> None:
         """
@@ -552,9 +556,9 @@ class UI(QMainWindow):
             bool: _description_
         """
 
-        with ExcelInterface(filename=self.txt_results_file.text()) as excel:
-            nr = excel.get_named_cell("StartCell")
-            if not nr:
+        # Only reading, so no need to open the workbook for editing
+        with WorkbookProbe(filename=self.txt_results_file.text()) as excel:
+            if not excel.check_valid_results():
                 QMessageBox.critical(
                     self,
                     "Error",
@@ -591,10 +595,9 @@ class UI(QMainWindow):
             bool: _description_
         """
 
-        with ExcelInterface(filename=self.txt_results_file.text()) as excel:
+        with WorkbookProbe(filename=self.txt_results_file.text()) as excel:
             # Repeat the part of the check from result_sheet_check, but we don't want it messaging the tests to be performed
-            nr = excel.get_named_cell("StartCell")
-            if not nr:
+            if not excel.check_valid_results():
                 QMessageBox.critical(
                     self,
                     "Error",
@@ -621,7 +624,8 @@ class UI(QMainWindow):
 
         if os.path.isfile(self.txt_results_file.text()):
             try:
-                with ExcelInterface(filename=self.txt_results_file.text()) as excel:
+                # Called as the filename is typed, so keep it light
+                with WorkbookProbe(filename=self.txt_results_file.text()) as excel:
                     check = excel.check_channel_rows()
 
                     self.btn_hide_excel_rows.setEnabled(check)
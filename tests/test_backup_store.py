@@ -0,0 +1,79 @@
+"""
+# Backups of the results workbook
+# DK Oct 26
+"""
+
+import os
+
+from drivers.backup_store import BackupStore
+
+
+def backups(store: BackupStore, name: str = "results.xlsx") -> list:
+    return sorted(
+        fname for fname in os.listdir(store.path) if fname.endswith(f"_{name}")
+    )
+
+
+def test_backup_copies_workbook(tmp_path):
+    workbook = tmp_path / "results.xlsx"
+    workbook.write_bytes(b"first")
+    store = BackupStore(str(workbook))
+
+    backup = store.backup()
+    store.wait()
+
+    assert os.path.dirname(backup) == str(tmp_path / "Backups")
+    with open(backup, "rb") as infile:
+        assert infile.read() == b"first"
+    assert not any(fname.endswith(".tmp") for fname in os.listdir(store.path))
+
+
+def test_unchanged_not_copied_again(tmp_path):
+    workbook = tmp_path / "results.xlsx"
+    workbook.write_bytes(b"first")
+    store = BackupStore(str(workbook))
+
+    backup = store.backup()
+    store.wait()
+
+    assert BackupStore(str(workbook)).backup() == backup
+    assert len(backups(store)) == 1
+
+
+def test_changed_copied(tmp_path):
+    workbook = tmp_path / "results.xlsx"
+    workbook.write_bytes(b"first")
+    store = BackupStore(str(workbook))
+    first = store.backup()
+    store.wait()
+
+    # Older backup, so the new one can't share its name
+    old = os.path.join(store.path, "20200101_000000_results.xlsx")
+    os.replace(first, old)
+    workbook.write_bytes(b"second")
+
+    second = store.backup()
+    store.wait()
+
+    assert second != old
+    with open(second, "rb") as infile:
+        assert infile.read() == b"second"
+
+
+def test_prune_keeps_latest(tmp_path):
+    workbook = tmp_path / "results.xlsx"
+    workbook.write_bytes(b"latest")
+    os.mkdir(tmp_path / "Backups")
+
+    old = [f"2020010{day}_120000_results.xlsx" for day in range(1, 6)]
+    for fname in old:
+        (tmp_path / "Backups" / fname).write_bytes(b"old")
+    # Other workbooks in the folder are left alone
+    (tmp_path / "Backups" / "20200101_120000_other.xlsx").write_bytes(b"old")
+
+    store = BackupStore(str(workbook), keep=3)
+    backup = store.backup()
+    store.wait()
+
+    assert backups(store) == old[-2:] + [os.path.basename(backup)]
+    assert backups(store, "other.xlsx") == ["20200101_120000_other.xlsx"]
@@ -0,0 +1,113 @@
+"""
+# Cursor crossing search, against a model edge
+# DK Oct 26
+"""
+
+import math
+
+import pytest
+
+from drivers.crossing import find_crossing
+
+EDGE_TIME = 3e-4
+
+
+def rising(t: float) -> float:
+    return 1 / (1 + math.exp(-(t - EDGE_TIME) / 2e-5))
+
+
+def falling(t: float) -> float:
+    return 1 - rising(t)
+
+
+class Counted:
+    """
+    Records where the edge was measured
+    """
+
+    def __init__(self, edge) -> None:
+        self.edge = edge
+        self.positions: list = []
+
+    def __call__(self, t: float) -> float:
+        self.positions.append(t)
+        return self.edge(t)
+
+
+@pytest.mark.parametrize("edge", [rising, falling])
+@pytest.mark.parametrize("start", [0.0, 4.5e-4])
+def test_finds_edge_either_side(edge, start):
+    measure = Counted(edge)
+
+    crossing = find_crossing(
+        measure, start, edge(start), 0.5, step=5e-5, tolerance=1e-3
+    )
+
+    assert crossing.converged
+    assert crossing.x == pytest.approx(EDGE_TIME, abs=1e-7)
+    assert abs(crossing.y - 0.5) <= 1e-3
+    assert crossing.iterations == len(measure.positions) < 15
+
+
+def test_already_there():
+    crossing = find_crossing(Counted(rising), EDGE_TIME, 0.5, 0.5, 1e-5, 1e-3)
+
+    assert crossing.converged
+    assert crossing.iterations == 0
+
+
+def test_stays_within_limits():
+    measure = Counted(rising)
+
+    crossing = find_crossing(
+        measure, 0.0, rising(0.0), 0.5, 5e-5, 1e-3, lower=-2e-4, upper=2e-4
+    )
+
+    assert not crossing.converged
+    assert all(-2e-4 <= pos <= 2e-4 for pos in measure.positions)
+    assert crossing.x == pytest.approx(2e-4)
+
+
+def test_first_step_back_at_upper_limit():
+    measure = Counted(falling)
+
+    crossing = find_crossing(measure, 5e-4, falling(5e-4), 0.5, 5e-5, 1e-3, upper=5e-4)
+
+    assert crossing.converged
+    assert all(pos <= 5e-4 for pos in measure.positions)
+
+
+def test_over_range_is_not_found():
+    def off_screen(t: float) -> float:
+        return 9.9e37 if t > 1e-4 else rising(t)
+
+    crossing = find_crossing(off_screen, 0.0, rising(0.0), 0.5, 5e-5, 1e-3)
+
+    assert not crossing.converged
+    assert crossing.x <= 1e-4
+    assert abs(crossing.y) < 1
+
+
+def test_over_range_start():
+    crossing = find_crossing(rising, 0.0, 9.9e37, 0.5, 5e-5, 1e-3)
+
+    assert not crossing.converged
+    assert crossing.iterations == 0
+
+
+def test_max_iterations():
+    measure = Counted(rising)
+
+    crossing = find_crossing(
+        measure, 0.0, rising(0.0), 0.5, 1e-9, 1e-9, max_iterations=5
+    )
+
+    assert crossing.iterations == len(measure.positions) == 5
+    assert not crossing.converged
+
+
+def test_flat_never_crosses():
+    crossing = find_crossing(lambda t: 0.0, 0.0, 0.0, 0.5, 1.0, 1e-3, max_iterations=10)
+
+    assert not crossing.converged
+    assert crossing.iterations == 10
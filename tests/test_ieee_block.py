@@ -0,0 +1,130 @@
+"""
+# Binary block parsing and decoding, no instrument needed
+# DK Oct 26
+"""
+
+import numpy as np
+import pyvisa
+import pytest
+from pyvisa import constants
+
+from drivers.ieee_block import (
+    KEYSIGHT_WORD,
+    RS_REAL32,
+    TEK_WORD,
+    decode,
+    parse_block,
+    query_binary,
+    read_block,
+)
+
+
+class FakeInstr:
+    """
+    Serves a reply in reads of the size asked for
+    """
+
+    def __init__(self, reply: bytes, terminator: bool = True) -> None:
+        self.reply = reply
+        self.terminator = terminator
+        self.reads: list = []
+
+    def read_bytes(self, count: int) -> bytes:
+        if not self.reply:
+            raise pyvisa.VisaIOError(constants.StatusCode.error_timeout)
+        chunk, self.reply = self.reply[:count], self.reply[count:]
+        self.reads.append(count)
+        return chunk
+
+    def read_raw(self) -> bytes:
+        chunk, self.reply = self.reply, b""
+        return chunk
+
+
+class FakeDriver:
+    def __init__(self, reply: bytes) -> None:
+        self.instr = FakeInstr(reply)
+        self.written: list = []
+        self.flushed = False
+
+    def write(self, command: str) -> None:
+        self.written.append(command)
+
+    def flush_batch(self) -> None:
+        self.flushed = True
+
+
+def block(data: bytes) -> bytes:
+    length = str(len(data)).encode()
+    return b"#" + str(len(length)).encode() + length + data
+
+
+def test_parse_definite():
+    assert bytes(parse_block(block(b"abcdef") + b"\n")) == b"abcdef"
+
+
+def test_parse_indefinite():
+    assert bytes(parse_block(b"#0abc\n")) == b"abc"
+
+
+def test_parse_empty():
+    assert bytes(parse_block(b"#10")) == b""
+
+
+@pytest.mark.parametrize("data", [b"", b"1234", b"x#15abcde", b"#a"])
+def test_parse_invalid_header(data):
+    with pytest.raises(ValueError):
+        parse_block(data)
+
+
+def test_parse_short():
+    with pytest.raises(ValueError):
+        parse_block(b"#210abc")
+
+
+def test_read_block_in_chunks():
+    data = bytes(range(256)) * 4
+    instr = FakeInstr(block(data) + b"\n")
+
+    assert bytes(read_block(instr, chunk_size=100)) == data
+    # header, length digits, data in chunks, terminator
+    assert instr.reads[:2] == [2, 4]
+    assert max(instr.reads[2:-1]) == 100
+    assert not instr.reply
+
+
+def test_read_block_without_terminator():
+    instr = FakeInstr(block(b"abc"))
+
+    assert bytes(read_block(instr)) == b"abc"
+
+
+def test_read_block_indefinite():
+    assert bytes(read_block(FakeInstr(b"#0abcd\n"))) == b"abcd"
+
+
+def test_read_block_invalid():
+    with pytest.raises(ValueError):
+        read_block(FakeInstr(b"1.234\n"))
+
+
+@pytest.mark.parametrize("fmt", [KEYSIGHT_WORD, TEK_WORD, RS_REAL32])
+def test_decode_byte_order(fmt):
+    values = np.array([0, 1, 1000, 32000], dtype=fmt.dtype)
+
+    np.testing.assert_array_equal(decode(values.tobytes(), fmt.dtype), values)
+
+
+def test_decode_ignores_partial_value():
+    assert decode(b"\x00\x01\x02", ">u2").tolist() == [1]
+
+
+def test_query_binary():
+    values = np.linspace(-1, 1, 11, dtype="<f4")
+    driver = FakeDriver(block(values.tobytes()) + b"\n")
+
+    result = query_binary(driver, "CHAN1:DATA?", RS_REAL32.dtype)
+
+    np.testing.assert_array_equal(result, values)
+    assert driver.written == ["CHAN1:DATA?"]
+    assert driver.flushed
@@ -0,0 +1,134 @@
+"""
+# Test plan cache kept in step with the workbook
+# DK Oct 26
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from drivers import test_plan_cache as plan_cache
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    filename = tmp_path / "results.xlsx"
+    filename.write_bytes(b"workbook contents")
+    return filename
+
+
+def make_plan(cache, sheet_index: int = 0):
+    plan = plan_cache.TestPlan(
+        sheet_index=sheet_index,
+        size=0,
+        mtime_ns=0,
+        sha256="",
+        max_row=40,
+        data_col=5,
+        start_row=12,
+        named_cells={"Date": (3, 2, datetime(2026, 10, 17, 9, 30))},
+        rows={12: ("FUNC", 1, 0.5)},
+        results_cols={12: 6},
+        units_cols={12: 7},
+        header_rows=[10, 20],
+        filters={12: "1,2"},
+    )
+    return cache.stamp(plan)
+
+
+def test_cache_in_user_folder(workbook, tmp_path):
+    cache = plan_cache.TestPlanCache(str(workbook))
+
+    assert cache.path.startswith(str(tmp_path / "cache"))
+    assert os.path.basename(cache.path).startswith("results.xlsx.")
+
+
+def test_round_trip(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    plan = make_plan(cache)
+
+    cache.save(plan)
+
+    assert cache.load() == plan
+
+
+def test_missing(workbook):
+    assert plan_cache.TestPlanCache(str(workbook)).load() is None
+
+
+def test_size_change_invalidates(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    cache.save(make_plan(cache))
+
+    workbook.write_bytes(b"longer workbook contents")
+
+    assert cache.load() is None
+
+
+def test_touched_still_valid(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    plan = make_plan(cache)
+    cache.save(plan)
+
+    mtime_ns = plan.mtime_ns + 5_000_000_000
+    os.utime(workbook, ns=(mtime_ns, mtime_ns))
+
+    loaded = cache.load()
+
+    assert loaded is not None
+    assert loaded.mtime_ns == mtime_ns
+    # Restamped, so the next load doesn't hash
+    assert plan_cache.TestPlanCache(str(workbook)).load().mtime_ns == mtime_ns
+
+
+def test_same_size_changed_contents(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    plan = make_plan(cache)
+    cache.save(plan)
+
+    workbook.write_bytes(b"WORKBOOK CONTENTS")
+    mtime_ns = plan.mtime_ns + 5_000_000_000
+    os.utime(workbook, ns=(mtime_ns, mtime_ns))
+
+    assert cache.load() is None
+
+
+def test_other_sheet(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    cache.save(make_plan(cache, sheet_index=1))
+
+    assert cache.load(sheet_index=0) is None
+    assert cache.load(sheet_index=1) is not None
+
+
+def test_old_format(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    plan = make_plan(cache)
+    plan.cache_format = plan_cache.CACHE_FORMAT - 1
+    cache.save(plan)
+
+    assert cache.load() is None
+
+
+def test_corrupt(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    cache.save(make_plan(cache))
+
+    with open(cache.path, "w", encoding="utf-8") as outfile:
+        outfile.write('{"sheet_index": 0, "size"')
+
+    assert cache.load() is None
+
+
+def test_clear(workbook):
+    cache = plan_cache.TestPlanCache(str(workbook))
+    cache.save(make_plan(cache))
+
+    cache.clear()
+
+    assert not os.path.exists(cache.path)
+    assert cache.load() is None
@@ -0,0 +1,65 @@
+"""
+# Result journal written and replayed
+# DK Oct 26
+"""
+
+from datetime import datetime
+
+from drivers.result_journal import ResultJournal
+
+
+def test_round_trip(tmp_path):
+    workbook = tmp_path / "results.xlsx"
+    stamp = datetime(2026, 10, 17, 9, 30)
+
+    with ResultJournal(str(workbook)) as journal:
+        journal.append(sheet=0, row=12, col=4, value=1.25)
+        journal.append(sheet=0, row=13, col=4, value="PASS")
+        journal.append(sheet=1, row=2, col=3, value=stamp)
+        journal.append(sheet=0, row=14, col=4, value=None)
+
+    entries = ResultJournal(str(workbook)).read()
+
+    assert [(e.sheet, e.row, e.col, e.value) for e in entries] == [
+        (0, 12, 4, 1.25),
+        (0, 13, 4, "PASS"),
+        (1, 2, 3, stamp),
+        (0, 14, 4, None),
+    ]
+
+
+def test_next_to_workbook(tmp_path):
+    journal = ResultJournal(str(tmp_path / "results.xlsx"))
+
+    assert journal.path == str(tmp_path / "~results.xlsx.journal")
+    assert not journal.exists()
+
+
+def test_partial_last_line_ignored(tmp_path):
+    journal = ResultJournal(str(tmp_path / "results.xlsx"))
+    journal.append(sheet=0, row=12, col=4, value=1.0)
+    journal.close()
+
+    # Crash part way through writing a line
+    with open(journal.path, "a", encoding="utf-8") as outfile:
+        outfile.write('{"sheet": 0, "row": 13, "col"')
+
+    entries = journal.read()
+
+    assert journal.exists()
+    assert [e.row for e in entries] == [12]
+
+
+def test_clear(tmp_path):
+    journal = ResultJournal(str(tmp_path / "results.xlsx"))
+    journal.append(sheet=0, row=12, col=4, value=1.0)
+
+    journal.clear()
+
+    assert not journal.exists()
+    assert journal.read() == []
+
+    # Can carry on after a clear
+    journal.append(sheet=0, row=13, col=4, value=2.0)
+    assert [e.row for e in journal.read()] == [13]
+    journal.close()
@@ -0,0 +1,148 @@
+"""
+# Waveform statistics, noise interval and edge timing
+# DK Oct 26
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from drivers.waveform_analysis import (
+    NoiseAccumulator,
+    channel_stats,
+    edge_crossing,
+    t_quantile,
+    waveform_stats,
+)
+
+
+@pytest.mark.parametrize(
+    "confidence, dof, expected",
+    [
+        (0.95, 1, 12.706),
+        (0.95, 2, 4.303),
+        (0.95, 5, 2.571),
+        (0.95, 29, 2.045),
+        (0.99, 2, 9.925),
+        (0.99, 10, 3.169),
+    ],
+)
+def test_t_quantile_table(confidence, dof, expected):
+    assert t_quantile(confidence, dof) == pytest.approx(expected, abs=1e-3)
+
+
+def test_t_quantile_tends_to_normal():
+    assert t_quantile(0.95, 10_000) == pytest.approx(1.960, abs=1e-3)
+
+
+def test_waveform_stats():
+    stats = waveform_stats(np.array([1.0, -1.0, 3.0, -3.0]))
+
+    assert stats.mean == 0
+    assert stats.rms == pytest.approx(math.sqrt(5))
+    assert stats.std == pytest.approx(math.sqrt(5))
+    assert (stats.min, stats.max, stats.count) == (-3, 3, 4)
+
+
+def test_waveform_stats_empty():
+    stats = waveform_stats(np.array([]))
+
+    assert stats.count == 0
+    assert math.isnan(stats.mean)
+
+
+def test_channel_stats_matches_single():
+    rng = np.random.default_rng(1)
+    waveforms = {1: rng.normal(0, 1, 100), 2: rng.normal(5, 2, 100)}
+
+    stats = channel_stats(waveforms)
+
+    for chan, volts in waveforms.items():
+        assert stats[chan] == pytest.approx(waveform_stats(volts))
+
+
+def test_channel_stats_different_lengths():
+    stats = channel_stats({1: np.ones(10), 2: np.zeros(5)})
+
+    assert (stats[1].count, stats[2].count) == (10, 5)
+
+
+def test_noise_rms_matches_whole_record():
+    rng = np.random.default_rng(2)
+    volts = 0.1 + rng.normal(0, 1e-3, 10_000)
+
+    noise = NoiseAccumulator()
+    for chunk in np.array_split(volts, 7):
+        noise.add(chunk)
+
+    assert noise.count == volts.size
+    assert noise.rms == pytest.approx(np.std(volts), rel=1e-9)
+
+
+def test_noise_no_interval_before_min_chunks():
+    noise = NoiseAccumulator()
+    for _ in range(NoiseAccumulator.min_chunks - 1):
+        noise.add(np.random.default_rng(3).normal(0, 1, 1000))
+
+    estimate = noise.estimate(precision=1)
+
+    assert not estimate.converged
+    assert estimate.precision == math.inf
+
+
+def test_noise_interval_uses_t():
+    # Three chunks, each RMS known, so the half width can be checked
+    noise = NoiseAccumulator(confidence=0.95)
+    for rms in (1.0, 2.0, 3.0):
+        noise.add(np.array([rms, -rms]))
+
+    estimate = noise.estimate(precision=1)
+    half_width = (estimate.high - estimate.low) / 2
+
+    assert estimate.chunks == 3
+    assert half_width == pytest.approx(4.303 * 1.0 / math.sqrt(3), rel=1e-3)
+
+
+def test_noise_converges_on_white_noise():
+    rng = np.random.default_rng(4)
+    noise = NoiseAccumulator()
+
+    for _ in range(50):
+        noise.add(rng.normal(0, 1e-3, 5000))
+
+    estimate = noise.estimate(precision=0.02)
+
+    assert estimate.converged
+    assert estimate.low < 1e-3 < estimate.high
+
+
+def test_noise_ignores_empty_chunk():
+    noise = NoiseAccumulator()
+    noise.add(np.array([]))
+
+    assert noise.count == 0
+    assert math.isnan(noise.rms)
+
+
+def test_edge_crossing_interpolated():
+    time = np.arange(5.0)
+    volts = np.array([0.0, 0.0, 1.0, 1.0, 1.0])
+
+    assert edge_crossing(time, volts, 0.25) == pytest.approx(1.25)
+
+
+def test_edge_crossing_falling():
+    time = np.arange(4.0)
+    volts = np.array([1.0, 1.0, 0.0, 0.0])
+
+    assert edge_crossing(time, volts, 0.5, rising=False) == pytest.approx(1.5)
+    assert math.isnan(edge_crossing(time, volts, 0.5, rising=True))
+
+
+def test_edge_crossing_nearest():
+    time = np.arange(8.0)
+    volts = np.array([0, 1, 0, 0, 0, 1, 0, 0], dtype=float)
+
+    assert edge_crossing(time, volts, 0.5, near=4.5) == pytest.approx(4.5)
+    assert edge_crossing(time, volts, 0.5, near=0) == pytest.approx(0.5)
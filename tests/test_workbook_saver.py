@@ -0,0 +1,167 @@
+"""
+# Background saving of a workbook
+# DK Oct 26
+"""
+
+import threading
+import time
+
+from openpyxl import Workbook, load_workbook
+
+from drivers.workbook_saver import WorkbookSaver
+
+
+class CountingWorkbook(Workbook):
+    """
+    Counts the saves, and can fail the first few
+    """
+
+    def __init__(self, failures: int = 0) -> None:
+        super().__init__()
+        self.saves = 0
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+
+    def save(self, filename):
+        self.release.wait(5)
+        self.saves += 1
+        if self.failures:
+            self.failures -= 1
+            raise PermissionError("open in Excel")
+        super().save(filename)
+
+
+def wait_for_save(saver: WorkbookSaver) -> None:
+    # The worker holds the lock while saving
+    while saver.lock.acquire(blocking=False):
+        saver.lock.release()
+        time.sleep(0.001)
+
+
+def cell(filename, row: int, col: int = 1):
+    return load_workbook(filename).worksheets[0].cell(row=row, column=col).value
+
+
+def test_write_and_close_saves(tmp_path):
+    filename = str(tmp_path / "results.xlsx")
+    saved = []
+    saver = WorkbookSaver(Workbook(), filename, on_saved=saved.append)
+
+    assert saver.write_cell(0, 1, 1, "a") == 1
+    assert saver.write_cell(0, 2, 1, 2.5) == 2
+    assert saver.dirty
+
+    assert saver.close(timeout=5)
+
+    assert not saver.dirty
+    assert saved[-1] == 2
+    assert (cell(filename, 1), cell(filename, 2)) == ("a", 2.5)
+
+
+def test_writes_during_save_are_deferred(tmp_path):
+    filename = str(tmp_path / "results.xlsx")
+    wb = CountingWorkbook()
+    saved = []
+    saver = WorkbookSaver(wb, filename, on_saved=saved.append)
+
+    saver.write_cell(0, 1, 1, "first")
+
+    # Hold the save part way, so the next writes are deferred
+    wb.release.clear()
+    saver.request()
+    wait_for_save(saver)
+
+    saver.write_cell(0, 2, 1, "deferred")
+    assert saver.deferred_value(0, 2, 1) == (True, "deferred")
+
+    wb.release.set()
+    assert saver.close(timeout=5)
+
+    # The first save didn't include the deferred write, so it saved again
+    assert saved == [1, 2]
+    assert cell(filename, 2) == "deferred"
+    assert saver.deferred_value(0, 2, 1) == (False, None)
+
+
+def test_requests_are_coalesced(tmp_path):
+    wb = CountingWorkbook()
+    saver = WorkbookSaver(wb, str(tmp_path / "results.xlsx"))
+
+    wb.release.clear()
+    saver.write_cell(0, 1, 1, 0)
+    saver.request()
+    wait_for_save(saver)
+
+    for row in range(2, 20):
+        saver.write_cell(0, row, 1, row)
+        saver.request()
+
+    wb.release.set()
+    assert saver.close(timeout=5)
+
+    assert wb.saves == 2
+
+
+def test_request_without_changes_does_nothing(tmp_path):
+    wb = CountingWorkbook()
+    saver = WorkbookSaver(wb, str(tmp_path / "results.xlsx"))
+
+    saver.request()
+
+    assert saver.close(timeout=5)
+    assert wb.saves == 0
+
+
+def test_failed_save_is_retried(tmp_path):
+    filename = str(tmp_path / "results.xlsx")
+    wb = CountingWorkbook(failures=2)
+    saver = WorkbookSaver(wb, filename)
+    saver.initial_backoff = 0.01
+
+    saver.write_cell(0, 1, 1, "a")
+
+    assert saver.close(timeout=5)
+    assert wb.saves == 3
+    assert cell(filename, 1) == "a"
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    wb = CountingWorkbook(failures=100)
+    saver = WorkbookSaver(wb, str(tmp_path / "results.xlsx"))
+    saver.initial_backoff = 0.001
+    saver.max_attempts = 3
+
+    saver.write_cell(0, 1, 1, "a")
+    saved = saver.wait(timeout=5)
+
+    assert not saved
+    assert saver.failed
+    assert saver.dirty
+    assert wb.saves == 3
+
+    wb.failures = 0
+    assert saver.close(timeout=5)  # retried on close
+    assert not saver.failed
+
+
+def test_on_cell_called_for_every_write(tmp_path):
+    cells = []
+    wb = CountingWorkbook()
+    saver = WorkbookSaver(
+        wb,
+        str(tmp_path / "results.xlsx"),
+        on_cell=lambda *args: cells.append(args),
+    )
+
+    saver.write_cell(0, 1, 1, "direct")
+
+    with saver.lock:
+        # Held by another thread, so deferred
+        thread = threading.Thread(target=saver.write_cell, args=(0, 2, 1, "later"))
+        thread.start()
+        thread.join()
+        assert cells == [(0, 1, 1, "direct")]
+
+    assert saver.close(timeout=5)
+    assert cells == [(0, 1, 1, "direct"), (0, 2, 1, "later")]